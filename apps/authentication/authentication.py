@@ -0,0 +1,74 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from apps.authentication.models import User
+from apps.authentication.revocation import is_token_revoked
+
+
+def get_cached_user(user_id):
+    """Return the ``User`` with this id through the shared cache."""
+    return cache.get_or_compute(
+        cache.namespaced_key('users', user_id),
+        lambda: User.objects.get(user_id=user_id),
+        timeout=settings.AUTH_USER_CACHE_TTL,
+    )
+
+
+def invalidate_cached_user(user_id):
+    """Drop a user from the cache after it changed."""
+    cache.delete(cache.namespaced_key('users', user_id))
+
+
+class ClaimsUser(TokenUser):
+    """
+    Lightweight user hydrated from the signed claims of an access token.
+
+    ``user_id``, ``role`` and ``is_active`` are embedded by
+    ``get_tokens_for_user``, so building this object never touches the
+    database. Code that needs the full model can use ``instance``, which goes
+    through the tiered cache.
+    """
+
+    @cached_property
+    def user_id(self):
+        return uuid.UUID(str(self.id))
+
+    @cached_property
+    def role(self):
+        return self.token.get('role', User.Roles.GUEST)
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', True)
+
+    @property
+    def instance(self):
+        """Return the full ``User`` model for this token."""
+        return get_cached_user(self.user_id)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that trusts the signed token claims instead of fetching
+    the ``User`` row on every request. Revocation is checked in the cache.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_token_revoked(token):
+            raise InvalidToken(_('Token has been revoked'))
+        return token
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
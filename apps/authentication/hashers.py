@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, ScryptPasswordHasher
+from django.db import close_old_connections
+
+# Cost profiles follow the OWASP password storage recommendations. Raising
+# PASSWORD_HASHER_COST makes ``must_update`` report stored hashes as outdated,
+# so each user is transparently rehashed the next time they log in.
+COST_PROFILES = {
+    'interactive': {
+        'argon2': {'time_cost': 2, 'memory_cost': 19 * 1024, 'parallelism': 1},
+        'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    },
+    'moderate': {
+        'argon2': {'time_cost': 3, 'memory_cost': 64 * 1024, 'parallelism': 1},
+        'scrypt': {'work_factor': 2 ** 16, 'block_size': 8, 'parallelism': 1},
+    },
+    'sensitive': {
+        'argon2': {'time_cost': 4, 'memory_cost': 256 * 1024, 'parallelism': 2},
+        'scrypt': {'work_factor': 2 ** 17, 'block_size': 8, 'parallelism': 1},
+    },
+}
+
+
+def get_cost_profile(algorithm):
+    """Return the cost parameters of ``algorithm`` for the configured profile."""
+    return COST_PROFILES[getattr(settings, 'PASSWORD_HASHER_COST', 'interactive')][algorithm]
+
+
+class ProfiledArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id hasher whose costs come from ``PASSWORD_HASHER_COST``."""
+
+    @property
+    def time_cost(self):
+        return get_cost_profile('argon2')['time_cost']
+
+    @property
+    def memory_cost(self):
+        return get_cost_profile('argon2')['memory_cost']
+
+    @property
+    def parallelism(self):
+        return get_cost_profile('argon2')['parallelism']
+
+
+class ProfiledScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt hasher whose costs come from ``PASSWORD_HASHER_COST``."""
+    # Large enough to verify hashes made with the most expensive profile.
+    maxmem = 256 * 1024 * 1024
+
+    @property
+    def work_factor(self):
+        return get_cost_profile('scrypt')['work_factor']
+
+    @property
+    def block_size(self):
+        return get_cost_profile('scrypt')['block_size']
+
+    @property
+    def parallelism(self):
+        return get_cost_profile('scrypt')['parallelism']
+
+
+_verify_executor = None
+
+
+def get_verify_executor():
+    """Return the bounded thread pool used for password verification."""
+    global _verify_executor
+    if _verify_executor is None:
+        _verify_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'PASSWORD_VERIFY_WORKERS', 4),
+            thread_name_prefix='password-verify',
+        )
+    return _verify_executor
+
+
+def _run_with_fresh_connections(func, *args, **kwargs):
+    # Pool threads outlive requests, so recycle their DB connections the way
+    # Django does around each request.
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_verify_pool(func, *args, **kwargs):
+    """
+    Run a password-checking callable in the bounded verification pool.
+
+    Argon2, scrypt and PBKDF2 all release the GIL while hashing, so the pool
+    gives real parallelism while the event loop keeps serving other requests.
+    Its size caps how many CPU-bound verifications run at once.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_verify_executor(),
+        partial(_run_with_fresh_connections, func, *args, **kwargs),
+    )
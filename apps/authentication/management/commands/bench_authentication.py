@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from apps.authentication.authentication import StatelessJWTAuthentication
+from apps.authentication.models import User
+from apps.authentication.views import get_tokens_for_user
+
+
+class Command(BaseCommand):
+    """Compare queries and latency per request for the JWT authentication backends."""
+    help = 'Benchmark DB-backed vs stateless JWT authentication (queries per request and latency).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(
+                email=f'bench-auth-{time.time_ns()}@example.com',
+                password=None,
+                username=f'benchauth{time.time_ns() % 10**9}',
+                first_name='Bench',
+                last_name='Auth',
+            )
+            access = get_tokens_for_user(user)['access']
+            factory = RequestFactory()
+            request = factory.get('/', HTTP_AUTHORIZATION=f'Bearer {access}', HTTP_HOST='localhost')
+
+            def db_backed():
+                JWTAuthentication().authenticate(Request(request))
+
+            def stateless():
+                StatelessJWTAuthentication().authenticate(Request(request))
+
+            def stateless_full_model():
+                user, _ = StatelessJWTAuthentication().authenticate(Request(request))
+                user.instance
+
+            cache.clear()
+            self.stdout.write(f'{"backend":<28}{"queries/req":>12}{"mean us":>10}{"p99 us":>10}')
+            for name, run in [
+                ('JWTAuthentication', db_backed),
+                ('StatelessJWTAuthentication', stateless),
+                ('stateless + cached model', stateless_full_model),
+            ]:
+                self.measure(name, run, options['requests'])
+            transaction.set_rollback(True)
+
+    def measure(self, name, run, count):
+        run()
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(count):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'{name:<28}{len(queries) / count:>12.2f}{statistics.mean(timings):>10.1f}{p99:>10.1f}'
+        )
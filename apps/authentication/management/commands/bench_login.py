@@ -0,0 +1,110 @@
+import asyncio
+import json
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from apps.authentication.models import User
+from apps.authentication.views import login_user_and_get_tokens_async
+
+PASSWORD = 'Bench!Passw0rd'
+
+
+class Command(BaseCommand):
+    """Measure login throughput under concurrency and its impact on the event loop."""
+    help = 'Benchmark hashing cost and concurrent logins through the async login view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=32)
+
+    def handle(self, *args, **options):
+        hasher = get_hasher()
+        started = time.perf_counter()
+        make_password(PASSWORD)
+        self.stdout.write(f'{hasher.algorithm} hash: {(time.perf_counter() - started) * 1000:.1f}ms')
+
+        user = User.objects.create_user(
+            email=f'bench-login-{time.time_ns()}@example.com',
+            password=PASSWORD,
+            username=f'benchlogin{time.time_ns() % 10**9}',
+            first_name='Bench',
+            last_name='Login',
+        )
+        try:
+            asyncio.run(self.run(user.email, options['logins'], options['concurrency']))
+        finally:
+            user.delete()
+
+    async def run(self, email, logins, concurrency):
+        factory = RequestFactory()
+        body = json.dumps({'email': email, 'password': PASSWORD})
+
+        def make_request():
+            return factory.post('/', body, content_type='application/json', HTTP_HOST='localhost')
+
+        async def shared_thread():
+            # How Django runs a sync view under ASGI: on the one thread shared
+            # by every other sync view in the worker.
+            user = await sync_to_async(authenticate)(make_request(), username=email, password=PASSWORD)
+            assert user is not None
+
+        async def offloaded():
+            response = await login_user_and_get_tokens_async(make_request())
+            assert response.status_code == 200
+
+        self.stdout.write(
+            f'{"strategy":<14}{"logins/s":>10}{"p50 ms":>10}{"p99 ms":>10}'
+            f'{"loop lag ms":>14}{"sync view wait ms":>20}'
+        )
+        for name, login in [('shared thread', shared_thread), ('verify pool', offloaded)]:
+            await self.measure(name, login, logins, concurrency)
+
+    async def measure(self, name, login, logins, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        loop_lag = 0.0
+        sync_wait = 0.0
+        done = asyncio.Event()
+
+        async def loop_probe():
+            # Sleeps 1ms at a time; any extra delay is time the loop was blocked.
+            nonlocal loop_lag
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.001)
+                loop_lag = max(loop_lag, time.perf_counter() - started - 0.001)
+
+        async def sync_view_probe():
+            # A trivial sync view: how long it waits for the shared sync thread.
+            nonlocal sync_wait
+            while not done.is_set():
+                started = time.perf_counter()
+                await sync_to_async(lambda: None)()
+                sync_wait = max(sync_wait, time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                await login()
+                latencies.append(time.perf_counter() - started)
+
+        probes = [asyncio.create_task(loop_probe()), asyncio.create_task(sync_view_probe())]
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*probes)
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{name:<14}{logins / elapsed:>10.1f}{statistics.median(latencies) * 1000:>10.1f}'
+            f'{p99 * 1000:>10.1f}{loop_lag * 1000:>14.1f}{sync_wait * 1000:>20.1f}'
+        )
@@ -0,0 +1,114 @@
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from apps.authentication.models import User
+from apps.authentication.serializers import CreateUserSerializer
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class Command(BaseCommand):
+    """Benchmark concurrent registrations with the check-then-insert and insert-only paths."""
+    help = 'Register users concurrently (with duplicate emails and common names) and report queries and latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duplicate-ratio', type=float, default=0.1)
+        parser.add_argument(
+            '--real-hashing', action='store_true',
+            help='Use the configured password hasher instead of a cheap one that isolates DB cost.',
+        )
+
+    def handle(self, *args, **options):
+        run_id = time.time_ns()
+        if options['real_hashing']:
+            self.run_all(run_id, options)
+        else:
+            with override_settings(PASSWORD_HASHERS=FAST_HASHERS):
+                self.run_all(run_id, options)
+
+    def run_all(self, run_id, options):
+        self.stdout.write(
+            f'{"path":<16}{"regs/s":>9}{"queries":>9}{"p50 ms":>9}{"p99 ms":>9}'
+            f'{"created":>9}{"rejected":>10}{"errors":>8}'
+        )
+        for mode in ('check-then-insert', 'insert-only'):
+            prefix = f'bench-{run_id}-{mode}'
+            try:
+                self.run(mode, prefix, options)
+            finally:
+                User.objects.filter(email__startswith=prefix).delete()
+
+    def payloads(self, prefix, count, duplicate_ratio):
+        """Build registration payloads; some reuse an email, all share a few common names."""
+        payloads = []
+        for i in range(count):
+            index = random.randrange(max(i, 1)) if i and random.random() < duplicate_ratio else i
+            payloads.append({
+                'first_name': random.choice(['john', 'jane', 'mary']),
+                'last_name': 'smith',
+                'email': f'{prefix}-{index}@example.com',
+                'password': 'Bench!Passw0rd',
+                'confirm_password': 'Bench!Passw0rd',
+            })
+        return payloads
+
+    def register(self, mode, payload):
+        """Register one user, returning (outcome, latency, query count)."""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            try:
+                if mode == 'check-then-insert' and User.objects.filter(email=payload['email']).exists():
+                    outcome = 'rejected'
+                else:
+                    serializer = CreateUserSerializer(data=payload)
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+                    outcome = 'created'
+            except ValidationError:
+                outcome = 'rejected'
+            except IntegrityError:
+                outcome = 'error'
+            elapsed = time.perf_counter() - started
+        if mode == 'check-then-insert' and outcome == 'error':
+            connection.close()
+        # Count round trips that touch data, not transaction bookkeeping.
+        statements = [
+            query for query in queries.captured_queries
+            if query['sql'].lstrip().upper().startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE'))
+        ]
+        return outcome, elapsed, len(statements)
+
+    def run(self, mode, prefix, options):
+        payloads = self.payloads(prefix, options['users'], options['duplicate_ratio'])
+
+        def worker(chunk):
+            try:
+                return [self.register(mode, payload) for payload in chunk]
+            finally:
+                connection.close()
+
+        chunks = [payloads[i::options['concurrency']] for i in range(options['concurrency'])]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = [result for chunk in pool.map(worker, chunks) for result in chunk]
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(result[1] for result in results)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        outcomes = [result[0] for result in results]
+        created = [result[2] for result in results if result[0] == 'created']
+        self.stdout.write(
+            f'{mode:<16}{len(results) / elapsed:>9.0f}{statistics.mean(created or [0]):>9.2f}'
+            f'{statistics.median(latencies) * 1000:>9.2f}{p99 * 1000:>9.2f}'
+            f'{outcomes.count("created"):>9}{outcomes.count("rejected"):>10}{outcomes.count("error"):>8}'
+        )
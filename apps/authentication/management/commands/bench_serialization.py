@@ -0,0 +1,70 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from apps.authentication.models import User
+from apps.authentication.serializers import UserSerializer
+from core.renderers import FastJSONRenderer, orjson
+
+
+class StockUserSerializer(UserSerializer):
+    """``UserSerializer`` with DRF's regular ``ListSerializer``, as a baseline."""
+
+    class Meta(UserSerializer.Meta):
+        list_serializer_class = serializers.ListSerializer
+
+
+class Command(BaseCommand):
+    """Microbenchmark serializing and rendering a list of users."""
+    help = 'Serialize and render in-memory users with the stock and the fast paths and report timings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        users = [
+            User(
+                user_id=uuid.uuid4(),
+                username=f'user{i}',
+                first_name='john',
+                last_name=f'smith{i}',
+                email=f'user{i}@example.com',
+                phone_number=None if i % 2 else '+15550100',
+                role=User.Roles.GUEST,
+                created_at=now,
+                updated_at=now,
+            )
+            for i in range(options['users'])
+        ]
+        if orjson is None:
+            self.stdout.write('orjson is not installed; FastJSONRenderer uses the stdlib encoder.')
+
+        def best(func):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                result = func()
+                timings.append(time.perf_counter() - started)
+            return result, min(timings) * 1000
+
+        stock_data, stock_serialize = best(lambda: StockUserSerializer(users, many=True).data)
+        fast_data, fast_serialize = best(lambda: UserSerializer(users, many=True).data)
+        stock_json, stock_render = best(lambda: JSONRenderer().render(stock_data))
+        fast_json, fast_render = best(lambda: FastJSONRenderer().render(fast_data))
+        if stock_json != fast_json:
+            raise AssertionError('The fast path produced different JSON.')
+
+        self.stdout.write(f'{options["users"]} users, best of {options["repeat"]}')
+        self.stdout.write(f'{"":<10}{"serialize ms":>14}{"render ms":>11}{"total ms":>10}')
+        self.stdout.write(
+            f'{"stock":<10}{stock_serialize:>14.1f}{stock_render:>11.1f}{stock_serialize + stock_render:>10.1f}'
+        )
+        self.stdout.write(
+            f'{"fast":<10}{fast_serialize:>14.1f}{fast_render:>11.1f}{fast_serialize + fast_render:>10.1f}'
+        )
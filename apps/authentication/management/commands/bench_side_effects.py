@@ -0,0 +1,68 @@
+import statistics
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.authentication.models import AnalyticsEvent, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class Command(BaseCommand):
+    """Compare registration latency without side effects, with them queued, and with them inline."""
+    help = (
+        'Register users through the API and report p50/p99 latency with no side effects, with side '
+        'effects published to an in-memory broker, and with them run inline (eager).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300)
+
+    def handle(self, *args, **options):
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        with override_settings(
+            CELERY_BROKER_URL='memory://',
+            PASSWORD_HASHERS=FAST_HASHERS,
+            REST_FRAMEWORK=rest_framework,
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        ):
+            self.stdout.write(f'{"mode":<10}{"p50 ms":>9}{"p99 ms":>9}')
+            for mode in ('none', 'queued', 'inline'):
+                self.run(mode, options['users'])
+
+    def run(self, mode, count):
+        prefix = f'bench-{time.time_ns()}-{mode}'
+        client = APIClient(HTTP_HOST='localhost')
+        latencies = []
+        patches = {
+            'none': mock.patch('apps.authentication.views.queue_registration_side_effects'),
+            'queued': override_settings(CELERY_TASK_ALWAYS_EAGER=False),
+            'inline': override_settings(CELERY_TASK_ALWAYS_EAGER=True),
+        }
+        try:
+            with patches[mode]:
+                for i in range(count):
+                    # Keep each signup in its own domain so contact seeding stays comparable.
+                    started = time.perf_counter()
+                    response = client.post(reverse('authentication:register'), {
+                        'first_name': 'bench',
+                        'last_name': 'user',
+                        'email': f'{prefix}-{i}@{prefix}-{i}.test',
+                        'password': 'Bench!Passw0rd',
+                        'confirm_password': 'Bench!Passw0rd',
+                    }, format='json')
+                    latencies.append(time.perf_counter() - started)
+                    assert response.status_code == 201, response.content
+        finally:
+            User.objects.filter(email__startswith=prefix).delete()
+            AnalyticsEvent.objects.filter(name='user_registered', properties__role='guest').delete()
+            caches[settings.ANALYTICS_BUFFER_ALIAS].clear()
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(f'{mode:<10}{statistics.median(latencies) * 1000:>9.2f}{p99 * 1000:>9.2f}')
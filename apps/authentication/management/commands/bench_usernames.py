@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.authentication.models import User
+from apps.authentication.usernames import username_allocator
+from config.utils import UserUtils
+
+
+class Command(BaseCommand):
+    """Compare random-suffix usernames with the counter allocator on heavily colliding names."""
+    help = 'Seed many users sharing one name and measure round trips per new username.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-users', type=int, default=100_000, help='Existing users named John Smith.')
+        parser.add_argument('--allocations', type=int, default=1_000)
+        parser.add_argument('--max-attempts', type=int, default=50, help='Retry cap for the random strategy.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['seed_users'])
+            self.stdout.write(f'{"strategy":<12}{"queries/name":>14}{"mean us":>10}{"p99 us":>10}{"failed":>8}')
+            self.measure('random', lambda: self.random_username(options['max_attempts']), options['allocations'])
+            self.measure('allocator', lambda: username_allocator.allocate('John', 'Smith'), options['allocations'])
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        """Create ``count`` users whose usernames fill jsmith100 upwards."""
+        started = time.perf_counter()
+        batch = []
+        for i in range(count):
+            batch.append(User(
+                email=f'seed-{i}@example.com',
+                username=f'jsmith{100 + i}',
+                first_name='John',
+                last_name='Smith',
+            ))
+            if len(batch) == 10_000:
+                User.objects.bulk_create(batch)
+                batch = []
+        User.objects.bulk_create(batch)
+        self.stdout.write(f'Seeded {count} colliding users in {time.perf_counter() - started:.1f}s')
+
+    def random_username(self, max_attempts):
+        """The previous strategy: random three-digit suffix, retried until free."""
+        for _ in range(max_attempts):
+            username = UserUtils.generate_username('John', 'Smith')
+            if not User.objects.filter(username=username).exists():
+                return username
+        return None
+
+    def measure(self, name, allocate, count):
+        timings = []
+        failed = 0
+        statements = 0
+
+        def count_statements(execute, sql, params, many, context):
+            nonlocal statements
+            if sql.lstrip().upper().startswith(('SELECT', 'INSERT', 'UPDATE')):
+                statements += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_statements):
+            for _ in range(count):
+                started = time.perf_counter()
+                if allocate() is None:
+                    failed += 1
+                timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f'{name:<12}{statements / count:>14.2f}{statistics.mean(timings):>10.1f}{p99:>10.1f}{failed:>8}'
+        )
@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.authentication.models import User, email_domain
+from apps.authentication.usernames import username_allocator
+from apps.users.search import index_users
+from config.utils import UserUtils
+
+
+def _init_worker():
+    # Workers started with "spawn" need their own Django setup; forked ones
+    # inherit it.
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _hash_passwords(passwords):
+    """Hash a chunk of passwords in a worker process."""
+    return [make_password(password) for password in passwords]
+
+
+class Command(BaseCommand):
+    """Bulk import users from CSV or JSONL."""
+    help = (
+        'Stream users from a CSV or JSONL file and insert them in batches. Rows carry email, '
+        'first_name, last_name and either password or password_hash; username, phone_number '
+        'and role are optional.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1_000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Password hashing processes.')
+        parser.add_argument('--checkpoint', help='Checkpoint file, defaults to <path>.checkpoint.')
+        parser.add_argument('--resume', action='store_true', help='Skip the records already imported.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        batch_size = options['batch_size']
+
+        self.stats = {'processed': 0, 'created': 0, 'skipped': 0, 'invalid': 0}
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint:
+                self.stats.update(json.load(checkpoint))
+            self.stdout.write(f'Resuming after record {self.stats["processed"]}')
+
+        self.started = time.perf_counter()
+        self.workers = options['workers']
+        resumed_from = self.records_read = self.stats['processed']
+        with open(path, newline='', encoding='utf-8') as source:
+            records = islice(self.read_records(source, file_format), resumed_from, None)
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                pending = None
+                while True:
+                    rows = list(islice(records, batch_size))
+                    # Hash the next batch while the current one is written.
+                    submitted = self.submit_batch(pool, rows) if rows else None
+                    if pending is not None:
+                        self.write_batch(*pending)
+                        self.save_checkpoint(checkpoint_path)
+                        self.report(resumed_from)
+                    if submitted is None:
+                        break
+                    pending = submitted
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.stats["created"]} users, skipped {self.stats["skipped"]} existing or conflicting and '
+            f'{self.stats["invalid"]} invalid records in {time.perf_counter() - self.started:.1f}s'
+        ))
+
+    def read_records(self, source, file_format):
+        """Yield one dict per input record."""
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise CommandError(f'Line {line_number} is not valid JSON: {exc}')
+
+    def build_user(self, record):
+        """Return an unsaved User for a record and the names of its missing or invalid fields."""
+        email = (record.get('email') or '').strip()
+        first_name = UserUtils.capitalize_name(record.get('first_name') or '')
+        last_name = UserUtils.capitalize_name(record.get('last_name') or '')
+        role = record.get('role') or User.Roles.GUEST
+        invalid = [
+            name for name, value in (('email', email), ('first_name', first_name), ('last_name', last_name))
+            if not value
+        ]
+        if role not in User.Roles.values:
+            invalid.append('role')
+        if invalid:
+            return None, invalid
+        email = User.objects.normalize_email(email)
+        # bulk_create skips save(), which fills email_domain in.
+        return User(
+            email=email,
+            email_domain=email_domain(email),
+            username=(record.get('username') or '').strip(),
+            first_name=first_name,
+            last_name=last_name,
+            phone_number=record.get('phone_number') or None,
+            role=role,
+        ), []
+
+    def submit_batch(self, pool, records):
+        """Build the users of a batch and start hashing their plain-text passwords."""
+        users, plain_passwords, plain_users = [], [], []
+        invalid_count = 0
+        for number, record in enumerate(records, start=self.records_read + 1):
+            user, invalid = self.build_user(record)
+            if user is None:
+                # Only field names: records carry plain-text passwords.
+                self.stderr.write(f'Invalid record {number}: missing or invalid {", ".join(invalid)}')
+                invalid_count += 1
+                continue
+            password_hash = record.get('password_hash')
+            if password_hash:
+                try:
+                    identify_hasher(password_hash)
+                except ValueError:
+                    self.stderr.write(f'Invalid record {number}: unknown password hash format')
+                    invalid_count += 1
+                    continue
+                user.password = password_hash
+            else:
+                plain_users.append(user)
+                plain_passwords.append(record.get('password') or None)
+            users.append(user)
+
+        self.records_read += len(records)
+        chunk = max(1, len(plain_passwords) // (self.workers * 4))
+        chunks = [plain_passwords[i:i + chunk] for i in range(0, len(plain_passwords), chunk)]
+        future = pool.map(_hash_passwords, chunks)
+        # Counted with the batch's other stats in write_batch, so the
+        # checkpoint of the previous batch does not include them.
+        return users, plain_users, future, len(records), invalid_count
+
+    def write_batch(self, users, plain_users, hashed_chunks, record_count, invalid_count):
+        """
+        Insert a batch in one transaction, skipping emails that already exist
+        and rows that conflict with an existing username.
+        """
+        hashes = [password for chunk in hashed_chunks for password in chunk]
+        for user, password in zip(plain_users, hashes):
+            user.password = password
+
+        with transaction.atomic():
+            existing = set(User.objects.filter(
+                email__in=[user.email for user in users],
+            ).values_list('email', flat=True))
+            seen = set()
+            new_users = []
+            for user in users:
+                if user.email in existing or user.email in seen:
+                    continue
+                seen.add(user.email)
+                new_users.append(user)
+
+            # Reserve generated usernames one block per base instead of per user.
+            by_base = defaultdict(list)
+            for user in new_users:
+                if not user.username:
+                    by_base[username_allocator.base_for(user.first_name, user.last_name)].append(user)
+            for base, group in by_base.items():
+                first = username_allocator.reserve(base, len(group))
+                for offset, user in enumerate(group):
+                    user.username = f'{base}{first + offset}'
+
+            User.objects.bulk_create(new_users, batch_size=len(new_users) or 1, ignore_conflicts=True)
+            # bulk_create skips post_save, so index the rows that were inserted here.
+            inserted = set(User.objects.filter(
+                user_id__in=[user.user_id for user in new_users],
+            ).values_list('user_id', flat=True))
+            index_users([user for user in new_users if user.user_id in inserted])
+
+        self.stats['processed'] += record_count
+        self.stats['created'] += len(inserted)
+        self.stats['skipped'] += len(users) - len(inserted)
+        self.stats['invalid'] += invalid_count
+
+    def save_checkpoint(self, checkpoint_path):
+        """Record progress after a committed batch so the import can resume."""
+        temporary_path = f'{checkpoint_path}.tmp'
+        with open(temporary_path, 'w') as checkpoint:
+            json.dump(self.stats, checkpoint)
+        os.replace(temporary_path, checkpoint_path)
+
+    def report(self, resumed_from):
+        elapsed = time.perf_counter() - self.started
+        rate = (self.stats['processed'] - resumed_from) / elapsed if elapsed else 0
+        self.stdout.write(f'{self.stats["processed"]} records, {self.stats["created"]} created, {rate:.0f} records/s')
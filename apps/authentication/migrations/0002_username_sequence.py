@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsernameSequence',
+            fields=[
+                ('base', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('next_suffix', models.PositiveBigIntegerField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_username_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='welcome_email_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='AnalyticsEvent',
+            fields=[
+                ('event_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=64)),
+                ('user_id', models.UUIDField(blank=True, null=True)),
+                ('properties', models.JSONField(blank=True, default=dict)),
+                ('occurred_at', models.DateTimeField()),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name', 'occurred_at'], name='auth_event_name_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 05:46
+
+from django.db import migrations, models
+
+
+def fill_email_domains(apps, schema_editor):
+    """Derive email_domain for the existing users, in batches."""
+    User = apps.get_model('authentication', 'User')
+    batch = []
+    for user in User.objects.only('pk', 'email').iterator(chunk_size=2000):
+        user.email_domain = user.email.rpartition('@')[2].lower()
+        batch.append(user)
+        if len(batch) == 2000:
+            User.objects.bulk_update(batch, ['email_domain'])
+            batch = []
+    User.objects.bulk_update(batch, ['email_domain'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0003_side_effects'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_domain',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_email_domains, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email_domain', 'date_joined'], name='auth_user_email_domain_idx'),
+        ),
+    ]
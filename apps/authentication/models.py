@@ -5,6 +5,15 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
+def email_domain(email):
+    """Return the lower-cased domain of an email address, or ``''``."""
+    return (email or '').rpartition('@')[2].lower()
+
+
+# Fields copied into the token claims by ``get_tokens_for_user``.
+TOKEN_CLAIM_FIELDS = ('role', 'is_active')
+
+
 class UserManager(BaseUserManager):
     """Custom authentication manager for handling authentication creation and management."""
 
@@ -51,10 +60,71 @@ class User(AbstractUser):
     last_name = models.CharField(max_length=30, blank=False)
     email = models.EmailField(unique=True, blank=False)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
+    # Lower-cased domain part of ``email``, kept in step by ``save``, for
+    # indexed equality lookups when seeding contacts.
+    email_domain = models.CharField(max_length=255, blank=True, default='', editable=False)
+    welcome_email_sent_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['email_domain', 'date_joined'], name='auth_user_email_domain_idx'),
+        ]
+
     def __str__(self):
         return self.email
+
+    def save(self, *args, **kwargs):
+        self.email_domain = email_domain(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'email_domain'}
+        super().save(*args, **kwargs)
+        self._loaded_claims = self._current_claims()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_claims = instance._current_claims()
+        return instance
+
+    def _current_claims(self):
+        # Deferred fields are missing from __dict__ and cannot have changed.
+        return {name: self.__dict__[name] for name in TOKEN_CLAIM_FIELDS if name in self.__dict__}
+
+    def token_claims_changed(self):
+        """Return whether ``role`` or ``is_active`` differ from when the row was loaded or last saved."""
+        loaded = getattr(self, '_loaded_claims', {})
+        return any(
+            name not in loaded or loaded[name] != value for name, value in self._current_claims().items()
+        )
+
+
+class UsernameSequence(models.Model):
+    """Next free numeric suffix for a generated username base such as ``jsmith``."""
+    base = models.CharField(max_length=30, primary_key=True)
+    next_suffix = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.base}{self.next_suffix}"
+
+
+class AnalyticsEvent(models.Model):
+    """An analytics event flushed in batches by the ``flush_analytics_events`` task."""
+    event_id = models.UUIDField(primary_key=True)
+    name = models.CharField(max_length=64)
+    user_id = models.UUIDField(blank=True, null=True)
+    properties = models.JSONField(default=dict, blank=True)
+    occurred_at = models.DateTimeField()
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name', 'occurred_at'], name='auth_event_name_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.event_id}"
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework_simplejwt.settings import api_settings
+
+REVOKED_PREFIX = 'jwt:revoked:'
+NOT_BEFORE_PREFIX = 'jwt:not-before:'
+
+
+def revocation_cache():
+    return caches[settings.TOKEN_REVOCATION_CACHE_ALIAS]
+
+
+def revoke_token(token):
+    """
+    Revoke one token until it would have expired anyway.
+
+    Returns ``False`` if it was already revoked. The check and the revocation
+    are a single atomic ``add``, so only one of two concurrent refreshes
+    with the same refresh token can succeed.
+    """
+    timeout = max(1, int(token['exp'] - time.time()) + 1)
+    return revocation_cache().add(f'{REVOKED_PREFIX}{token[api_settings.JTI_CLAIM]}', 1, timeout)
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to a user so far with one write (logout everywhere)."""
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    revocation_cache().set(f'{NOT_BEFORE_PREFIX}{user_id}', int(time.time()), int(lifetime.total_seconds()) + 1)
+
+
+def is_token_revoked(token):
+    """Return whether a token was revoked on its own or by a logout everywhere, in one cache round trip."""
+    revoked_key = f'{REVOKED_PREFIX}{token[api_settings.JTI_CLAIM]}'
+    not_before_key = f'{NOT_BEFORE_PREFIX}{token.get(api_settings.USER_ID_CLAIM)}'
+    found = revocation_cache().get_many([revoked_key, not_before_key])
+    if revoked_key in found:
+        return True
+    # ``iat`` has one-second resolution; tokens issued in the same second as
+    # the logout everywhere stay valid rather than rejecting a fresh login.
+    not_before = found.get(not_before_key)
+    return not_before is not None and token.get('iat', 0) < not_before
@@ -1,16 +1,33 @@
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 
 from apps.authentication.models import User
+from apps.authentication.revocation import is_token_revoked, revoke_token
+from apps.authentication.usernames import username_allocator
+from core.instrumentation import timed
+from core.serializers import CompiledListSerializer
 from config.utils import UserUtils
 
 
+DUPLICATE_EMAIL_MESSAGE = "A authentication with this email already exists."
+DUPLICATE_USERNAME_MESSAGE = "A authentication with this username already exists."
+REVOKED_TOKEN_MESSAGE = "Token has been revoked."
+
+
 def validate_email(value):
-    """Validate that the email is unique."""
+    """
+    Validate that the email is present.
+
+    Uniqueness is enforced by the database constraint when the user is
+    inserted, see ``CreateUserSerializer.create``.
+    """
     if not value:
         raise serializers.ValidationError("Email field cannot be empty.")
-    if User.objects.filter(email=value).exists():
-        raise serializers.ValidationError("A authentication with this email already exists.")
     return value
 
 
@@ -35,6 +52,7 @@ class UserSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
         read_only_fields = ['user_id', 'created_at', 'updated_at']
+        list_serializer_class = CompiledListSerializer
 
     def get_full_name(self, obj):
         """Return the authentication's full name."""
@@ -47,6 +65,8 @@ class CreateUserSerializer(serializers.ModelSerializer):
     confirm_password = serializers.CharField(write_only=True)
     username = serializers.CharField(required=False, allow_blank=True)
 
+    max_username_attempts = 5
+
     class Meta:
         model = User
         fields = [
@@ -71,6 +91,7 @@ class CreateUserSerializer(serializers.ModelSerializer):
                 "Password must be at least 8 characters long and include "
                 "uppercase, lowercase, digit, and special character."
             )
+        return value
 
     def validate(self, data):
         """Validate that password and confirm_password match."""
@@ -81,18 +102,58 @@ class CreateUserSerializer(serializers.ModelSerializer):
         data['first_name'] = UserUtils.capitalize_name(data['first_name'])
         data['last_name'] = UserUtils.capitalize_name(data['last_name'])
 
-        if not data.get('username'):
-            data['username'] = UserUtils.generate_username(data['first_name'], data['last_name'])
+        # Generated usernames are allocated in create(), once the rest of the
+        # payload is known to be valid.
+        self.username_generated = not data.get('username')
 
         return data
 
     def create(self, validated_data):
-        """Create and return a new User instance."""
+        """
+        Create and return a new User instance with a single INSERT.
+
+        Email and username uniqueness come from the table constraints instead
+        of a SELECT beforehand, which also closes the race between the check
+        and the insert. Generated usernames come from the per-base counter of
+        ``username_allocator``; if one still collides with a username created
+        elsewhere, a free one is found in one batched lookup and the insert is
+        retried.
+        """
         password = validated_data.pop('password')
         user = User(**validated_data)
         user.set_password(password)
-        user.save()
-        return user
+        if self.username_generated:
+            user.username = username_allocator.allocate(user.first_name, user.last_name)
+
+        for _ in range(self.max_username_attempts):
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+                return user
+            except IntegrityError as exc:
+                field = self.get_conflicting_field(exc, user)
+                if field == 'email':
+                    raise serializers.ValidationError({'email': [DUPLICATE_EMAIL_MESSAGE]})
+                if field != 'username' or not self.username_generated:
+                    raise serializers.ValidationError({'username': [DUPLICATE_USERNAME_MESSAGE]})
+                user.username = username_allocator.allocate_free(user.first_name, user.last_name)
+
+        raise serializers.ValidationError({'username': ["Could not generate a unique username, please choose one."]})
+
+    @staticmethod
+    def get_conflicting_field(exc, user):
+        """Return which unique field an IntegrityError was raised for."""
+        # SQLite reports "UNIQUE constraint failed: <table>.<column>" and MySQL
+        # "Duplicate entry '<value>' for key '<table>.<column>'"; only look at
+        # the constraint part so the duplicated value cannot confuse the match.
+        message = str(exc).rsplit('for key', 1)[-1]
+        for field in ('email', 'username'):
+            if f'.{field}' in message or f"'{field}'" in message:
+                return field
+        # Unknown backend wording: look it up, this only runs on the error path.
+        if User.objects.filter(email=user.email).exists():
+            return 'email'
+        return 'username'
 
 class UserLoginSerializer(serializers.Serializer):
     """Serializer for authentication login."""
@@ -105,7 +166,8 @@ class UserLoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         if email and password:
-            user = authenticate(request=self.context['request'], username=email, password=password)
+            with timed('hash'):
+                user = authenticate(request=self.context['request'], username=email, password=password)
             if user is None:
                 raise serializers.ValidationError("Invalid email or password.")
             if not user.is_active:
@@ -130,4 +192,47 @@ class PasswordGenerateSerializer(serializers.Serializer):
         """Generate and return a strong password."""
         length = validated_data.get('length', 12)
         password = UserUtils.generate_strong_password(length)
-        return {'password': password}
\ No newline at end of file
+        return {'password': password}
+
+class TokenRotateSerializer(TokenRefreshSerializer):
+    """
+    Exchange a refresh token for a new access token and, with
+    ``ROTATE_REFRESH_TOKENS``, a new refresh token.
+
+    Unlike the stock serializer this does not load the user: deactivating a
+    user or changing their role revokes their tokens instead (see
+    ``signals``), and revocation is a cache lookup.
+    """
+
+    def validate(self, attrs):
+        try:
+            refresh = self.token_class(attrs['refresh'])
+        except TokenError as exc:
+            raise InvalidToken(exc.args[0])
+        if is_token_revoked(refresh):
+            raise InvalidToken(REVOKED_TOKEN_MESSAGE)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # Refresh tokens are single use: a replayed one loses the race here.
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revoke_token(refresh):
+                raise InvalidToken(REVOKED_TOKEN_MESSAGE)
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+class LogoutSerializer(serializers.Serializer):
+    """Serializer for revoking the refresh token of the current session."""
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        """Validate that the refresh token is valid and belongs to the current user."""
+        try:
+            refresh = RefreshToken(value)
+        except TokenError as exc:
+            raise serializers.ValidationError(exc.args[0])
+        if str(refresh.get(api_settings.USER_ID_CLAIM)) != str(self.context['request'].user.id):
+            raise serializers.ValidationError("Token does not belong to the current user.")
+        return refresh
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.authentication.authentication import invalidate_cached_user
+from apps.authentication.models import User
+from apps.authentication.revocation import revoke_user_tokens
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    """Drop a changed user from the cache."""
+    invalidate_cached_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_with_stale_claims(sender, instance, created, **kwargs):
+    """
+    Log a user out everywhere when their role or active flag changes, since
+    token refreshes copy those claims without loading the user.
+    """
+    if not created and instance.token_claims_changed():
+        revoke_user_tokens(instance.user_id)
@@ -0,0 +1,208 @@
+import logging
+import uuid
+from datetime import datetime
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.mail import send_mail
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from apps.authentication.models import AnalyticsEvent, User
+from apps.users.models import Contact
+from core.db_router import use_primary
+
+logger = logging.getLogger(__name__)
+
+# Every task here is idempotent, so transient failures (SMTP and broker
+# errors are OSErrors) are retried with jittered exponential backoff and
+# tasks are acknowledged only after they finish. Nobody reads the results.
+TASK_OPTIONS = {
+    'ignore_result': True,
+    'autoretry_for': (OSError, DatabaseError),
+    'retry_backoff': True,
+    'retry_backoff_max': 600,
+    'retry_jitter': True,
+    'max_retries': 5,
+    'acks_late': True,
+}
+
+# Publishing happens on the request thread: give up quickly rather than hold
+# the response while the broker is unreachable.
+PUBLISH_RETRY_POLICY = {'max_retries': 2, 'interval_start': 0, 'interval_step': 0.1, 'interval_max': 0.2}
+
+EVENT_SEQUENCE_KEY = 'analytics:seq'
+EVENT_CURSOR_KEY = 'analytics:cursor'
+EVENT_STALLED_KEY = 'analytics:stalled'
+FLUSH_SCHEDULED_KEY = 'analytics:flush-scheduled'
+EVENT_TTL = 60 * 60 * 24
+
+
+def publish(task, *args, countdown=None):
+    """Queue a task without letting a broker outage fail the request."""
+    try:
+        task.apply_async(args, countdown=countdown, retry=True, retry_policy=PUBLISH_RETRY_POLICY)
+    except Exception:
+        logger.exception('Could not queue %s.', task.name)
+
+
+def queue_registration_side_effects(user):
+    """Queue the welcome email, contact seeding and signup event once the registration commits."""
+    user_id = str(user.user_id)
+    role = user.role
+
+    def dispatch():
+        publish(send_welcome_email, user_id)
+        publish(seed_contacts, user_id)
+        track_event('user_registered', user_id, role=role)
+
+    transaction.on_commit(dispatch)
+
+
+def event_buffer():
+    return caches[settings.ANALYTICS_BUFFER_ALIAS]
+
+
+def buffer_reaches_flush_task():
+    """
+    Return whether ``flush_analytics_events`` can read what this process
+    buffers: the buffer cache is shared between processes, or tasks run in
+    this one. A per-process cache without CACHE_URL is neither.
+    """
+    return settings.CELERY_TASK_ALWAYS_EAGER or not isinstance(event_buffer(), (LocMemCache, DummyCache))
+
+
+def event_row(event):
+    return AnalyticsEvent(
+        event_id=event['event_id'],
+        name=event['name'],
+        user_id=event['user_id'],
+        properties=event['properties'],
+        occurred_at=datetime.fromisoformat(event['occurred_at']),
+    )
+
+
+def event_key(sequence):
+    return f'analytics:event:{sequence}'
+
+
+def track_event(name, user_id=None, **properties):
+    """
+    Buffer an analytics event and schedule a flush if none is pending.
+
+    Events get consecutive sequence numbers in the shared cache, and at most
+    one ``flush_analytics_events`` task is scheduled per
+    ``ANALYTICS_FLUSH_DELAY``. A burst of signups therefore costs one task
+    and one bulk insert instead of one of each per event. When the worker
+    cannot see the buffer, the event is inserted directly instead.
+    """
+    event = {
+        'event_id': str(uuid.uuid4()),
+        'name': name,
+        'user_id': user_id,
+        'properties': properties,
+        'occurred_at': timezone.now().isoformat(),
+    }
+    buffer = event_buffer()
+    try:
+        if not buffer_reaches_flush_task():
+            event_row(event).save(force_insert=True)
+            return
+        try:
+            sequence = buffer.incr(EVENT_SEQUENCE_KEY)
+        except ValueError:
+            buffer.add(EVENT_SEQUENCE_KEY, 0, None)
+            sequence = buffer.incr(EVENT_SEQUENCE_KEY)
+        buffer.set(event_key(sequence), event, EVENT_TTL)
+        if buffer.add(FLUSH_SCHEDULED_KEY, 1, settings.ANALYTICS_FLUSH_DELAY):
+            publish(flush_analytics_events, countdown=settings.ANALYTICS_FLUSH_DELAY)
+    except Exception:
+        logger.exception('Could not buffer analytics event %s.', name)
+
+
+@shared_task(**TASK_OPTIONS)
+def send_welcome_email(user_id):
+    """Send the welcome email unless the user already received it."""
+    # The task can run before the new row reaches the replicas.
+    with use_primary():
+        user = User.objects.filter(pk=user_id, welcome_email_sent_at__isnull=True).only('email', 'first_name').first()
+    if user is None:
+        return False
+    # Claim the send so a duplicate delivery of this task does not email twice.
+    claimed = User.objects.filter(pk=user_id, welcome_email_sent_at__isnull=True).update(
+        welcome_email_sent_at=timezone.now(),
+    )
+    if not claimed:
+        return False
+    try:
+        send_mail(
+            'Welcome!',
+            f'Hi {user.first_name}, thanks for signing up.',
+            settings.DEFAULT_FROM_EMAIL,
+            [user.email],
+        )
+    except Exception:
+        User.objects.filter(pk=user_id).update(welcome_email_sent_at=None)
+        raise
+    return True
+
+
+@shared_task(**TASK_OPTIONS)
+def seed_contacts(user_id):
+    """
+    Connect a new user with existing users of the same organisation, for the
+    email domains listed in ``CONTACT_SEED_DOMAINS`` only.
+    """
+    with use_primary():
+        user = User.objects.filter(pk=user_id).only('email_domain').first()
+    if user is None or user.email_domain not in settings.CONTACT_SEED_DOMAINS:
+        return 0
+    peer_ids = list(
+        User.objects.filter(email_domain=user.email_domain, is_active=True)
+        .exclude(pk=user_id)
+        .order_by('-date_joined')
+        .values_list('pk', flat=True)[:settings.CONTACT_SEED_LIMIT]
+    )
+    contacts = []
+    for peer_id in peer_ids:
+        contacts.append(Contact(owner_id=user_id, contact_id=peer_id, source=Contact.Sources.EMAIL_DOMAIN))
+        contacts.append(Contact(owner_id=peer_id, contact_id=user_id, source=Contact.Sources.EMAIL_DOMAIN))
+    Contact.objects.bulk_create(contacts, ignore_conflicts=True)
+    return len(peer_ids)
+
+
+@shared_task(**TASK_OPTIONS)
+def flush_analytics_events():
+    """Move buffered analytics events into the database in one bulk insert."""
+    buffer = event_buffer()
+    cursor = buffer.get(EVENT_CURSOR_KEY, 0)
+    end = min(buffer.get(EVENT_SEQUENCE_KEY, 0), cursor + settings.ANALYTICS_FLUSH_BATCH_SIZE)
+    sequences = range(cursor + 1, end + 1)
+    found = buffer.get_many([event_key(sequence) for sequence in sequences])
+
+    events = []
+    flushed = cursor
+    for sequence in sequences:
+        event = found.get(event_key(sequence))
+        if event is None:
+            # The producer may sit between incr() and set(); wait one round.
+            # A gap still there on the next flush means it never arrived.
+            if buffer.get(EVENT_STALLED_KEY) != sequence:
+                buffer.set(EVENT_STALLED_KEY, sequence, None)
+                break
+        else:
+            events.append(event)
+        flushed = sequence
+
+    # Inserting before advancing the cursor makes a crash replay the batch;
+    # the event ids make the replay a no-op.
+    AnalyticsEvent.objects.bulk_create([event_row(event) for event in events], ignore_conflicts=True)
+    buffer.set(EVENT_CURSOR_KEY, flushed, None)
+    buffer.delete_many([event_key(sequence) for sequence in range(cursor + 1, flushed + 1)])
+
+    if flushed < buffer.get(EVENT_SEQUENCE_KEY, 0):
+        publish(flush_analytics_events, countdown=settings.ANALYTICS_FLUSH_DELAY)
+    return len(events)
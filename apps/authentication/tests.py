@@ -1,3 +1,494 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.serializers import ListSerializer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.authentication.authentication import StatelessJWTAuthentication
+from apps.authentication import tasks
+from apps.authentication.management.commands.import_users import Command as ImportUsersCommand
+from apps.authentication.models import AnalyticsEvent, User, UsernameSequence
+from apps.authentication.serializers import UserSerializer
+from apps.authentication.usernames import username_allocator
+from apps.authentication.views import get_tokens_for_user
+from apps.users.models import Contact
+from core.renderers import FastJSONRenderer
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    """Tests for authentication from signed token claims."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ada@example.com',
+            password='Str0ng!Pass',
+            username='alovelace',
+            first_name='Ada',
+            last_name='Lovelace',
+            role=User.Roles.HOST,
+        )
+        cache.clear()
+
+    def authenticate(self, user, **claims):
+        access = RefreshToken(get_tokens_for_user(user)['refresh']).access_token
+        for claim, value in claims.items():
+            access[claim] = value
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return StatelessJWTAuthentication().authenticate(Request(request))[0]
+
+    def test_hydrates_user_from_claims_without_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            request_user = self.authenticate(self.user)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(request_user.user_id, self.user.user_id)
+        self.assertEqual(request_user.role, User.Roles.HOST)
+        self.assertTrue(request_user.is_active)
+
+    def test_rejects_token_carrying_inactive_claim(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.user, is_active=False)
+
+    def test_full_model_is_cached_and_invalidated_on_save(self):
+        request_user = self.authenticate(self.user)
+        self.assertEqual(request_user.instance, self.user)
+        with CaptureQueriesContext(connection) as queries:
+            request_user.instance
+        self.assertEqual(len(queries), 0)
+
+        self.user.first_name = 'Augusta'
+        self.user.save()
+        self.assertEqual(request_user.instance.first_name, 'Augusta')
+
+
+class PasswordHashingTests(TestCase):
+    """Tests for the configurable hashers and rehash-on-login."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(
+            email='grace@example.com',
+            password=make_password('Str0ng!Pass', hasher='pbkdf2_sha256'),
+            username='ghopper',
+            first_name='Grace',
+            last_name='Hopper',
+        )
+
+    def login(self):
+        return APIClient().post(
+            reverse('authentication:login'),
+            {'email': 'grace@example.com', 'password': 'Str0ng!Pass'},
+            format='json',
+        )
+
+    def test_login_upgrades_legacy_hash_to_preferred_hasher(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm, 'argon2')
+
+    def test_raising_cost_profile_rehashes_on_next_login(self):
+        self.login()
+        self.user.refresh_from_db()
+        with override_settings(PASSWORD_HASHER_COST='moderate'):
+            hasher = identify_hasher(self.user.password)
+            self.assertTrue(hasher.must_update(self.user.password))
+            self.login()
+            self.user.refresh_from_db()
+            self.assertFalse(identify_hasher(self.user.password).must_update(self.user.password))
+
+
+class AsyncLoginTests(TransactionTestCase):
+    """Tests for the async login view backed by the verification pool."""
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(
+            email='alan@example.com',
+            password='Str0ng!Pass',
+            username='aturing',
+            first_name='Alan',
+            last_name='Turing',
+        )
+
+    async def test_returns_tokens_for_valid_credentials(self):
+        response = await self.async_client.post(
+            reverse('authentication:login_async'),
+            {'email': 'alan@example.com', 'password': 'Str0ng!Pass'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json()['tokens'])
+
+    async def test_rejects_invalid_credentials(self):
+        response = await self.async_client.post(
+            reverse('authentication:login_async'),
+            {'email': 'alan@example.com', 'password': 'wrong'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class RegistrationTests(TestCase):
+    """Tests for registration relying on the unique constraints."""
+
+    def setUp(self):
+        cache.clear()
+
+    def register(self, **overrides):
+        payload = {
+            'first_name': 'john',
+            'last_name': 'smith',
+            'email': 'john@example.com',
+            'password': 'Str0ng!Pass',
+            'confirm_password': 'Str0ng!Pass',
+        }
+        payload.update(overrides)
+        return APIClient().post(reverse('authentication:register'), payload, format='json')
+
+    def test_registration_inserts_without_a_lookup_first(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.register(username='johnsmith')
+        self.assertEqual(response.status_code, 201)
+        statements = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('SELECT', 'INSERT'))]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT'))
+
+    def test_duplicate_email_maps_to_validation_error(self):
+        self.register()
+        response = self.register(first_name='jane')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_duplicate_chosen_username_maps_to_validation_error(self):
+        self.register(username='jsmith')
+        response = self.register(email='other@example.com', username='jsmith')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.data)
+
+    def test_generated_username_collision_picks_free_candidate(self):
+        UsernameSequence.objects.create(base='jsmith', next_suffix=100)
+        self.register(email='taken@example.com', username='jsmith100')
+        response = self.register(email='other@example.com')
+        self.assertEqual(response.status_code, 201)
+        username = response.data['authentication']['username']
+        self.assertNotEqual(username, 'jsmith100')
+        self.assertTrue(username.startswith('jsmith'))
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, CONTACT_SEED_DOMAINS={'acme.test'})
+class RegistrationSideEffectsTests(TestCase):
+    """Tests for the Celery tasks queued after a registration commits."""
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+
+    def register(self, email):
+        return APIClient().post(reverse('authentication:register'), {
+            'first_name': 'john',
+            'last_name': 'smith',
+            'email': email,
+            'password': 'Str0ng!Pass',
+            'confirm_password': 'Str0ng!Pass',
+        }, format='json')
+
+    def test_side_effects_run_only_after_commit(self):
+        colleague = User.objects.create_user(
+            email='mary@acme.test', password='x', username='mary', first_name='mary', last_name='smith',
+        )
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.register('john@acme.test')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(mail.outbox), 0)
+        for callback in callbacks:
+            callback()
+
+        user = User.objects.get(email='john@acme.test')
+        self.assertEqual([message.to for message in mail.outbox], [['john@acme.test']])
+        self.assertIsNotNone(user.welcome_email_sent_at)
+        self.assertEqual(
+            set(Contact.objects.values_list('owner_id', 'contact_id')),
+            {(user.user_id, colleague.user_id), (colleague.user_id, user.user_id)},
+        )
+        self.assertEqual(AnalyticsEvent.objects.get().name, 'user_registered')
+
+    def test_tasks_are_idempotent(self):
+        user = User.objects.create_user(
+            email='john@acme.test', password='x', username='john', first_name='john', last_name='smith',
+        )
+        User.objects.create_user(
+            email='mary@acme.test', password='x', username='mary', first_name='mary', last_name='smith',
+        )
+        for _ in range(2):
+            tasks.send_welcome_email.delay(str(user.user_id))
+            tasks.seed_contacts.delay(str(user.user_id))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Contact.objects.count(), 2)
+
+    def test_contacts_are_seeded_only_for_listed_domains(self):
+        user = User.objects.create_user(
+            email='john@Mail.test', password='x', username='john', first_name='john', last_name='smith',
+        )
+        User.objects.create_user(
+            email='mary@mail.test', password='x', username='mary', first_name='mary', last_name='smith',
+        )
+        self.assertEqual(user.email_domain, 'mail.test')
+        self.assertEqual(tasks.seed_contacts(str(user.user_id)), 0)
+        with override_settings(CONTACT_SEED_DOMAINS={'mail.test'}):
+            self.assertEqual(tasks.seed_contacts(str(user.user_id)), 1)
+
+    def test_failed_welcome_email_is_retried(self):
+        user = User.objects.create_user(
+            email='john@acme.test', password='x', username='john', first_name='john', last_name='smith',
+        )
+        with mock.patch.object(tasks, 'send_mail', side_effect=[ConnectionRefusedError, 1]) as send:
+            result = tasks.send_welcome_email.apply(args=[str(user.user_id)])
+        self.assertTrue(result.get())
+        self.assertEqual(send.call_count, 2)
+
+    def test_analytics_events_are_coalesced_into_one_flush(self):
+        with mock.patch.object(tasks, 'publish') as publish:
+            for i in range(3):
+                tasks.track_event('user_registered', role=f'role{i}')
+        publish.assert_called_once_with(tasks.flush_analytics_events, countdown=5)
+
+        self.assertEqual(tasks.flush_analytics_events(), 3)
+        self.assertEqual(tasks.flush_analytics_events(), 0)
+        self.assertEqual(AnalyticsEvent.objects.count(), 3)
+
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+    def test_analytics_events_skip_a_buffer_the_worker_cannot_read(self):
+        with mock.patch.object(tasks, 'publish') as publish:
+            tasks.track_event('user_registered', role='guest')
+        publish.assert_not_called()
+        self.assertEqual(AnalyticsEvent.objects.get().properties, {'role': 'guest'})
+        self.assertEqual(tasks.flush_analytics_events(), 0)
+
+class TokenRevocationTests(TestCase):
+    """Tests for refresh-token rotation, logout and logout everywhere."""
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        self.user = User.objects.create_user(
+            email='john@example.com', password='x', username='john', first_name='john', last_name='smith',
+        )
+        self.tokens = get_tokens_for_user(self.user)
+
+    def client_for(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client
+
+    def refresh(self, refresh):
+        return APIClient().post(reverse('authentication:token_refresh'), {'refresh': refresh}, format='json')
+
+    def is_accepted(self, access):
+        return self.client_for(access).get(reverse('chats:conversations')).status_code == 200
+
+    def test_refresh_rotates_and_old_token_cannot_be_reused(self):
+        with self.assertNumQueries(0):
+            response = self.refresh(self.tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['tokens']['refresh'], self.tokens['refresh'])
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(response.data['tokens']['refresh']).status_code, 200)
+
+    def test_logout_revokes_the_session_tokens(self):
+        other_session = get_tokens_for_user(self.user)
+        response = self.client_for(self.tokens['access']).post(
+            reverse('authentication:logout'), {'refresh': self.tokens['refresh']}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.is_accepted(self.tokens['access']))
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertTrue(self.is_accepted(other_session['access']))
+
+    def test_logout_rejects_another_users_refresh_token(self):
+        other = User.objects.create_user(
+            email='mary@example.com', password='x', username='mary', first_name='mary', last_name='smith',
+        )
+        response = self.client_for(self.tokens['access']).post(
+            reverse('authentication:logout'), {'refresh': get_tokens_for_user(other)['refresh']}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_logout_everywhere_revokes_earlier_tokens_only(self):
+        with mock.patch('rest_framework_simplejwt.tokens.aware_utcnow', return_value=timezone.now() - timedelta(seconds=2)):
+            earlier = get_tokens_for_user(self.user)
+        response = self.client_for(earlier['access']).post(reverse('authentication:logout_all'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.is_accepted(earlier['access']))
+        self.assertEqual(self.refresh(earlier['refresh']).status_code, 401)
+        self.assertTrue(self.is_accepted(get_tokens_for_user(self.user)['access']))
+
+    def test_deactivating_a_user_revokes_their_tokens(self):
+        self.user.is_active = False
+        with mock.patch('apps.authentication.revocation.time.time', return_value=time.time() + 2):
+            self.user.save()
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+
+    def test_changing_the_role_revokes_tokens_carrying_the_old_one(self):
+        admin = User.objects.create_user(
+            email='ada@example.com', password='x', username='ada', first_name='ada', last_name='smith',
+            role=User.Roles.ADMIN,
+        )
+        tokens = get_tokens_for_user(admin)
+        admin = User.objects.get(pk=admin.pk)
+        admin.role = User.Roles.GUEST
+        with mock.patch('apps.authentication.revocation.time.time', return_value=time.time() + 2):
+            admin.save()
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    def test_saving_other_fields_keeps_tokens_valid(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'johnny'
+        with mock.patch('apps.authentication.revocation.time.time', return_value=time.time() + 2):
+            user.save()
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 200)
+
+class UserListSerializationTests(TestCase):
+    """Tests for the compiled list path of UserSerializer."""
+
+    def test_renders_the_same_json_as_the_regular_list_serializer(self):
+        for i in range(3):
+            User.objects.create_user(
+                email=f'user{i}@example.com', password='x', username=f'user{i}', first_name='john',
+                last_name=f'smith{i}', phone_number=None if i else '+15550100',
+            )
+        users = list(User.objects.order_by('email'))
+
+        class StockUserSerializer(UserSerializer):
+            class Meta(UserSerializer.Meta):
+                list_serializer_class = ListSerializer
+
+        self.assertEqual(
+            FastJSONRenderer().render(UserSerializer(users, many=True).data),
+            JSONRenderer().render(StockUserSerializer(users, many=True).data),
+        )
+
+
+class UsernameAllocatorTests(TestCase):
+    """Tests for counter-based username allocation."""
+
+    def test_allocates_consecutive_usernames_per_base(self):
+        allocated = [username_allocator.allocate('John', 'Smith') for _ in range(3)]
+        self.assertEqual(allocated, ['jsmith100', 'jsmith101', 'jsmith102'])
+        self.assertEqual(username_allocator.allocate('Jane', 'Doe'), 'jdoe100')
+
+    def test_seeds_counter_past_existing_usernames(self):
+        User.objects.create(email='a@example.com', username='jsmith512', first_name='J', last_name='Smith')
+        User.objects.create(email='b@example.com', username='jsmithson7', first_name='J', last_name='Smithson')
+        self.assertEqual(username_allocator.allocate('John', 'Smith'), 'jsmith513')
+
+    def test_suffix_grows_wider_after_three_digits(self):
+        UsernameSequence.objects.create(base='jsmith', next_suffix=999)
+        self.assertEqual(username_allocator.allocate('John', 'Smith'), 'jsmith999')
+        self.assertEqual(username_allocator.allocate('John', 'Smith'), 'jsmith1000')
+
+    def test_allocation_cost_does_not_depend_on_existing_users(self):
+        username_allocator.allocate('John', 'Smith')
+        User.objects.bulk_create([
+            User(email=f'{i}@example.com', username=f'jsmith{i}', first_name='J', last_name='Smith')
+            for i in range(101, 600)
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            username_allocator.allocate('John', 'Smith')
+        statements = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('SELECT', 'UPDATE'))]
+        self.assertEqual(len(statements), 2)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersCommandTests(TestCase):
+    """Tests for the bulk user import command."""
+
+    def write_records(self, records):
+        handle, path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(handle, 'w') as source:
+            for record in records:
+                source.write(json.dumps(record) + '\n')
+        self.addCleanup(os.remove, path)
+        self.addCleanup(lambda: os.path.exists(f'{path}.checkpoint') and os.remove(f'{path}.checkpoint'))
+        return path
+
+    def test_imports_normalized_users_and_resumes_from_checkpoint(self):
+        User.objects.create(email='dup@example.com', username='dup', first_name='D', last_name='Up')
+        path = self.write_records([
+            {'email': 'one@example.com', 'first_name': 'mary ann', 'last_name': 'smith', 'password': 'Secret!123'},
+            {'email': 'dup@example.com', 'first_name': 'd', 'last_name': 'up', 'password': 'Secret!123'},
+            {'email': 'two@example.com', 'first_name': 'joe', 'last_name': 'bloggs',
+             'password_hash': make_password('Secret!123')},
+            {'email': '', 'first_name': 'no', 'last_name': 'email'},
+        ])
+        call_command('import_users', path, batch_size=2, workers=1, stdout=io.StringIO(), stderr=io.StringIO())
+
+        imported = User.objects.get(email='one@example.com')
+        self.assertEqual(imported.first_name, 'Mary Ann')
+        self.assertEqual(imported.username, 'msmith100')
+        self.assertTrue(imported.check_password('Secret!123'))
+        self.assertTrue(User.objects.get(email='two@example.com').check_password('Secret!123'))
+        self.assertEqual(User.objects.count(), 3)
+
+        with open(f'{path}.checkpoint') as checkpoint:
+            self.assertEqual(json.load(checkpoint)['processed'], 4)
+        call_command('import_users', path, resume=True, workers=1, stdout=io.StringIO())
+        self.assertEqual(User.objects.count(), 3)
+
+    def test_checkpoint_counts_only_the_batches_it_covers(self):
+        path = self.write_records([
+            {'email': 'one@example.com', 'first_name': 'o', 'last_name': 'ne', 'password': 'Secret!123'},
+            {'email': '', 'first_name': 'no', 'last_name': 'email'},
+        ])
+        checkpoints = []
+        save_checkpoint = ImportUsersCommand.save_checkpoint
+
+        def record_checkpoint(command, checkpoint_path):
+            checkpoints.append(dict(command.stats))
+            save_checkpoint(command, checkpoint_path)
+
+        with mock.patch.object(ImportUsersCommand, 'save_checkpoint', record_checkpoint):
+            call_command('import_users', path, batch_size=1, workers=1, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(
+            [(stats['processed'], stats['created'], stats['invalid']) for stats in checkpoints],
+            [(1, 1, 0), (2, 1, 1)],
+        )
+
+    def test_counts_username_conflicts_rejects_unknown_roles_and_hides_records(self):
+        User.objects.create(email='taken@example.com', username='taken', first_name='T', last_name='Aken')
+        path = self.write_records([
+            {'email': 'new@example.com', 'username': 'taken', 'first_name': 'n', 'last_name': 'ew',
+             'password': 'Secret!123'},
+            {'email': 'boss@example.com', 'first_name': 'b', 'last_name': 'oss', 'role': 'superuser',
+             'password': 'Secret!123'},
+            {'email': 'nameless@example.com', 'first_name': '', 'last_name': 'x', 'password': 'Hunter2!pass'},
+        ])
+        stderr = io.StringIO()
+        call_command('import_users', path, workers=1, stdout=io.StringIO(), stderr=stderr)
+
+        self.assertEqual(User.objects.count(), 1)
+        with open(f'{path}.checkpoint') as checkpoint:
+            stats = json.load(checkpoint)
+        self.assertEqual((stats['created'], stats['skipped'], stats['invalid']), (0, 1, 2))
+        self.assertIn('Invalid record 2: missing or invalid role', stderr.getvalue())
+        self.assertIn('Invalid record 3: missing or invalid first_name', stderr.getvalue())
+        self.assertNotIn('Hunter2', stderr.getvalue())
@@ -6,5 +6,9 @@ app_name = 'authentication'
 urlpatterns = [
     path('register/', views.create_user_and_get_tokens, name='register'),
     path('login/', views.login_user_and_get_tokens, name='login'),
+    path('login/async/', views.login_user_and_get_tokens_async, name='login_async'),
+    path('token/refresh/', views.refresh_tokens, name='token_refresh'),
+    path('logout/', views.logout_user, name='logout'),
+    path('logout-all/', views.logout_user_everywhere, name='logout_all'),
     path('generate-password/', views.generate_strong_password, name='generate_password'),
 ]
\ No newline at end of file
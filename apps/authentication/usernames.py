@@ -0,0 +1,83 @@
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from apps.authentication.models import User, UsernameSequence
+
+USERNAME_MAX_LENGTH = User._meta.get_field('username').max_length
+
+
+class UsernameAllocator:
+    """
+    Hand out ``<initial><lastname><n>`` usernames from a per-base counter.
+
+    Each allocation is one UPDATE and one primary-key SELECT on
+    ``UsernameSequence``, so the cost stays constant however many users share
+    a base. Suffixes start at ``start_suffix`` and simply grow wider once the
+    three-digit range is used up. The first allocation for a base seeds the
+    counter past any numbered usernames that already exist.
+    """
+    start_suffix = 100
+    # Leave room for up to eight suffix digits within the username column.
+    max_base_length = USERNAME_MAX_LENGTH - 8
+    # How many suffixes to probe at once when an allocated name is taken.
+    probe_size = 20
+
+    def base_for(self, first_name, last_name):
+        """Return the username base for a first and last name."""
+        base = re.sub(r'[^0-9a-z]', '', (first_name[:1] + last_name).lower())
+        return (base or 'user')[:self.max_base_length]
+
+    def allocate(self, first_name, last_name):
+        """Return the next username for the name, without checking the users table."""
+        base = self.base_for(first_name, last_name)
+        return f'{base}{self.reserve(base, 1)}'
+
+    def allocate_free(self, first_name, last_name):
+        """
+        Return a username for the name that is not taken right now.
+
+        Used after an allocated name collided with a username created outside
+        the allocator: a block of suffixes is reserved and checked in a single
+        query.
+        """
+        base = self.base_for(first_name, last_name)
+        while True:
+            first = self.reserve(base, self.probe_size)
+            candidates = [f'{base}{suffix}' for suffix in range(first, first + self.probe_size)]
+            taken = set(User.objects.filter(username__in=candidates).values_list('username', flat=True))
+            for candidate in candidates:
+                if candidate not in taken:
+                    return candidate
+
+    def reserve(self, base, count):
+        """Atomically reserve ``count`` consecutive suffixes for ``base`` and return the first."""
+        with transaction.atomic():
+            updated = UsernameSequence.objects.filter(base=base).update(next_suffix=F('next_suffix') + count)
+            if updated:
+                return UsernameSequence.objects.values_list('next_suffix', flat=True).get(base=base) - count
+
+        first = self.initial_suffix(base)
+        try:
+            with transaction.atomic():
+                UsernameSequence.objects.create(base=base, next_suffix=first + count)
+            return first
+        except IntegrityError:
+            # Another request seeded the counter first; take the normal path.
+            return self.reserve(base, count)
+
+    def initial_suffix(self, base):
+        """Return the first suffix above every existing ``<base><digits>`` username."""
+        pattern = re.compile(rf'^{re.escape(base)}(\d+)$')
+        suffixes = [
+            int(match.group(1))
+            for match in map(pattern.match, User.objects.filter(
+                username__startswith=base,
+            ).values_list('username', flat=True).iterator())
+            if match
+        ]
+        return max(max(suffixes, default=0) + 1, self.start_suffix)
+
+
+username_allocator = UsernameAllocator()
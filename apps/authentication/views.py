@@ -1,16 +1,31 @@
-from drf_yasg.utils import swagger_auto_schema
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import AllowAny
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from apps.authentication.serializers import CreateUserSerializer, UserSerializer, UserLoginSerializer, PasswordGenerateSerializer
+from apps.authentication.hashers import run_in_verify_pool
+from apps.authentication.revocation import revoke_token, revoke_user_tokens
+from apps.authentication.serializers import CreateUserSerializer, UserSerializer, UserLoginSerializer, PasswordGenerateSerializer, LogoutSerializer, TokenRotateSerializer
+from apps.authentication.tasks import queue_registration_side_effects
+from config.schema import swagger_auto_schema
+from core.parsers import FastJSONParser
+from core.throttling import AuthEmailThrottle, AuthIPThrottle, PasswordGenerateThrottle
 
 
 def get_tokens_for_user(user):
     """Generate JWT tokens for a given authentication."""
     refresh = RefreshToken.for_user(user)
+    # Claims are copied to the access token and let StatelessJWTAuthentication
+    # build the request user without a database query.
+    refresh['role'] = user.role
+    refresh['is_active'] = user.is_active
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -28,12 +43,14 @@ def get_tokens_for_user(user):
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthIPThrottle, AuthEmailThrottle])
 def create_user_and_get_tokens(request):
     """Create a new authentication and return JWT tokens."""
 
     serializer = CreateUserSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
+        queue_registration_side_effects(user)
         tokens = get_tokens_for_user(user)
         user_data = UserSerializer(user).data
         return Response({
@@ -57,6 +74,7 @@ def create_user_and_get_tokens(request):
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthIPThrottle, AuthEmailThrottle])
 def login_user_and_get_tokens(request):
     """Authenticate authentication and return JWT tokens."""
 
@@ -74,6 +92,117 @@ def login_user_and_get_tokens(request):
         }, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@swagger_auto_schema(
+    method='post',
+    request_body=TokenRotateSerializer,
+    responses={
+        200: 'New access and refresh tokens.',
+        401: 'Invalid, expired or revoked refresh token.',
+    },
+    operation_description='Exchange a refresh token for new tokens. The refresh token can only be used once.',
+    tags=['Authentication']
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@throttle_classes([AuthIPThrottle])
+def refresh_tokens(request):
+    """Rotate a refresh token and return new JWT tokens."""
+
+    serializer = TokenRotateSerializer(data=request.data)
+    if serializer.is_valid():
+        return Response({
+            'status_code': status.HTTP_200_OK,
+            'status': 'success',
+            'message': 'Tokens refreshed successfully.',
+            'tokens': serializer.validated_data,
+        }, status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='post',
+    request_body=LogoutSerializer,
+    responses={
+        200: 'Logout successful.',
+        400: 'Bad request.',
+    },
+    operation_description='Revoke the refresh token and the access token of the current session.',
+    tags=['Authentication']
+)
+@api_view(['POST'])
+def logout_user(request):
+    """Revoke the tokens of the current session."""
+
+    serializer = LogoutSerializer(data=request.data, context={'request': request})
+    if serializer.is_valid():
+        revoke_token(serializer.validated_data['refresh'])
+        revoke_token(request.auth)
+        return Response({
+            'status_code': status.HTTP_200_OK,
+            'status': 'success',
+            'message': 'Logout successful.',
+        }, status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='post',
+    responses={200: 'Logged out of every session.'},
+    operation_description='Revoke every token issued to the current user so far.',
+    tags=['Authentication']
+)
+@api_view(['POST'])
+def logout_user_everywhere(request):
+    """Revoke every token of the current user."""
+
+    revoke_user_tokens(request.user.user_id)
+    return Response({
+        'status_code': status.HTTP_200_OK,
+        'status': 'success',
+        'message': 'Logged out of all sessions.',
+    }, status=status.HTTP_200_OK)
+
+def get_throttle_wait(request, throttles):
+    """Return the seconds to wait if any throttle rejects the request, otherwise None."""
+    waits = [throttle.wait() for throttle in (cls() for cls in throttles)
+             if not throttle.allow_request(request, None)]
+    return max(waits) if waits else None
+
+@csrf_exempt
+@require_POST
+async def login_user_and_get_tokens_async(request):
+    """
+    Authenticate authentication and return JWT tokens without blocking the event loop.
+
+    Credential checking, including the password hash and any rehash-on-login
+    save, runs in the bounded verification pool so a login storm cannot stall
+    other requests served by the same ASGI worker.
+    """
+
+    drf_request = Request(request, parsers=[FastJSONParser()])
+    try:
+        data = drf_request.data
+    except APIException as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+
+    wait = await sync_to_async(get_throttle_wait)(drf_request, [AuthIPThrottle, AuthEmailThrottle])
+    if wait is not None:
+        response = JsonResponse({'detail': 'Request was throttled.'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(int(wait) + 1)
+        return response
+
+    serializer = UserLoginSerializer(data=data, context={'request': request})
+    if await run_in_verify_pool(serializer.is_valid):
+        user = serializer.validated_data['authentication']
+        tokens = get_tokens_for_user(user)
+        user_data = UserSerializer(user).data
+        return JsonResponse({
+            'status_code': status.HTTP_200_OK,
+            'status': 'success',
+            'message': 'Login successful.',
+            'authentication': user_data,
+            'tokens': tokens,
+        }, status=status.HTTP_200_OK)
+    return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 @swagger_auto_schema(
     method='post',
     request_body=PasswordGenerateSerializer,
@@ -86,6 +215,7 @@ def login_user_and_get_tokens(request):
 )
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([PasswordGenerateThrottle])
 def generate_strong_password(request):
     """Generate a strong random password."""
 
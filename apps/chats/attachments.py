@@ -0,0 +1,276 @@
+import fcntl
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
+
+from apps.chats.models import Attachment, AttachmentBlob, AttachmentUpload
+
+# Bytes read from the request or a file per step; this is what bounds the
+# memory an upload or download holds at once.
+BUFFER_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+MAX_CACHED_HASHERS = 1000
+
+
+class UploadConflict(Exception):
+    """The chunk does not start at the upload's current offset, or another request is writing it."""
+
+    def __init__(self, offset):
+        super().__init__(offset)
+        self.offset = offset
+
+
+class ChunkTooLarge(Exception):
+    """The chunk is larger than ``ATTACHMENT_CHUNK_SIZE`` or runs past the declared size."""
+
+
+def storage_path(*parts):
+    return os.path.join(settings.ATTACHMENT_STORAGE_ROOT, *parts)
+
+
+def blob_path(sha256):
+    """Return where a blob lives: content-addressed, fanned out over two directory levels."""
+    return storage_path('blobs', sha256[:2], sha256[2:4], sha256)
+
+
+def part_path(upload_id):
+    return storage_path('uploads', f'{upload_id}.part')
+
+
+class HasherCache:
+    """
+    Running SHA-256 states of uploads in progress, keyed by upload id.
+
+    A hash object cannot be saved between requests, so each process keeps the
+    ones it has seen. When a chunk lands on a process without the state, or
+    with a state for a different offset, it is rebuilt by streaming the part
+    file once, which keeps memory flat at the cost of one extra read.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_HASHERS):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, upload):
+        with self.lock:
+            entry = self.entries.pop(upload.upload_id, None)
+        if entry is not None and entry[0] == upload.received:
+            return entry[1]
+        hasher = hashlib.sha256()
+        if upload.received:
+            with open(part_path(upload.upload_id), 'rb') as part:
+                remaining = upload.received
+                while remaining:
+                    block = part.read(min(BUFFER_SIZE, remaining))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    remaining -= len(block)
+        return hasher
+
+    def put(self, upload_id, offset, hasher):
+        with self.lock:
+            self.entries[upload_id] = (offset, hasher)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, upload_id):
+        with self.lock:
+            self.entries.pop(upload_id, None)
+
+
+hashers = HasherCache()
+
+
+def start_upload(conversation, owner_id, filename, content_type, size):
+    upload = AttachmentUpload.objects.create(
+        conversation=conversation, owner_id=owner_id, filename=filename, content_type=content_type, size=size,
+    )
+    os.makedirs(os.path.dirname(part_path(upload.upload_id)), exist_ok=True)
+    open(part_path(upload.upload_id), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Append ``length`` bytes read from ``stream`` at ``offset`` and return the
+    new offset. Raises ``UploadConflict`` if the client is out of step.
+
+    The part file is locked for the duration, so two requests for the same
+    upload cannot interleave their writes. Data is copied through a fixed
+    buffer and hashed on the way.
+    """
+    if length > settings.ATTACHMENT_CHUNK_SIZE or offset + length > upload.size:
+        raise ChunkTooLarge()
+    with open(part_path(upload.upload_id), 'r+b') as part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadConflict(upload.received) from None
+        upload.refresh_from_db(fields=['received'])
+        if offset != upload.received:
+            raise UploadConflict(upload.received)
+        hasher = hashers.take(upload)
+        # Drop bytes a failed request may have left past the committed offset.
+        part.truncate(offset)
+        part.seek(offset)
+        remaining = length
+        while remaining:
+            block = stream.read(min(BUFFER_SIZE, remaining))
+            if not block:
+                break
+            part.write(block)
+            hasher.update(block)
+            remaining -= len(block)
+        written = length - remaining
+        part.flush()
+        AttachmentUpload.objects.filter(pk=upload.pk).update(received=offset + written)
+        upload.received = offset + written
+        hashers.put(upload.upload_id, upload.received, hasher)
+        if remaining:
+            raise UploadConflict(upload.received)
+        if upload.received == upload.size:
+            os.fsync(part.fileno())
+            return finish_upload(upload, hasher.hexdigest())
+    return None
+
+
+@contextmanager
+def blob_lock(sha256):
+    """
+    Hold an exclusive lock over the blobs sharing ``sha256``'s first two hex
+    digits, across processes, so a blob cannot be reused by an upload while
+    it is being removed as an orphan.
+    """
+    directory = storage_path('blobs', sha256[:2])
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def finish_upload(upload, sha256):
+    """
+    Store the completed upload's content once and create its ``Attachment``.
+
+    The part file is linked into place, not moved, and only removed once the
+    attachment has committed: if anything fails, the upload is left complete
+    and intact, and an empty chunk at its final offset finishes it again.
+    """
+    source = part_path(upload.upload_id)
+    target = blob_path(sha256)
+    linked = False
+    with blob_lock(sha256):
+        try:
+            with transaction.atomic():
+                AttachmentBlob.objects.get_or_create(sha256=sha256, defaults={'size': upload.size})
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.link(source, target)
+                    linked = True
+                attachment = Attachment.objects.create(
+                    conversation_id=upload.conversation_id,
+                    uploader_id=upload.owner_id,
+                    blob_id=sha256,
+                    filename=upload.filename,
+                    content_type=upload.content_type,
+                )
+                upload.delete()
+        except BaseException:
+            if linked:
+                os.remove(target)
+            raise
+    os.remove(source)
+    hashers.discard(upload.upload_id)
+    return attachment
+
+
+def remove_stale_uploads(max_age=None):
+    """Delete uploads untouched for ``max_age`` seconds and their part files; return how many."""
+    max_age = settings.ATTACHMENT_UPLOAD_TTL if max_age is None else max_age
+    stale = list(AttachmentUpload.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(seconds=max_age),
+    ).values_list('upload_id', flat=True))
+    for upload_id in stale:
+        AttachmentUpload.objects.filter(upload_id=upload_id).delete()
+        hashers.discard(upload_id)
+        try:
+            os.remove(part_path(upload_id))
+        except FileNotFoundError:
+            pass
+    return len(stale)
+
+
+def remove_orphan_blobs():
+    """Delete blobs no attachment refers to any more; return how many."""
+    removed = 0
+    for sha256 in AttachmentBlob.objects.filter(attachments__isnull=True).values_list('sha256', flat=True):
+        # Under the lock ``finish_upload`` takes, so the row and its file go
+        # together and an upload reusing the blob waits for both or neither.
+        with blob_lock(sha256):
+            try:
+                with transaction.atomic():
+                    deleted, _ = AttachmentBlob.objects.filter(sha256=sha256, attachments__isnull=True).delete()
+            except ProtectedError:
+                # An upload reused the blob since it was listed.
+                continue
+            if deleted:
+                try:
+                    os.remove(blob_path(sha256))
+                except FileNotFoundError:
+                    pass
+                removed += 1
+    return removed
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single ``bytes=`` range, ``None``
+    to serve the whole file, or raise ``ValueError`` if it is unsatisfiable.
+    Multiple ranges are answered with the whole file, which RFC 9110 allows.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError('Empty suffix range.')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable.')
+    return start, end
+
+
+class FileRange:
+    """File-like view of ``length`` bytes of an open file, read in fixed-size blocks."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import uuid
+from collections import deque
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.authentication.revocation import is_token_revoked
+from apps.chats.fanout import user_group
+from apps.chats.layers import get_channel_layer
+from apps.chats.presence import get_presence_tracker, presence_group, visible_user_ids
+
+# Close codes in the 4000-4999 range are reserved for applications.
+CLOSE_UNAUTHORIZED = 4401
+# Policy violation: the client does not read frames as fast as they arrive.
+CLOSE_SLOW_CONSUMER = 1008
+
+
+def get_token_from_scope(scope):
+    """Return the raw JWT from the ``token`` query parameter or the subprotocol header."""
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    if query.get('token'):
+        return query['token'][0]
+    # Browsers cannot set an Authorization header on a WebSocket handshake, so
+    # clients may send ``Sec-WebSocket-Protocol: bearer, <token>`` instead.
+    for name, value in scope.get('headers', ()):
+        if name == b'sec-websocket-protocol':
+            protocols = [part.strip() for part in value.decode('latin-1').split(',')]
+            if len(protocols) == 2 and protocols[0].lower() == 'bearer':
+                return protocols[1]
+    return None
+
+
+def authenticate_scope(scope):
+    """Return the user id from a valid access token in the scope, or ``None``."""
+    raw_token = get_token_from_scope(scope)
+    if not raw_token:
+        return None
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+    if is_token_revoked(token):
+        return None
+    return token.get(api_settings.USER_ID_CLAIM)
+
+
+def parse_uuids(values):
+    """Return the valid UUIDs in ``values`` as strings, ignoring anything else."""
+    if not isinstance(values, list):
+        return []
+    parsed = []
+    for value in values:
+        try:
+            parsed.append(str(uuid.UUID(str(value))))
+        except ValueError:
+            continue
+    return parsed
+
+
+def get_member_ids(conversation_id):
+    """Return the user ids of a conversation's members."""
+    from apps.chats.models import ConversationMember
+
+    return [str(user_id) for user_id in ConversationMember.objects.filter(
+        conversation_id=conversation_id,
+    ).values_list('user_id', flat=True)]
+
+
+class ChatConsumer:
+    """
+    ASGI WebSocket consumer that pushes new chat messages to a connected user.
+
+    Authentication only verifies the access token signature and reads the
+    ``user_id`` claim, so connecting does not touch the database. An idle
+    connection costs one coroutine and one channel layer group entry; a writer task
+    only exists while there are frames waiting to be sent.
+
+    Clients keep their presence alive with ``ping`` frames, may subscribe to
+    other users' presence transitions, and send ``typing`` frames while
+    composing. Only the first ``typing`` frame of a burst reads the
+    conversation members from the database.
+
+    A client that falls ``CHAT_WS_MAX_OUTBOX`` frames behind is closed
+    rather than buffered for without bound.
+    """
+
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.user_id = None
+        self.layer = get_channel_layer()
+        self.outbox = deque()
+        self.max_outbox = settings.CHAT_WS_MAX_OUTBOX
+        self.writer = None
+        self.closer = None
+        self.closed = False
+        self.tracker = get_presence_tracker()
+        self.subscriptions = set()
+
+    async def __call__(self):
+        event = await self.receive()
+        if event['type'] != 'websocket.connect':
+            return
+
+        self.user_id = authenticate_scope(self.scope)
+        if self.user_id is None:
+            await self.send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+            return
+
+        accept = {'type': 'websocket.accept'}
+        if 'bearer' in self.scope.get('subprotocols', ()):
+            accept['subprotocol'] = 'bearer'
+        await self.send(accept)
+        await self.layer.group_add(user_group(self.user_id), self)
+        self.tracker.heartbeat(self.user_id)
+        try:
+            while True:
+                event = await self.receive()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive':
+                    await self.handle_frame(event.get('text'))
+        finally:
+            self.closed = True
+            await self.layer.group_discard(user_group(self.user_id), self)
+            for user_id in self.subscriptions:
+                await self.layer.group_discard(presence_group(user_id), self)
+            if self.writer is not None:
+                self.writer.cancel()
+
+    async def handle_frame(self, text):
+        """Handle a frame sent by the client."""
+        try:
+            data = json.loads(text or '')
+        except ValueError:
+            return
+        if not isinstance(data, dict):
+            return
+        kind = data.get('type')
+        if kind == 'ping':
+            self.tracker.heartbeat(self.user_id)
+            self.push(json.dumps({'type': 'pong'}))
+        elif kind == 'presence.subscribe':
+            await self.subscribe(parse_uuids(data.get('user_ids')))
+        elif kind == 'presence.unsubscribe':
+            for user_id in parse_uuids(data.get('user_ids')):
+                if user_id in self.subscriptions:
+                    self.subscriptions.discard(user_id)
+                    await self.layer.group_discard(presence_group(user_id), self)
+        elif kind == 'typing':
+            await self.handle_typing(data)
+
+    async def subscribe(self, user_ids):
+        """Follow the presence of ``user_ids`` that are visible to this user and reply with their current state."""
+        room = settings.PRESENCE_MAX_SUBSCRIPTIONS - len(self.subscriptions)
+        user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id not in self.subscriptions][:room]
+        if not user_ids:
+            return
+        user_ids = await sync_to_async(visible_user_ids)(self.user_id, user_ids)
+        if not user_ids:
+            return
+        for user_id in user_ids:
+            self.subscriptions.add(user_id)
+            await self.layer.group_add(presence_group(user_id), self)
+        presence = await sync_to_async(self.tracker.get_presence)(user_ids)
+        self.push(self.layer.encode({'type': 'presence.snapshot', 'presence': presence}))
+
+    async def handle_typing(self, data):
+        conversation_ids = parse_uuids([data.get('conversation_id')])
+        if not conversation_ids:
+            return
+        conversation_id = conversation_ids[0]
+        if not data.get('typing', True):
+            self.tracker.set_typing(conversation_id, self.user_id, typing=False)
+            return
+        member_ids = None
+        if not self.tracker.is_typing(conversation_id, self.user_id):
+            member_ids = await sync_to_async(get_member_ids)(conversation_id)
+            if str(self.user_id) not in member_ids:
+                return
+        self.tracker.set_typing(conversation_id, self.user_id, member_ids)
+
+    def push(self, text):
+        """Queue a text frame for delivery, preserving order."""
+        if self.closed:
+            return
+        if len(self.outbox) >= self.max_outbox:
+            self.close_slow_consumer()
+            return
+        self.outbox.append(text)
+        if self.writer is None:
+            self.writer = asyncio.get_running_loop().create_task(self.drain())
+
+    def close_slow_consumer(self):
+        """Drop the queued frames and close the connection; the receive loop then sees the disconnect."""
+        self.closed = True
+        self.outbox.clear()
+        if self.writer is not None:
+            self.writer.cancel()
+        self.closer = asyncio.get_running_loop().create_task(
+            self.send({'type': 'websocket.close', 'code': CLOSE_SLOW_CONSUMER}),
+        )
+
+    async def drain(self):
+        """Send queued frames until the outbox is empty."""
+        try:
+            while self.outbox:
+                await self.send({'type': 'websocket.send', 'text': self.outbox.popleft()})
+        except Exception:
+            # The peer went away mid-send; the receive loop will see the disconnect.
+            self.outbox.clear()
+        finally:
+            self.writer = None
@@ -0,0 +1,31 @@
+from collections import defaultdict
+
+from apps.chats.layers import get_channel_layer
+
+
+def user_group(user_id):
+    """Return the channel layer group that holds every connection of a user."""
+    return f'user.{user_id}'
+
+
+def notify_new_message(message):
+    """Push a newly stored message to every member of its conversation."""
+    notify_new_messages([message])
+
+
+def notify_new_messages(messages):
+    """Push newly stored messages to the members of their conversations, with one membership query."""
+    from apps.chats.models import ConversationMember
+    from apps.chats.serializers import MessageSerializer
+
+    groups = defaultdict(list)
+    for conversation_id, user_id in ConversationMember.objects.filter(
+        conversation_id__in={message.conversation_id for message in messages},
+    ).values_list('conversation_id', 'user_id'):
+        groups[conversation_id].append(user_group(user_id))
+    layer = get_channel_layer()
+    for message, data in zip(messages, MessageSerializer(messages, many=True).data):
+        layer.group_send(groups[message.conversation_id], {
+            'type': 'message.new',
+            'message': data,
+        })
@@ -0,0 +1,224 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.chats.fanout import notify_new_messages
+from apps.chats.models import Conversation, Message
+from apps.chats.tasks import queue_message_indexing
+from apps.chats.unread import record_new_messages
+from core.db_router import pin_to_primary
+
+logger = logging.getLogger(__name__)
+
+
+class PendingMessage:
+    """A message waiting to be stored, and the future its sender waits on."""
+
+    __slots__ = ('conversation_id', 'sender_id', 'body', 'submitted', 'future')
+
+    def __init__(self, conversation_id, sender_id, body):
+        self.conversation_id = conversation_id
+        self.sender_id = sender_id
+        self.body = body
+        self.submitted = time.monotonic()
+        self.future = Future()
+
+
+def store_messages(pending):
+    """
+    Store ``pending`` messages and return them, in order, with ``None`` for
+    any whose conversation no longer exists. Must run in a transaction.
+
+    The conversations are locked in primary key order, so batches touching
+    the same conversations cannot deadlock, and each message takes the next
+    sequence number of its conversation. The messages go in with one
+    ``INSERT``, the conversations' counters with one ``UPDATE``.
+    """
+    conversations = {
+        conversation.pk: conversation
+        for conversation in Conversation.objects.select_for_update().filter(
+            pk__in={item.conversation_id for item in pending},
+        ).order_by('pk').only('conversation_id', 'last_sequence', 'last_message_at')
+    }
+    now = timezone.now()
+    messages = []
+    for item in pending:
+        conversation = conversations.get(item.conversation_id)
+        if conversation is None:
+            messages.append(None)
+            continue
+        conversation.last_sequence += 1
+        conversation.last_message_at = now
+        messages.append(Message(
+            conversation_id=item.conversation_id,
+            sender_id=item.sender_id,
+            body=item.body,
+            created_at=now,
+            sequence=conversation.last_sequence,
+        ))
+    stored = Message.objects.bulk_create([message for message in messages if message is not None])
+    if stored and stored[0].pk is None:
+        fill_primary_keys(stored)
+    Conversation.objects.bulk_update(list(conversations.values()), ['last_sequence', 'last_message_at'])
+    record_new_messages(stored)
+    queue_message_indexing(*stored)
+    # The messages are stored whether or not the fan-out works.
+    transaction.on_commit(lambda: notify_new_messages(stored), robust=True)
+    return messages
+
+
+def fill_primary_keys(messages):
+    """
+    Set the ids of freshly inserted ``messages`` on backends whose bulk
+    inserts return no rows (MySQL), by their unique (conversation, sequence).
+    """
+    ranges = defaultdict(list)
+    for message in messages:
+        ranges[message.conversation_id].append(message.sequence)
+    condition = Q()
+    for conversation_id, sequences in ranges.items():
+        condition |= Q(conversation_id=conversation_id, sequence__gte=min(sequences), sequence__lte=max(sequences))
+    ids = {
+        (conversation_id, sequence): pk
+        for pk, conversation_id, sequence in Message.objects.filter(condition).values_list(
+            'pk', 'conversation_id', 'sequence',
+        )
+    }
+    for message in messages:
+        message.pk = ids[message.conversation_id, message.sequence]
+
+
+class MessageIngestor:
+    """
+    Group commit for new messages.
+
+    Senders ``submit`` a message and wait on the returned future. A
+    background thread collects what arrives within ``max_delay`` seconds of
+    the first message, or up to ``max_batch`` messages, and stores the batch
+    in one transaction. Futures resolve only once it has committed, so a
+    sender is never told a message was stored before it was; a failed batch
+    fails every future in it.
+
+    Batching needs concurrent senders in the same process, such as the
+    threads of a threaded WSGI worker.
+    """
+
+    def __init__(self, max_batch=None, max_delay=None, background=True):
+        self.max_batch = max_batch or settings.CHAT_INGEST_MAX_BATCH
+        self.max_delay = settings.CHAT_INGEST_MAX_DELAY_MS / 1000 if max_delay is None else max_delay
+        self.background = background
+        self.pending = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.pid = None
+
+    def submit(self, conversation_id, sender_id, body):
+        item = PendingMessage(conversation_id, sender_id, body)
+        with self.condition:
+            if self.background:
+                self.ensure_running()
+            self.pending.append(item)
+            if len(self.pending) == 1 or len(self.pending) >= self.max_batch:
+                self.condition.notify()
+        return item.future
+
+    def ensure_running(self):
+        # A thread started before a fork does not exist in the child.
+        if self.thread is None or self.pid != os.getpid() or not self.thread.is_alive():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name='message-ingestor', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            # Like a request: drop broken or expired connections around each batch.
+            close_old_connections()
+            try:
+                self.flush(batch)
+            finally:
+                close_old_connections()
+
+    def next_batch(self):
+        with self.condition:
+            while not self.pending:
+                self.condition.wait()
+            deadline = self.pending[0].submitted + self.max_delay
+            while len(self.pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            return batch
+
+    def drain(self):
+        """Store everything pending in the calling thread."""
+        while True:
+            with self.condition:
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+            if not batch:
+                return
+            self.flush(batch)
+
+    def flush(self, batch):
+        try:
+            stored = []
+            with transaction.atomic():
+                # Commit callbacks run in order: registering first resolves the
+                # futures before the fan-out and indexing callbacks run.
+                transaction.on_commit(lambda: self.resolve(batch, stored))
+                stored.extend(store_messages(batch))
+        except Exception as exc:
+            logger.exception('Storing a batch of %d messages failed.', len(batch))
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+
+    @staticmethod
+    def resolve(batch, messages):
+        for item, message in zip(batch, messages):
+            if message is None:
+                item.future.set_exception(Conversation.DoesNotExist())
+            else:
+                item.future.set_result(message)
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+def get_message_ingestor():
+    """Return the process-wide ingestor."""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = MessageIngestor()
+        return _ingestor
+
+
+def send_message(conversation_id, sender_id, body):
+    """
+    Store a message and return it once committed, through the group commit
+    when ``CHAT_INGEST_BATCHING`` is on and in a transaction of its own
+    otherwise. Raises ``Conversation.DoesNotExist`` if the conversation is gone.
+    """
+    if settings.CHAT_INGEST_BATCHING:
+        future = get_message_ingestor().submit(conversation_id, sender_id, body)
+        message = future.result(timeout=settings.CHAT_INGEST_ACK_TIMEOUT)
+        # The ingestor thread wrote it, so this request's routing never saw a write.
+        pin_to_primary()
+        return message
+    with transaction.atomic():
+        message, = store_messages([PendingMessage(conversation_id, sender_id, body)])
+    if message is None:
+        raise Conversation.DoesNotExist()
+    return message
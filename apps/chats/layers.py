@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BaseChannelLayer:
+    """
+    Group membership and broadcast for the WebSocket connections of a process.
+
+    ``group_add`` and ``group_discard`` are coroutines and run on the event
+    loop that owns the connections. ``group_send`` is thread-safe and may be
+    called from sync views, Celery tasks or the event loop itself. A connection
+    is any object with a ``push(text)`` method.
+    """
+
+    def __init__(self, **options):
+        self._groups = defaultdict(set)
+        self._loop = None
+
+    async def group_add(self, group, connection):
+        """Add a connection to a group."""
+        self._loop = asyncio.get_running_loop()
+        self._groups[group].add(connection)
+
+    async def group_discard(self, group, connection):
+        """Remove a connection from a group."""
+        connections = self._groups.get(group)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self._groups[group]
+
+    def group_send(self, groups, payload):
+        """Broadcast ``payload`` to every connection in ``groups``."""
+        raise NotImplementedError('subclasses of BaseChannelLayer must provide a group_send() method')
+
+    async def close(self):
+        """Release any resources held by the layer."""
+
+    def connection_count(self):
+        """Return the number of local group registrations."""
+        return sum(len(connections) for connections in self._groups.values())
+
+    def encode(self, payload):
+        return json.dumps(payload, cls=DjangoJSONEncoder)
+
+    def deliver_local(self, groups, text):
+        """Push an encoded frame to local members of ``groups``. Runs on the event loop."""
+        for group in groups:
+            for connection in tuple(self._groups.get(group, ())):
+                connection.push(text)
+
+    def call_on_loop(self, callback, *args):
+        """
+        Run ``callback`` on the layer's event loop.
+
+        Returns False when no loop has registered a connection yet, e.g. in a
+        WSGI process that never accepts WebSockets.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            callback(*args)
+        else:
+            loop.call_soon_threadsafe(callback, *args)
+        return True
+
+
+class InMemoryChannelLayer(BaseChannelLayer):
+    """Single-process channel layer; the default, and the one used by tests."""
+
+    def group_send(self, groups, payload):
+        if isinstance(groups, str):
+            groups = [groups]
+        self.call_on_loop(self.deliver_local, list(groups), self.encode(payload))
+
+
+class RedisChannelLayer(BaseChannelLayer):
+    """
+    Channel layer that fans out across processes through Redis pub/sub.
+
+    Each group maps to a Redis channel, and a process only subscribes to the
+    channels of groups it has local members in. Publishes from the event loop
+    are buffered and flushed as one pipelined round trip every
+    ``flush_interval`` seconds or once ``batch_size`` frames are waiting.
+    Publishes from threads without a running layer loop (WSGI workers, Celery)
+    go out immediately through a sync client.
+
+    Frames of a failed flush are put back and retried after
+    ``retry_interval`` seconds. At most ``max_pending`` frames wait; the oldest
+    beyond that are dropped and counted in ``dropped_frames``.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='chats:', batch_size=100,
+                 flush_interval=0.002, retry_interval=1.0, max_pending=10_000, client=None, sync_client=None,
+                 **options):
+        super().__init__(**options)
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as exc:
+            raise ImproperlyConfigured('RedisChannelLayer requires the "redis" package.') from exc
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_pending = max_pending
+        self.dropped_frames = 0
+        self._client = client or redis.asyncio.Redis.from_url(url)
+        self._sync_client = sync_client or redis.Redis.from_url(url)
+        self._pubsub = None
+        self._listener = None
+        self._pending = []
+        self._flush_handle = None
+        # The loop only keeps weak references to tasks; these keep running flushes alive.
+        self._flush_tasks = set()
+        self._backing_off = False
+        self._lock = threading.Lock()
+
+    def channel_name(self, group):
+        return f'{self.prefix}{group}'
+
+    async def group_add(self, group, connection):
+        is_new = group not in self._groups
+        await super().group_add(group, connection)
+        if is_new:
+            if self._pubsub is None:
+                self._pubsub = self._client.pubsub()
+            await self._pubsub.subscribe(self.channel_name(group))
+            if self._listener is None:
+                self._listener = asyncio.get_running_loop().create_task(self.listen())
+
+    async def group_discard(self, group, connection):
+        await super().group_discard(group, connection)
+        if group not in self._groups and self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel_name(group))
+
+    def group_send(self, groups, payload):
+        if isinstance(groups, str):
+            groups = [groups]
+        text = self.encode(payload)
+        frames = [(self.channel_name(group), text) for group in groups]
+        if not self.call_on_loop(self.enqueue, frames):
+            with self._lock:
+                pipeline = self._sync_client.pipeline(transaction=False)
+                for channel, frame in frames:
+                    pipeline.publish(channel, frame)
+                pipeline.execute()
+
+    def enqueue(self, frames):
+        """Buffer frames for the next batched publish. Runs on the event loop."""
+        self._pending.extend(frames)
+        self.trim_pending()
+        loop = asyncio.get_running_loop()
+        if len(self._pending) >= self.batch_size and not self._backing_off:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            self.start_flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.flush_interval, self.start_flush, loop)
+
+    def start_flush(self, loop):
+        task = loop.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self.flush_done)
+
+    def flush_done(self, task):
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                'Channel layer could not publish to Redis; %d frames wait for a retry, %d dropped so far.',
+                len(self._pending), self.dropped_frames, exc_info=task.exception(),
+            )
+
+    def trim_pending(self):
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped_frames += overflow
+
+    async def flush(self):
+        """Publish every buffered frame in a single pipelined round trip."""
+        self._flush_handle = None
+        self._backing_off = False
+        frames, self._pending = self._pending, []
+        if not frames:
+            return
+        pipeline = self._client.pipeline(transaction=False)
+        for channel, frame in frames:
+            pipeline.publish(channel, frame)
+        try:
+            await pipeline.execute()
+        except Exception:
+            # Ahead of anything buffered since, so group order is kept.
+            self._pending[:0] = frames
+            self.trim_pending()
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            loop = asyncio.get_running_loop()
+            self._backing_off = True
+            self._flush_handle = loop.call_later(self.retry_interval, self.start_flush, loop)
+            raise
+
+    async def listen(self):
+        """Dispatch frames received from Redis to local group members."""
+        prefix_length = len(self.prefix)
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Channel layer lost its Redis subscription; retrying.')
+                await asyncio.sleep(1)
+                continue
+            if message is None or message['type'] != 'message':
+                continue
+            channel = message['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode('utf-8')
+            data = message['data']
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            self.deliver_local([channel[prefix_length:]], data)
+
+    async def close(self):
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception('Channel layer dropped %d frames on close.', len(self._pending))
+            self.dropped_frames += len(self._pending)
+            self._pending = []
+        finally:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
+_channel_layer = None
+
+
+def get_channel_layer():
+    """Return the process-wide channel layer configured by ``CHAT_CHANNEL_LAYER``."""
+    global _channel_layer
+    if _channel_layer is None:
+        config = settings.CHAT_CHANNEL_LAYER
+        backend = import_string(config['BACKEND'])
+        _channel_layer = backend(**config.get('OPTIONS', {}))
+    return _channel_layer
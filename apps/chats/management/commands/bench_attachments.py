@@ -0,0 +1,148 @@
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import orjson
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+
+from apps.authentication.models import User
+from apps.authentication.views import get_tokens_for_user
+from apps.chats.models import Attachment, AttachmentBlob, Conversation, ConversationMember
+
+MIB = 1024 * 1024
+
+
+class PatternStream:
+    """A request body of ``size`` bytes generated as it is read, so the client side holds no file."""
+
+    def __init__(self, size, seed):
+        self.remaining = size
+        self.block = bytes((seed + i) % 251 for i in range(65536))
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        self.remaining -= size
+        whole, part = divmod(size, len(self.block))
+        return self.block * whole + self.block[:part]
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+class Command(BaseCommand):
+    """Measure peak memory of attachment uploads and downloads across file sizes."""
+    help = (
+        'Upload and download attachments of growing sizes through the WSGI handler and report '
+        'the peak Python memory of each, which should stay flat as the files grow.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,16,64,256', help='Comma-separated file sizes in MiB.')
+        parser.add_argument('--chunk', type=int, default=8, help='Upload chunk size in MiB.')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) * MIB for size in options['sizes'].split(',')]
+        chunk = options['chunk'] * MIB
+        # Each request closes the database connection when it finishes, so
+        # the seeded rows cannot live in a transaction that is rolled back.
+        stamp = time.time_ns()
+        user = User.objects.create(email=f'bench-files-{stamp}@example.com', username=f'benchfiles{stamp % 10**8}')
+        conversation = Conversation.objects.create(title='Attachments', created_by=user)
+        ConversationMember.objects.create(conversation=conversation, user=user)
+        self.token = get_tokens_for_user(user)['access']
+        try:
+            with tempfile.TemporaryDirectory() as root, override_settings(
+                ATTACHMENT_STORAGE_ROOT=root,
+                ATTACHMENT_CHUNK_SIZE=chunk,
+                ATTACHMENT_MAX_SIZE=max(sizes),
+                INSTRUMENTATION_ENABLED=False,
+            ):
+                self.report(conversation, sizes, chunk)
+        finally:
+            blobs = list(Attachment.objects.filter(conversation=conversation).values_list('blob_id', flat=True))
+            conversation.delete()
+            AttachmentBlob.objects.filter(sha256__in=blobs, attachments__isnull=True).delete()
+            user.delete()
+
+    def report(self, conversation, sizes, chunk):
+        self.handler = WSGIHandler()
+        self.stdout.write(
+            f'{"size MiB":>9}{"chunks":>8}{"upload peak KiB":>17}{"MiB/s":>8}{"download peak KiB":>19}{"MiB/s":>8}'
+        )
+        for seed, size in enumerate(sizes):
+            upload_peak, upload_seconds, attachment_id = self.upload(conversation, size, chunk, seed)
+            download_peak, download_seconds = self.download(attachment_id, size)
+            self.stdout.write(
+                f'{size // MIB:>9}{-(-size // chunk):>8}{upload_peak / 1024:>17.0f}'
+                f'{size / MIB / upload_seconds:>8.0f}{download_peak / 1024:>19.0f}{size / MIB / download_seconds:>8.0f}'
+            )
+
+    def call(self, method, path, body=b'', length=0, **headers):
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost',
+            'HTTP_AUTHORIZATION': f'Bearer {self.token}',
+            'CONTENT_LENGTH': str(length),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+            'wsgi.input': body if hasattr(body, 'read') else io.BytesIO(body),
+            **headers,
+        }
+        result = {}
+
+        def start_response(status, response_headers):
+            result['status'] = int(status.split()[0])
+
+        return result, self.handler(environ, start_response)
+
+    def upload(self, conversation, size, chunk, seed):
+        body = orjson.dumps({'filename': f'file-{seed}.bin', 'size': size})
+        result, response = self.call(
+            'POST', reverse('chats:upload-create', args=[conversation.pk]), body, len(body),
+            CONTENT_TYPE='application/json',
+        )
+        content = b''.join(response)
+        if result['status'] != 201:
+            raise AssertionError(f'Starting the upload failed with {result["status"]}: {content[:200]!r}')
+        upload_id = orjson.loads(content)['upload']['upload_id']
+        path = reverse('chats:upload-detail', args=[upload_id])
+        stream = PatternStream(size, seed)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        for offset in range(0, size, chunk):
+            length = min(chunk, size - offset)
+            result, response = self.call(
+                'PATCH', path, stream, length, HTTP_UPLOAD_OFFSET=str(offset), CONTENT_TYPE='application/octet-stream',
+            )
+            content = b''.join(response)
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if result['status'] != 201:
+            raise AssertionError(f'Upload failed with {result["status"]}: {content[:200]!r}')
+        return peak, elapsed, orjson.loads(content)['attachment']['attachment_id']
+
+    def download(self, attachment_id, size):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result, response = self.call('GET', reverse('chats:attachment', args=[attachment_id]))
+        received = sum(len(block) for block in response)
+        response.close()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if result['status'] != 200 or received != size:
+            raise AssertionError(f'Download failed with {result["status"]} after {received} bytes.')
+        return peak, elapsed
@@ -0,0 +1,120 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.test import RequestFactory
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.chats.models import Conversation, ConversationMember, Message
+from apps.chats.serializers import ConversationSerializer
+from apps.chats.unread import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    """Compare loading an inbox with stored unread counters against counting messages."""
+    help = (
+        'Seed a user with many conversations and partly read histories, then time loading the whole inbox '
+        'with the denormalized unread counters and with a COUNT(*) per conversation.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=500)
+        parser.add_argument('--messages', type=int, default=200, help='Messages per conversation.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per strategy.')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of rolling back.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.seed(options['conversations'], options['messages'])
+            self.report(user, options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, conversations, per_conversation):
+        """Create a user in ``conversations`` two-member conversations with random read cursors."""
+        rng = random.Random(0)
+        stamp = time.time_ns()
+        reader, sender = User.objects.bulk_create([
+            User(email=f'bench-inbox-{role}-{stamp}@example.com', username=f'inbox{role}{stamp % 10**8}')
+            for role in ('reader', 'sender')
+        ])
+        started = time.perf_counter()
+        created = Conversation.objects.bulk_create([
+            Conversation(title=f'Inbox {i}', created_by=sender) for i in range(conversations)
+        ])
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user=user)
+            for conversation in created for user in (reader, sender)
+        ])
+        start = timezone.now() - timedelta(seconds=per_conversation)
+        for conversation in created:
+            Message.objects.bulk_create([
+                Message(conversation=conversation, sender=sender, body=f'message {i}', created_at=start + timedelta(seconds=i))
+                for i in range(per_conversation)
+            ])
+        # Put the reader's cursor somewhere in each history, then derive the
+        # counters the way the send path would have maintained them.
+        memberships = ConversationMember.objects.filter(user=reader).order_by('conversation_id')
+        for member in memberships:
+            read = rng.randrange(per_conversation + 1)
+            member.last_read_message = Message.objects.filter(
+                conversation_id=member.conversation_id,
+            ).order_by('created_at', 'id')[read - 1:read].first() if read else None
+        ConversationMember.objects.bulk_update(memberships, ['last_read_message'], batch_size=500)
+        reconcile_unread_counts(ConversationMember.objects.filter(user=reader))
+        self.stdout.write(
+            f'Seeded {conversations} conversations x {per_conversation} messages '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+        return reader
+
+    def report(self, user, repeat):
+        request = RequestFactory().get('/')
+        request.user = user
+
+        def stored():
+            conversations = Conversation.objects.filter(
+                memberships__user_id=user.user_id,
+            ).prefetch_related('memberships').order_by('-last_message_at', '-conversation_id')
+            return {
+                item['conversation_id']: item['unread_count']
+                for item in ConversationSerializer(conversations, many=True, context={'request': request}).data
+            }
+
+        def counted():
+            cursors = ConversationMember.objects.filter(
+                conversation=OuterRef('conversation_id'), user_id=user.user_id,
+            )
+            unread = Message.objects.filter(
+                Q(conversation=OuterRef('conversation_id')),
+                ~Q(sender_id=user.user_id),
+                Q(id__gt=Coalesce(Subquery(cursors.values('last_read_message_id')[:1]), Value(0))),
+            ).order_by().values('conversation').annotate(count=Count('id')).values('count')[:1]
+            conversations = Conversation.objects.filter(
+                memberships__user_id=user.user_id,
+            ).prefetch_related('memberships').annotate(
+                counted_unread=Coalesce(Subquery(unread), Value(0)),
+            ).order_by('-last_message_at', '-conversation_id')
+            data = ConversationSerializer(conversations, many=True, context={'request': request}).data
+            return {item['conversation_id']: conversation.counted_unread
+                    for item, conversation in zip(data, conversations)}
+
+        if stored() != counted():
+            raise AssertionError('The stored counters disagree with the counted ones.')
+
+        self.stdout.write(f'{"strategy":<22}{"median ms":>12}{"p95 ms":>12}')
+        for name, run in (('stored counters', stored), ('COUNT(*) per conv', counted)):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f'{name:<22}{statistics.median(timings):>12.3f}{p95:>12.3f}')
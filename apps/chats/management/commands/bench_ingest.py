@@ -0,0 +1,102 @@
+import random
+import statistics
+import threading
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+
+from apps.authentication.models import User
+from apps.chats.ingest import MessageIngestor, send_message
+from apps.chats.models import Conversation, ConversationMember
+
+
+class Command(BaseCommand):
+    """Compare group-committed message ingestion with a transaction per message."""
+    help = (
+        'Send messages from many concurrent threads, each committed on its own and through the group '
+        'commit, and report messages per second and acknowledgement latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--senders', type=int, default=32, help='Concurrent sending threads.')
+        parser.add_argument('--messages', type=int, default=100, help='Messages per sender.')
+        parser.add_argument('--conversations', type=int, default=50)
+        parser.add_argument('--max-batch', type=int, default=200)
+        parser.add_argument('--max-delay-ms', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            # Concurrent deferred transactions fail on SQLite instead of
+            # waiting for the write lock; the senders' connections are opened
+            # after this.
+            options_dict = connections.settings[DEFAULT_DB_ALIAS].setdefault('OPTIONS', {})
+            options_dict.setdefault('transaction_mode', 'IMMEDIATE')
+            options_dict.setdefault('timeout', 60)
+        # The senders use connections of their own, so the seeded rows are
+        # committed and deleted afterwards instead of rolled back.
+        stamp = time.time_ns()
+        users = [
+            User.objects.create(email=f'bench-ingest-{stamp}-{i}@example.com', username=f'benchingest{stamp % 10**6}{i}')
+            for i in range(4)
+        ]
+        conversations = [Conversation.objects.create(created_by=users[0]) for _ in range(options['conversations'])]
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user=user) for conversation in conversations for user in users
+        ])
+        try:
+            ingestor = MessageIngestor(max_batch=options['max_batch'], max_delay=options['max_delay_ms'] / 1000)
+            # Queuing the search indexing task needs a broker, and is not the
+            # write path being measured.
+            with mock.patch('apps.chats.ingest.queue_message_indexing'):
+                self.stdout.write(f'{"path":<14}{"msg/s":>10}{"p50 ms":>10}{"p99 ms":>10}')
+                for name, send in (
+                    ('per-row', lambda *args: send_message(*args)),
+                    ('group commit', lambda *args: ingestor.submit(*args).result(timeout=60)),
+                ):
+                    self.report(name, send, users, conversations, options)
+        finally:
+            for conversation in conversations:
+                conversation.delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def report(self, name, send, users, conversations, options):
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(options['senders'] + 1)
+
+        def sender(seed):
+            rng = random.Random(seed)
+            samples = []
+            start.wait()
+            try:
+                for i in range(options['messages']):
+                    conversation = rng.choice(conversations)
+                    user = rng.choice(users)
+                    started = time.perf_counter()
+                    send(conversation.pk, user.user_id, f'benchmark message {i}')
+                    samples.append((time.perf_counter() - started) * 1000)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                close_old_connections()
+                with lock:
+                    latencies.extend(samples)
+
+        threads = [threading.Thread(target=sender, args=(seed,)) for seed in range(options['senders'])]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise errors[0]
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{name:<14}{len(latencies) / elapsed:>10.0f}{statistics.median(latencies):>10.2f}{p99:>10.2f}'
+        )
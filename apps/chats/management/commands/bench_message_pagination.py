@@ -0,0 +1,99 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from apps.authentication.models import User
+from apps.chats.models import Conversation, ConversationMember, Message
+from apps.chats.pagination import MessageCursorPagination
+
+
+class Command(BaseCommand):
+    """Compare keyset and OFFSET pagination over a seeded conversation."""
+    help = 'Seed a conversation with many messages and time newest/deep pages with keyset vs OFFSET pagination.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1_000_000, help='Number of messages to seed.')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per scenario.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of rolling back.')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        with transaction.atomic(using=using):
+            conversation = self.seed(using, options['messages'], options['batch_size'])
+            self.report(using, conversation, options['messages'], options['page_size'], options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True, using=using)
+
+    def seed(self, using, count, batch_size):
+        """Create a two-member conversation holding ``count`` messages."""
+        stamp = int(time.time())
+        sender = User.objects.using(using).create(
+            email=f'bench-{stamp}@example.com',
+            username=f'bench{stamp}',
+            first_name='Bench',
+            last_name='Sender',
+        )
+        conversation = Conversation.objects.using(using).create(title='Pagination benchmark', created_by=sender)
+        ConversationMember.objects.using(using).create(conversation=conversation, user=sender)
+
+        start = timezone.now() - timedelta(seconds=count)
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            Message.objects.using(using).bulk_create([
+                Message(
+                    conversation=conversation,
+                    sender=sender,
+                    body=f'message {i}',
+                    created_at=start + timedelta(seconds=i),
+                )
+                for i in range(offset, min(offset + batch_size, count))
+            ], batch_size=batch_size)
+        self.stdout.write(f'Seeded {count} messages in {time.perf_counter() - started:.1f}s')
+        return conversation
+
+    def report(self, using, conversation, count, page_size, repeat):
+        """Time the newest and the deepest page with both strategies."""
+        queryset = Message.objects.using(using).filter(conversation=conversation)
+        deep_offset = max(count - page_size, 0)
+        # The row just before the oldest page; seeking past it lands on the
+        # same rows the deep OFFSET query returns.
+        anchor = queryset.order_by('created_at', 'id')[page_size:page_size + 1].first()
+
+        paginator = MessageCursorPagination()
+        factory = RequestFactory()
+
+        def keyset(cursor=None):
+            params = {'page_size': page_size}
+            if cursor:
+                params['cursor'] = cursor
+            paginator.paginate_queryset(queryset, Request(factory.get('/', params, HTTP_HOST='localhost')))
+
+        deep_cursor = paginator.encode_cursor(anchor, reverse=False) if anchor else None
+        scenarios = [
+            ('keyset newest page', lambda: keyset()),
+            ('keyset deepest page', lambda: keyset(deep_cursor)),
+            ('offset newest page', lambda: list(queryset.order_by('-created_at', '-id')[:page_size])),
+            ('offset deepest page',
+             lambda: list(queryset.order_by('-created_at', '-id')[deep_offset:deep_offset + page_size])),
+        ]
+
+        self.stdout.write(f'{"scenario":<22}{"median ms":>12}{"p95 ms":>12}')
+        for name, run in scenarios:
+            run()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(f'{name:<22}{statistics.median(timings):>12.3f}{p95:>12.3f}')
@@ -0,0 +1,113 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from apps.authentication.models import User
+from apps.chats.models import Conversation, ConversationMember, Message
+from apps.chats.pagination import MessageCursorPagination
+from apps.chats.search import index_messages, search_messages
+
+
+class Command(BaseCommand):
+    """Compare indexed message search with LIKE scans over a seeded history."""
+    help = (
+        'Seed many messages across many conversations, index them, and time the first page of a search '
+        "with the inverted index and with LIKE '%term%' over the searching user's conversations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=10_000_000)
+        parser.add_argument('--conversations', type=int, default=10_000)
+        parser.add_argument('--member-of', type=int, default=50, help='Conversations the searching user is in.')
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--words', type=int, default=12, help='Words per message.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows instead of rolling back.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, vocabulary = self.seed(options)
+            self.report(user, vocabulary, options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, options):
+        rng = random.Random(0)
+        stamp = time.time_ns()
+        user = User.objects.create(email=f'bench-search-{stamp}@example.com', username=f'benchsearch{stamp % 10**8}')
+        conversations = Conversation.objects.bulk_create([
+            Conversation(title=f'Search {i}', created_by=user) for i in range(options['conversations'])
+        ], batch_size=options['batch_size'])
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user=user)
+            for conversation in conversations[:options['member_of']]
+        ])
+        # Word frequencies follow a Zipf-like curve, like natural text.
+        # Fixed-width words, so no word is a substring of another and LIKE
+        # matches exactly the messages the index does.
+        vocabulary = [f'w{i:06d}z' for i in range(options['vocabulary'])]
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+
+        start = timezone.now() - timedelta(seconds=options['messages'])
+        started = time.perf_counter()
+        for offset in range(0, options['messages'], options['batch_size']):
+            count = min(options['batch_size'], options['messages'] - offset)
+            words = rng.choices(vocabulary, weights, k=count * options['words'])
+            messages = Message.objects.bulk_create([
+                Message(
+                    conversation=conversations[rng.randrange(len(conversations))],
+                    sender=user,
+                    body=' '.join(words[i * options['words']:(i + 1) * options['words']]),
+                    created_at=start + timedelta(seconds=offset + i),
+                )
+                for i in range(count)
+            ])
+            index_messages(messages, batch_size=options['batch_size'])
+        self.stdout.write(
+            f'Seeded and indexed {options["messages"]} messages in {time.perf_counter() - started:.1f}s '
+            f'({options["member_of"]} of {options["conversations"]} conversations searchable)'
+        )
+        return user, vocabulary
+
+    def report(self, user, vocabulary, repeat):
+        paginator = MessageCursorPagination()
+        request = Request(RequestFactory().get('/', HTTP_HOST='localhost'))
+        conversation_ids = ConversationMember.objects.filter(user=user).values('conversation_id')
+
+        def indexed(query):
+            return paginator.paginate_queryset(search_messages(user.user_id, query), request)
+
+        def like(query):
+            queryset = Message.objects.filter(conversation_id__in=conversation_ids)
+            for term in query.split():
+                queryset = queryset.filter(body__contains=term)
+            return paginator.paginate_queryset(queryset, request)
+
+        queries = [
+            ('common term', vocabulary[0]),
+            ('mid term', vocabulary[len(vocabulary) // 100]),
+            ('rare term', vocabulary[-1]),
+            ('two terms', f'{vocabulary[1]} {vocabulary[2]}'),
+        ]
+        self.stdout.write(f'{"query":<14}{"index ms":>12}{"LIKE ms":>12}{"hits":>8}')
+        for name, query in queries:
+            index_page, like_page = indexed(query), like(query)
+            if [message.pk for message in index_page] != [message.pk for message in like_page]:
+                raise AssertionError(f'The index and the scan disagree for {query!r}.')
+            timings = {}
+            for label, run in (('index', indexed), ('like', like)):
+                samples = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    run(query)
+                    samples.append((time.perf_counter() - started) * 1000)
+                timings[label] = statistics.median(samples)
+            self.stdout.write(f'{name:<14}{timings["index"]:>12.2f}{timings["like"]:>12.2f}{len(index_page):>8}')
@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.chats.management.commands.ws_loadtest import get_rss_bytes
+from apps.chats.presence import PresenceTracker
+
+
+class CountingLayer:
+    """Channel layer stand-in that only counts broadcasts."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def group_send(self, groups, payload):
+        self.sent += 1
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+class Command(BaseCommand):
+    """Simulate many heartbeating users against the presence tracker."""
+    help = (
+        'Drive N simulated users heartbeating on a simulated clock through the presence tracker and report '
+        'heartbeat and tick cost, broadcasts and cache writes, next to the cost of writing every heartbeat '
+        'to the users table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--interval', type=int, default=10, help='Seconds between heartbeats of a user.')
+        parser.add_argument('--seconds', type=int, default=120, help='Simulated seconds.')
+        parser.add_argument('--churn', type=float, default=0.1, help='Share of users that leave halfway.')
+        parser.add_argument('--db-samples', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        clock = SimulatedClock()
+        layer = CountingLayer()
+        # A process-local cache large enough for every user stands in for Redis.
+        cache = LocMemCache('bench-presence', {'OPTIONS': {'MAX_ENTRIES': options['users'] * 2}})
+        tracker = PresenceTracker(layer=layer, cache=cache, clock=clock)
+
+        user_ids = [str(uuid.uuid4()) for _ in range(options['users'])]
+        # Spread each user's heartbeats evenly over the interval.
+        buckets = [[] for _ in range(options['interval'])]
+        for user_id in user_ids:
+            buckets[rng.randrange(options['interval'])].append(user_id)
+        leavers = set(rng.sample(user_ids, int(len(user_ids) * options['churn'])))
+        rss_before = get_rss_bytes()
+
+        heartbeat_time = 0.0
+        tick_times = []
+        for second in range(options['seconds']):
+            clock.now += 1
+            leaving = second >= options['seconds'] // 2
+            bucket = buckets[second % options['interval']]
+            started = time.perf_counter()
+            for user_id in bucket:
+                if not (leaving and user_id in leavers):
+                    tracker.heartbeat(user_id)
+            heartbeat_time += time.perf_counter() - started
+            started = time.perf_counter()
+            tracker.tick()
+            tick_times.append((time.perf_counter() - started) * 1000)
+
+        stats = tracker.stats
+        tick_times.sort()
+        self.stdout.write(
+            f'{options["users"]} users, heartbeat every {options["interval"]}s, '
+            f'{options["seconds"]} simulated seconds, {len(leavers)} leave halfway'
+        )
+        self.stdout.write(
+            f'heartbeats     {stats["heartbeats"]:>10}  {stats["heartbeats"] / heartbeat_time:>12,.0f}/s  '
+            f'{heartbeat_time / stats["heartbeats"] * 1e6:.2f} us each'
+        )
+        self.stdout.write(
+            f'tick           p50 {statistics.median(tick_times):.1f} ms  '
+            f'p99 {tick_times[int(len(tick_times) * 0.99) - 1]:.1f} ms  max {tick_times[-1]:.1f} ms'
+        )
+        self.stdout.write(f'broadcasts     {layer.sent:>10}  ({layer.sent / stats["heartbeats"]:.2%} of heartbeats)')
+        self.stdout.write(
+            f'cache writes   {stats["cache_writes"]:>10}  ({stats["cache_writes"] / stats["heartbeats"]:.2%} of heartbeats)'
+        )
+        self.stdout.write(f'online now     {len(tracker.online):>10}')
+        if rss_before:
+            self.stdout.write(f'memory         {(get_rss_bytes() - rss_before) / 2**20:>10.1f} MiB')
+        self.report_row_writes(options, stats['heartbeats'] / options['seconds'])
+
+    def report_row_writes(self, options, heartbeats_per_second):
+        """Time ``User`` row updates, the alternative of one write per heartbeat."""
+        samples = options['db_samples']
+        now = timezone.now()
+        users = User.objects.bulk_create([
+            User(
+                user_id=uuid.uuid4(), username=f'benchpresence{i}{time.time_ns() % 10**6}',
+                email=f'bench-presence-{i}-{time.time_ns()}@example.com', password='!',
+                created_at=now, updated_at=now,
+            )
+            for i in range(samples)
+        ])
+        try:
+            started = time.perf_counter()
+            for user in users:
+                User.objects.filter(pk=user.pk).update(updated_at=timezone.now())
+            per_write = (time.perf_counter() - started) / samples
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+        self.stdout.write(
+            f'row writes     {per_write * 1e6:.0f} us each; one per heartbeat would need '
+            f'{heartbeats_per_second:,.0f} writes/s = {heartbeats_per_second * per_write:.1f} s of DB time per second'
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.chats.attachments import remove_orphan_blobs, remove_stale_uploads
+
+
+class Command(BaseCommand):
+    """Remove abandoned uploads and unreferenced attachment blobs."""
+    help = 'Delete uploads untouched for ATTACHMENT_UPLOAD_TTL seconds and blobs no attachment refers to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, help='Override ATTACHMENT_UPLOAD_TTL, in seconds.')
+
+    def handle(self, *args, **options):
+        uploads = remove_stale_uploads(options['max_age'])
+        blobs = remove_orphan_blobs()
+        self.stdout.write(self.style.SUCCESS(f'Removed {uploads} stale uploads and {blobs} orphan blobs.'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.chats.models import ConversationMember
+from apps.chats.unread import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    """Recount unread messages and repair drifted counters."""
+    help = 'Recount the unread messages of every membership (or a subset) and fix counters that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversation', help='Only reconcile the members of this conversation id.')
+        parser.add_argument('--user', help='Only reconcile the memberships of this user id.')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+
+    def handle(self, *args, **options):
+        members = ConversationMember.objects.order_by('pk')
+        if options['conversation']:
+            members = members.filter(conversation_id=options['conversation'])
+        if options['user']:
+            members = members.filter(user_id=options['user'])
+        checked, fixed = reconcile_unread_counts(members, dry_run=options['dry_run'])
+        verb = 'would fix' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} memberships, {verb} {fixed}.'))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.chats.fanout import user_group
+from apps.chats.layers import get_channel_layer
+
+
+def get_rss_bytes():
+    """Return the resident set size of this process, or 0 where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+class Command(BaseCommand):
+    """Load test the WebSocket delivery path of the ASGI application in-process."""
+    help = 'Hold many idle WebSocket connections on the ASGI app and report p50/p99 message delivery latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10_000)
+        parser.add_argument('--messages', type=int, default=2_000)
+        parser.add_argument('--recipients', type=int, default=2, help='Members per published message.')
+        parser.add_argument('--rate', type=float, default=1_000, help='Messages published per second.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        from config.asgi import application
+
+        loop = asyncio.get_running_loop()
+        layer = get_channel_layer()
+        user_ids = [str(uuid.uuid4()) for _ in range(options['connections'])]
+        latencies = []
+        accepted = 0
+        all_accepted = asyncio.Event()
+        expected = options['messages'] * min(options['recipients'], len(user_ids))
+        all_delivered = asyncio.Event()
+
+        async def send(event):
+            nonlocal accepted
+            if event['type'] == 'websocket.accept':
+                accepted += 1
+                if accepted == len(user_ids):
+                    all_accepted.set()
+            elif event['type'] == 'websocket.send':
+                payload = json.loads(event['text'])
+                latencies.append(time.perf_counter() - payload['sent_at'])
+                if len(latencies) == expected:
+                    all_delivered.set()
+
+        rss_before = get_rss_bytes()
+        inboxes = []
+        tasks = []
+        for user_id in user_ids:
+            token = AccessToken()
+            token[api_settings.USER_ID_CLAIM] = user_id
+            scope = {
+                'type': 'websocket',
+                'path': '/ws/chats/',
+                'query_string': f'token={token}'.encode(),
+                'headers': [],
+                'subprotocols': [],
+            }
+            inbox = asyncio.Queue()
+            inbox.put_nowait({'type': 'websocket.connect'})
+            inboxes.append(inbox)
+            tasks.append(loop.create_task(application(scope, inbox.get, send)))
+
+        await asyncio.wait_for(all_accepted.wait(), options['timeout'])
+        rss_after = get_rss_bytes()
+        self.stdout.write(f'Holding {layer.connection_count()} idle connections')
+        if rss_before and rss_after:
+            per_connection = (rss_after - rss_before) / len(user_ids)
+            self.stdout.write(f'Memory: {per_connection / 1024:.1f} KiB per connection (includes token setup)')
+
+        # Publish from a worker thread, as sync Django views do under ASGI.
+        def publish():
+            interval = 1 / options['rate'] if options['rate'] > 0 else 0
+            for i in range(options['messages']):
+                recipients = random.sample(user_ids, min(options['recipients'], len(user_ids)))
+                layer.group_send(
+                    [user_group(user_id) for user_id in recipients],
+                    {'type': 'message.new', 'seq': i, 'sent_at': time.perf_counter()},
+                )
+                if interval:
+                    time.sleep(interval)
+
+        started = time.perf_counter()
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        try:
+            await asyncio.wait_for(all_delivered.wait(), options['timeout'])
+        except asyncio.TimeoutError:
+            self.stderr.write(f'Timed out with {len(latencies)}/{expected} deliveries')
+        elapsed = time.perf_counter() - started
+        await asyncio.to_thread(publisher.join)
+
+        for inbox in inboxes:
+            inbox.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.gather(*tasks)
+        await layer.close()
+
+        if not latencies:
+            return
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(f'Delivered {len(latencies)} frames in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)')
+        self.stdout.write(f'Latency p50={statistics.median(latencies) * 1000:.3f}ms p99={p99 * 1000:.3f}ms')
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-17 05:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0002_read_cursors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('conversation', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='chats.conversation')),
+                ('message', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='chats.message')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['message'], name='chats_search_term_msg_idx')],
+                'constraints': [models.UniqueConstraint(fields=('term', 'conversation', 'message'), name='chats_search_term_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-17 05:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def number_existing_messages(apps, schema_editor):
+    """Number each conversation's existing messages in (created_at, id) order."""
+    Conversation = apps.get_model('chats', 'Conversation')
+    Message = apps.get_model('chats', 'Message')
+    for conversation_id in Conversation.objects.values_list('pk', flat=True).iterator():
+        messages = list(Message.objects.filter(conversation_id=conversation_id).order_by('created_at', 'id').only('id'))
+        for sequence, message in enumerate(messages, start=1):
+            message.sequence = sequence
+        Message.objects.bulk_update(messages, ['sequence'], batch_size=1000)
+        Conversation.objects.filter(pk=conversation_id).update(last_sequence=len(messages))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0004_attachments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_sequence',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='sequence',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(number_existing_messages, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('conversation', 'sequence'), name='chats_msg_sequence_unique'),
+        ),
+    ]
@@ -1,3 +1,176 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+class Conversation(models.Model):
+    """A direct or group conversation between two or more users."""
+    conversation_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    title = models.CharField(max_length=100, blank=True)
+    is_group = models.BooleanField(default=False)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='created_conversations',
+    )
+    members = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        through='ConversationMember',
+        related_name='conversations',
+    )
+    last_message_at = models.DateTimeField(default=timezone.now)
+    # Sequence number of the newest message; see ``Message.sequence``.
+    last_sequence = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_message_at', 'conversation_id'], name='chats_conv_activity_idx'),
+        ]
+
+    def __str__(self):
+        return self.title or str(self.conversation_id)
+
+
+class ConversationMember(models.Model):
+    """Membership of a user in a conversation."""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='memberships')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='conversation_memberships',
+    )
+    joined_at = models.DateTimeField(auto_now_add=True)
+    # Read cursor and the number of messages from others after it. The counter
+    # is kept up to date on every send and read, so the inbox never counts
+    # messages; ``reconcile_unread_counts`` repairs any drift.
+    last_read_message = models.ForeignKey(
+        'Message',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='chats_member_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'conversation'], name='chats_member_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in {self.conversation_id}"
+
+
+class Message(models.Model):
+    """A single message posted to a conversation."""
+    # The composite keyset index below covers lookups by conversation, so the
+    # foreign key does not need an index of its own.
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='messages',
+        db_index=False,
+    )
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='messages',
+    )
+    body = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    # Position in the conversation, counting from 1 without gaps, assigned
+    # when the message is stored (``apps.chats.ingest``). Clients can use it
+    # to order messages and to notice ones they missed.
+    sequence = models.PositiveBigIntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'sequence'], name='chats_msg_sequence_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['conversation', 'created_at', 'id'], name='chats_msg_keyset_idx'),
+        ]
+
+    def __str__(self):
+        return f"Message {self.pk} in {self.conversation_id}"
+
+
+class MessageSearchTerm(models.Model):
+    """
+    Posting of a search term in a message.
+
+    Postings carry their conversation so a search only seeks the
+    ``(term, conversation)`` ranges of the conversations the user belongs to.
+    They are deleted with their message, so deleting a conversation does not
+    need to look them up by conversation as well.
+    """
+    term = models.CharField(max_length=64)
+    conversation = models.ForeignKey(Conversation, on_delete=models.DO_NOTHING, related_name='+', db_index=False)
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='search_terms', db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'conversation', 'message'], name='chats_search_term_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['message'], name='chats_search_term_msg_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} in {self.message_id}"
+
+
+class AttachmentBlob(models.Model):
+    """File content stored once per SHA-256, however many attachments share it."""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+class AttachmentUpload(models.Model):
+    """A resumable upload in progress; ``received`` bytes are on disk so far."""
+    upload_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='+')
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.upload_id} ({self.received}/{self.size})"
+
 
+class Attachment(models.Model):
+    """A file shared in a conversation."""
+    attachment_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='attachments')
+    uploader = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+    )
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.PROTECT, related_name='attachments')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
 
+    def __str__(self):
+        return self.filename
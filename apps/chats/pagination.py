@@ -0,0 +1,167 @@
+import base64
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a ``(position_field, tiebreak_field)`` pair.
+
+    Unlike ``PageNumberPagination`` no OFFSET is ever issued: each page is a
+    range scan that starts right after the last row of the previous page, so
+    the newest page and a page ten million rows back cost the same as long as
+    an index leads with the filter columns followed by both ordering fields.
+    Results are returned newest first; ``next`` walks back in history and
+    ``previous`` walks forward again.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    position_field = 'created_at'
+    tiebreak_field = 'id'
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request, queryset.model)
+
+        if cursor is None:
+            reverse = False
+        else:
+            reverse, position, tiebreak = cursor
+            queryset = queryset.filter(self.get_seek_filter(position, tiebreak, reverse))
+
+        if reverse:
+            order = (self.position_field, self.tiebreak_field)
+        else:
+            order = ('-' + self.position_field, '-' + self.tiebreak_field)
+
+        results = list(queryset.order_by(*order)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Walking forward (``previous``) from a cursor always has older rows
+        # behind it, and walking back always has newer rows ahead of it.
+        if reverse:
+            self.has_next, self.has_previous = cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.first_row = results[0] if results else None
+        self.last_row = results[-1] if results else None
+        return results
+
+    def get_seek_filter(self, position, tiebreak, reverse):
+        """
+        Return the filter that seeks past ``(position, tiebreak)``.
+
+        The redundant ``lte``/``gte`` bound lets the database turn the row
+        comparison into an index range scan instead of a filtered full scan.
+        """
+        if reverse:
+            return (
+                Q(**{f'{self.position_field}__gte': position})
+                & (Q(**{f'{self.position_field}__gt': position}) | Q(**{f'{self.tiebreak_field}__gt': tiebreak}))
+            )
+        return (
+            Q(**{f'{self.position_field}__lte': position})
+            & (Q(**{f'{self.position_field}__lt': position}) | Q(**{f'{self.tiebreak_field}__lt': tiebreak}))
+        )
+
+    def get_page_size(self, request):
+        """Return the requested page size, clamped to ``max_page_size``."""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, row, reverse):
+        """Encode the keyset position of ``row`` into an opaque cursor string."""
+        position = getattr(row, self.position_field)
+        if isinstance(position, datetime):
+            position = position.isoformat()
+        tiebreak = getattr(row, self.tiebreak_field)
+        raw = f"{'p' if reverse else 'n'}|{position}|{tiebreak}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, model):
+        """
+        Decode the cursor query parameter into ``(reverse, position, tiebreak)``,
+        converted by ``model``'s fields so a forged cursor never reaches the query.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8')
+            direction, position, tiebreak = raw.split('|', 2)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if direction not in ('n', 'p') or not tiebreak:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = model._meta.get_field(self.position_field).to_python(position)
+            tiebreak = model._meta.get_field(self.tiebreak_field).to_python(tiebreak)
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if position is None or tiebreak is None:
+            raise NotFound(self.invalid_cursor_message)
+        return direction == 'p', position, tiebreak
+
+    def get_next_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        cursor = self.encode_cursor(self.last_row, reverse=False)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_row is None:
+            return None
+        cursor = self.encode_cursor(self.first_row, reverse=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class MessageCursorPagination(KeysetCursorPagination):
+    """Cursor pagination for a conversation's message history."""
+    page_size = 50
+    position_field = 'created_at'
+    tiebreak_field = 'id'
+
+
+class ConversationCursorPagination(KeysetCursorPagination):
+    """Cursor pagination for the conversation list, most recently active first."""
+    page_size = 20
+    position_field = 'last_message_at'
+    tiebreak_field = 'conversation_id'
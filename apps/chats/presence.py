@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.chats.fanout import user_group
+from apps.chats.layers import get_channel_layer
+from apps.chats.models import ConversationMember
+from apps.users.models import Contact
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'presence:'
+
+
+def as_datetime(timestamp):
+    return None if timestamp is None else datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+def presence_group(user_id):
+    """Return the channel layer group that receives a user's presence transitions."""
+    return f'presence.{user_id}'
+
+
+def visible_user_ids(viewer_id, user_ids):
+    """
+    Return those of ``user_ids`` whose presence ``viewer_id`` may see: the
+    viewer, users sharing a conversation with them and their contacts.
+    """
+    user_ids = [str(user_id) for user_id in user_ids]
+    visible = {str(viewer_id)}
+    visible.update(str(user_id) for user_id in ConversationMember.objects.filter(
+        user_id__in=user_ids,
+        conversation_id__in=ConversationMember.objects.filter(user_id=viewer_id).values('conversation_id'),
+    ).values_list('user_id', flat=True))
+    visible.update(str(user_id) for user_id in Contact.objects.filter(
+        owner_id=viewer_id, contact_id__in=user_ids,
+    ).values_list('contact_id', flat=True))
+    return [user_id for user_id in user_ids if user_id in visible]
+
+
+class TimingWheel:
+    """
+    Expiring set of keys with O(1) insert, refresh and expiry per key.
+
+    Deadlines are whole ticks. Each key sits in the slot of its deadline tick
+    modulo the wheel size, so ``advance`` only looks at the slots of the ticks
+    that passed instead of every key. A refresh moves the key to a new slot.
+    Deadlines more than one revolution ahead stay valid: such keys are seen
+    early, found not yet due and left in place.
+    """
+
+    def __init__(self, size):
+        self.slots = [set() for _ in range(size)]
+        self.deadlines = {}
+        self.values = {}
+        self.current = None
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def schedule(self, key, deadline, value=None):
+        """Set a key to expire at tick ``deadline``; return whether it was absent."""
+        previous = self.deadlines.get(key)
+        if previous is not None:
+            if previous == deadline:
+                return False
+            self.slots[previous % len(self.slots)].discard(key)
+        self.deadlines[key] = deadline
+        if value is not None or previous is None:
+            self.values[key] = value
+        self.slots[deadline % len(self.slots)].add(key)
+        return previous is None
+
+    def remove(self, key):
+        """Drop a key without expiring it; return its value."""
+        deadline = self.deadlines.pop(key, None)
+        if deadline is None:
+            return None
+        self.slots[deadline % len(self.slots)].discard(key)
+        return self.values.pop(key, None)
+
+    def advance(self, tick):
+        """Expire every key due at or before ``tick``; return ``(key, value)`` pairs."""
+        if self.current is None:
+            self.current = tick - 1
+        first = max(self.current + 1, tick - len(self.slots) + 1)
+        expired = []
+        for due in range(first, tick + 1):
+            slot = self.slots[due % len(self.slots)]
+            for key in [key for key in slot if self.deadlines[key] <= tick]:
+                slot.discard(key)
+                del self.deadlines[key]
+                expired.append((key, self.values.pop(key, None)))
+        self.current = max(self.current, tick)
+        return expired
+
+
+class PresenceTracker:
+    """
+    Per-process online and typing state for the users connected to this process.
+
+    Heartbeats only refresh an in-memory timing wheel, so they cost no I/O
+    and never touch the ``User`` row. Other processes see a user's state
+    through the shared cache, as ``[last_seen, online_until]`` under
+    ``presence:<user_id>``. That entry is rewritten at most every
+    ``PRESENCE_TTL / 2`` seconds per user and simply lapses when the user
+    stops heartbeating, so clients must heartbeat more often than that.
+    All cache traffic is batched into one ``get_many`` and one ``set_many``
+    per tick.
+
+    Only transitions are broadcast: ``presence.changed`` to the
+    ``presence.<user_id>`` group when a user comes online or expires, and
+    ``typing`` to the members of a conversation when someone starts or stops
+    typing. A transition that another process already covers, because the
+    shared entry shows the user online there, is not broadcast again.
+    """
+
+    def __init__(self, layer=None, cache=None, clock=time.time, ttl=None, typing_ttl=None, tick=1):
+        self.layer = layer or get_channel_layer()
+        self.cache = cache or caches[settings.PRESENCE_CACHE_ALIAS]
+        self.clock = clock
+        self.ttl = ttl or settings.PRESENCE_TTL
+        self.typing_ttl = typing_ttl or settings.PRESENCE_TYPING_TTL
+        self.tick_seconds = tick
+        size = math.ceil(max(self.ttl, self.typing_ttl) / tick) + 2
+        self.online = TimingWheel(size)
+        self.typing = TimingWheel(size)
+        self.last_seen = {}
+        self.mirrored_until = {}
+        self.arrived = set()
+        self.dirty = set()
+        self.task = None
+        self.stats = {'heartbeats': 0, 'transitions': 0, 'cache_writes': 0}
+
+    def now_tick(self, now):
+        return math.ceil(now / self.tick_seconds)
+
+    def cache_key(self, user_id):
+        return f'{CACHE_PREFIX}{user_id}'
+
+    def heartbeat(self, user_id):
+        """Record that a user is alive. No I/O: cache writes and broadcasts happen on the next tick."""
+        user_id = str(user_id)
+        now = self.clock()
+        self.stats['heartbeats'] += 1
+        self.last_seen[user_id] = now
+        if self.online.schedule(user_id, self.now_tick(now + self.ttl)):
+            self.arrived.add(user_id)
+        elif self.mirrored_until.get(user_id, 0) - now < self.ttl / 2:
+            self.dirty.add(user_id)
+        self.ensure_running()
+
+    def set_typing(self, conversation_id, user_id, member_ids=None, typing=True):
+        """
+        Start, refresh or stop a user's typing state in a conversation.
+
+        ``member_ids`` is required to start; a refresh keeps the members
+        recorded at the start. Only starts and stops are broadcast.
+        """
+        key = (str(conversation_id), str(user_id))
+        if not typing:
+            if key in self.typing:
+                self.broadcast_typing(key, self.typing.remove(key), False)
+            return
+        if key not in self.typing and member_ids is None:
+            raise ValueError('member_ids is required to start typing.')
+        members = None if member_ids is None else [str(member) for member in member_ids]
+        if self.typing.schedule(key, self.now_tick(self.clock() + self.typing_ttl), members):
+            self.broadcast_typing(key, members, True)
+        self.ensure_running()
+
+    def is_typing(self, conversation_id, user_id):
+        return (str(conversation_id), str(user_id)) in self.typing
+
+    def tick(self):
+        """Expire stale entries, announce arrivals and flush cache refreshes; called once per tick."""
+        changes = self.advance()
+        self.finish_tick(changes, self.sync_cache(changes))
+
+    def advance(self):
+        """
+        The in-memory half of a tick: move the wheels on, broadcast expired
+        typing and collect the presence changes the shared cache must settle.
+        """
+        now = self.clock()
+        tick = self.now_tick(now)
+        for key, member_ids in self.typing.advance(tick):
+            self.broadcast_typing(key, member_ids, False)
+
+        expired = []
+        for user_id, _ in self.online.advance(tick):
+            self.arrived.discard(user_id)
+            self.dirty.discard(user_id)
+            expired.append((user_id, self.last_seen.pop(user_id), self.mirrored_until.pop(user_id, 0)))
+        arrived = [(user_id, self.last_seen[user_id]) for user_id in self.arrived]
+
+        entries = {}
+        for user_id in self.dirty | self.arrived:
+            last_seen = self.last_seen[user_id]
+            self.mirrored_until[user_id] = last_seen + self.ttl
+            entries[self.cache_key(user_id)] = [last_seen, last_seen + self.ttl]
+        self.stats['cache_writes'] += len(entries)
+        self.arrived.clear()
+        self.dirty.clear()
+        return now, expired, arrived, entries
+
+    def sync_cache(self, changes):
+        """The blocking half of a tick: one ``get_many`` and one ``set_many``. Returns what was read."""
+        _, expired, arrived, entries = changes
+        keys = [self.cache_key(user_id) for user_id, *_ in expired + arrived]
+        mirrored = self.cache.get_many(keys) if keys else {}
+        if entries:
+            self.cache.set_many(entries, settings.PRESENCE_LAST_SEEN_TTL)
+        return mirrored
+
+    def finish_tick(self, changes, mirrored):
+        now, expired, arrived, _ = changes
+        for user_id, last_seen, own_until in expired:
+            entry = mirrored.get(self.cache_key(user_id))
+            # Another process refreshed the entry after us: still online there.
+            if entry is None or entry[1] <= max(now, own_until):
+                self.broadcast_presence(user_id, False, last_seen)
+        for user_id, last_seen in arrived:
+            entry = mirrored.get(self.cache_key(user_id))
+            # Already online through another process: not a transition.
+            if entry is None or entry[1] <= now:
+                self.broadcast_presence(user_id, True, last_seen)
+
+    def broadcast_presence(self, user_id, online, last_seen):
+        self.stats['transitions'] += 1
+        self.layer.group_send(presence_group(user_id), {
+            'type': 'presence.changed',
+            'user_id': user_id,
+            'online': online,
+            'last_seen': as_datetime(last_seen),
+        })
+
+    def broadcast_typing(self, key, member_ids, typing):
+        conversation_id, user_id = key
+        self.stats['transitions'] += 1
+        self.layer.group_send([user_group(member) for member in member_ids if member != user_id], {
+            'type': 'typing',
+            'conversation_id': conversation_id,
+            'user_id': user_id,
+            'typing': typing,
+        })
+
+    def ensure_running(self):
+        """Start the tick loop on the running event loop, if there is one."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.run())
+
+    async def run(self):
+        while len(self.online) or len(self.typing):
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                # The wheels stay on the loop; only the cache round trips leave it.
+                changes = self.advance()
+                mirrored = await sync_to_async(self.sync_cache, thread_sensitive=False)(changes)
+                self.finish_tick(changes, mirrored)
+            except Exception:
+                logger.exception('Presence tick failed.')
+
+    def get_presence(self, user_ids):
+        """
+        Return ``{user_id: {'online': bool, 'last_seen': datetime | None}}``.
+
+        Users connected to this process are answered from memory; the rest
+        with one ``get_many`` on the shared cache.
+        """
+        now = self.clock()
+        result = {}
+        remote = []
+        for user_id in map(str, user_ids):
+            if user_id in self.online:
+                result[user_id] = {'online': True, 'last_seen': as_datetime(self.last_seen[user_id])}
+            else:
+                remote.append(user_id)
+        mirrored = self.cache.get_many([self.cache_key(user_id) for user_id in remote]) if remote else {}
+        for user_id in remote:
+            entry = mirrored.get(self.cache_key(user_id))
+            result[user_id] = {
+                'online': entry is not None and entry[1] > now,
+                'last_seen': as_datetime(entry[0]) if entry else None,
+            }
+        return result
+
+
+_tracker = None
+
+
+def get_presence_tracker():
+    """Return the process-wide presence tracker."""
+    global _tracker
+    if _tracker is None:
+        _tracker = PresenceTracker()
+    return _tracker
@@ -0,0 +1,5 @@
+from apps.chats.consumers import ChatConsumer
+
+websocket_urlpatterns = [
+    ('/ws/chats/', ChatConsumer),
+]
@@ -0,0 +1,85 @@
+import re
+
+from django.db.models import Exists, OuterRef
+
+from apps.chats.models import ConversationMember, Message, MessageSearchTerm
+from apps.users.search import normalize
+
+TERM_MAX_LENGTH = 64
+TERM_MIN_LENGTH = 2
+MAX_QUERY_TERMS = 5
+# Postings a term needs in the user's conversations before a search walks
+# messages instead of postings; see ``search_messages``.
+DENSE_TERM_POSTINGS = 1000
+WORD_RE = re.compile(r'[^\W_]+')
+# Words so common that their posting lists would be most of the index while
+# narrowing a search down by almost nothing.
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in', 'is', 'it',
+    'of', 'on', 'or', 'so', 'the', 'to', 'was', 'we', 'with', 'you',
+})
+
+
+def tokenize(text):
+    """Return the distinct index terms of ``text``, in order of appearance."""
+    terms = {}
+    for word in WORD_RE.findall(normalize(text)):
+        if len(word) >= TERM_MIN_LENGTH and word not in STOPWORDS:
+            terms.setdefault(word[:TERM_MAX_LENGTH], None)
+    return list(terms)
+
+
+def postings_for(messages):
+    return [
+        MessageSearchTerm(term=term, conversation_id=message.conversation_id, message_id=message.pk)
+        for message in messages
+        for term in tokenize(message.body)
+    ]
+
+
+def index_messages(messages, batch_size=5000):
+    """Add the postings of ``messages``; indexing a message twice is harmless."""
+    MessageSearchTerm.objects.bulk_create(postings_for(messages), batch_size=batch_size, ignore_conflicts=True)
+
+
+def search_messages(user_id, query, conversation_id=None):
+    """
+    Return a ``Message`` queryset of the messages containing every term of
+    ``query`` in the conversations ``user_id`` is a member of.
+
+    Postings are only read for the user's conversations, one seek per
+    ``(term, conversation)`` on the index. How the query runs depends on how
+    often the rarest term occurs there, counted up to ``DENSE_TERM_POSTINGS``:
+
+    * a rare term drives the query: its postings are the candidates and
+      every other term is an ``EXISTS`` probe on the same index;
+    * when every term is common, the user's messages are walked newest
+      first with one probe per term, and the paginator stops as soon as a
+      page is full, instead of collecting and sorting every posting.
+    """
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return Message.objects.none()
+    conversations = ConversationMember.objects.filter(user_id=user_id).values('conversation_id')
+    if conversation_id is not None:
+        conversations = conversations.filter(conversation_id=conversation_id)
+
+    def postings(term):
+        return MessageSearchTerm.objects.filter(term=term, conversation_id__in=conversations)
+
+    frequency = {term: postings(term)[:DENSE_TERM_POSTINGS].count() for term in terms}
+    terms.sort(key=frequency.get)
+    if frequency[terms[0]] == 0:
+        return Message.objects.none()
+
+    if frequency[terms[0]] < DENSE_TERM_POSTINGS:
+        messages = Message.objects.filter(pk__in=postings(terms[0]).values('message_id'))
+        probes = terms[1:]
+    else:
+        messages = Message.objects.filter(conversation_id__in=conversations)
+        probes = terms
+    for term in probes:
+        messages = messages.filter(Exists(MessageSearchTerm.objects.filter(
+            term=term, conversation_id=OuterRef('conversation_id'), message_id=OuterRef('pk'),
+        )))
+    return messages
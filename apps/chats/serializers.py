@@ -0,0 +1,156 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from apps.authentication.models import User
+from apps.chats.models import Attachment, AttachmentUpload, Conversation, Message
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """
+    Serializer for Conversation model.
+
+    ``unread_count`` and ``last_read_message_id`` describe the requesting
+    user's membership and are read from the prefetched memberships.
+    """
+    member_ids = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+    last_read_message_id = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Conversation
+        fields = [
+            'conversation_id',
+            'title',
+            'is_group',
+            'member_ids',
+            'unread_count',
+            'last_read_message_id',
+            'last_message_at',
+            'created_at',
+        ]
+        read_only_fields = fields
+
+    def get_member_ids(self, obj):
+        """Return the user ids of the conversation members."""
+        return [str(member.user_id) for member in obj.memberships.all()]
+
+    def get_own_membership(self, obj):
+        request = self.context.get('request')
+        if request is None:
+            return None
+        for member in obj.memberships.all():
+            if member.user_id == request.user.user_id:
+                return member
+        return None
+
+    def get_unread_count(self, obj):
+        """Return the number of messages the requesting user has not read."""
+        member = self.get_own_membership(obj)
+        return member.unread_count if member else 0
+
+    def get_last_read_message_id(self, obj):
+        """Return the id of the last message the requesting user has read."""
+        member = self.get_own_membership(obj)
+        return member.last_read_message_id if member else None
+
+
+class CreateConversationSerializer(serializers.Serializer):
+    """Serializer for starting a new conversation."""
+    title = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    member_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+
+    def validate_member_ids(self, value):
+        """Validate that every member exists."""
+        member_ids = set(value)
+        found = set(User.objects.filter(user_id__in=member_ids).values_list('user_id', flat=True))
+        if found != member_ids:
+            raise serializers.ValidationError("One or more members do not exist.")
+        return list(member_ids)
+
+
+class MessageSerializer(serializers.ModelSerializer):
+    """Serializer for Message model."""
+    conversation_id = serializers.UUIDField(read_only=True)
+    sender_id = serializers.UUIDField(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = [
+            'id',
+            'conversation_id',
+            'sender_id',
+            'body',
+            'sequence',
+            'created_at',
+        ]
+        read_only_fields = ['id', 'conversation_id', 'sender_id', 'sequence', 'created_at']
+
+
+class MarkReadSerializer(serializers.Serializer):
+    """Serializer for moving the read cursor of a conversation."""
+    message_id = serializers.IntegerField(required=False, help_text='Defaults to the newest message.')
+
+
+class MessageSearchQuerySerializer(serializers.Serializer):
+    """Serializer for the message search query parameters."""
+    q = serializers.CharField(max_length=200)
+    conversation_id = serializers.UUIDField(required=False)
+
+
+class PresenceQuerySerializer(serializers.Serializer):
+    """Serializer for the ``user_ids`` query parameter of the presence lookup."""
+    user_ids = serializers.CharField(help_text='Comma-separated user ids.')
+
+    def validate_user_ids(self, value):
+        """Validate the user ids and the batch size."""
+        field = serializers.UUIDField()
+        user_ids = [str(field.to_internal_value(part.strip())) for part in value.split(',') if part.strip()]
+        if not user_ids:
+            raise serializers.ValidationError("At least one user id is required.")
+        if len(set(user_ids)) > settings.PRESENCE_BATCH_LIMIT:
+            raise serializers.ValidationError(f"At most {settings.PRESENCE_BATCH_LIMIT} user ids are allowed.")
+        return list(dict.fromkeys(user_ids))
+
+
+class PresenceSerializer(serializers.Serializer):
+    """Serializer for the presence of one user."""
+    user_id = serializers.UUIDField()
+    online = serializers.BooleanField()
+    last_seen = serializers.DateTimeField(allow_null=True)
+
+
+class StartUploadSerializer(serializers.Serializer):
+    """Serializer for starting a resumable attachment upload."""
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100, required=False, default='application/octet-stream')
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_size(self, value):
+        """Validate the declared size against the attachment limit."""
+        if value > settings.ATTACHMENT_MAX_SIZE:
+            raise serializers.ValidationError(f"Attachments are limited to {settings.ATTACHMENT_MAX_SIZE} bytes.")
+        return value
+
+
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    """Serializer for the state of an upload in progress."""
+    conversation_id = serializers.UUIDField(read_only=True)
+    offset = serializers.IntegerField(source='received', read_only=True)
+
+    class Meta:
+        model = AttachmentUpload
+        fields = ['upload_id', 'conversation_id', 'filename', 'content_type', 'size', 'offset']
+        read_only_fields = fields
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    """Serializer for Attachment model."""
+    conversation_id = serializers.UUIDField(read_only=True)
+    uploader_id = serializers.UUIDField(read_only=True)
+    sha256 = serializers.CharField(source='blob_id', read_only=True)
+    size = serializers.IntegerField(source='blob.size', read_only=True)
+
+    class Meta:
+        model = Attachment
+        fields = ['attachment_id', 'conversation_id', 'uploader_id', 'filename', 'content_type', 'size', 'sha256', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,21 @@
+from celery import shared_task
+from django.db import transaction
+
+from apps.authentication.tasks import TASK_OPTIONS, publish
+from apps.chats.models import Message
+from apps.chats.search import index_messages
+from core.db_router import use_primary
+
+
+def queue_message_indexing(*messages):
+    """Queue search indexing of messages once the transaction that stores them commits."""
+    message_ids = [message.pk for message in messages]
+    transaction.on_commit(lambda: publish(index_new_messages, message_ids))
+
+
+@shared_task(**TASK_OPTIONS)
+def index_new_messages(message_ids):
+    """Add the search postings of newly stored messages."""
+    with use_primary():
+        messages = list(Message.objects.filter(pk__in=message_ids).only('id', 'conversation_id', 'body'))
+    index_messages(messages)
@@ -1,3 +1,958 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.authentication.models import User
+from apps.chats import attachments
+from apps.chats.fanout import user_group
+from apps.chats.ingest import MessageIngestor, send_message
+from apps.chats.layers import InMemoryChannelLayer, RedisChannelLayer, get_channel_layer
+from apps.chats.models import (
+    Attachment,
+    AttachmentBlob,
+    AttachmentUpload,
+    Conversation,
+    ConversationMember,
+    Message,
+    MessageSearchTerm,
+)
+from apps.chats.presence import PresenceTracker, TimingWheel
+from apps.users.models import Contact
+from config.asgi import application
+from core.db_router import begin_routing, end_routing, get_routing_state
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com',
+        password='Str0ng!Pass',
+        username=username,
+        first_name=username.capitalize(),
+        last_name='Tester',
+    )
+
+
+class MessagePaginationTests(TestCase):
+    """Tests for keyset pagination of conversation history."""
+
+    def setUp(self):
+        self.alice = create_user('alice')
+        self.bob = create_user('bob')
+        self.conversation = Conversation.objects.create(created_by=self.alice)
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=self.conversation, user=self.alice),
+            ConversationMember(conversation=self.conversation, user=self.bob),
+        ])
+        # Pairs of messages share a timestamp so the id tiebreaker is exercised.
+        start = timezone.now() - timedelta(hours=1)
+        self.messages = Message.objects.bulk_create([
+            Message(
+                conversation=self.conversation,
+                sender=self.alice,
+                body=f'message {i}',
+                created_at=start + timedelta(seconds=i // 2),
+            )
+            for i in range(25)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+        self.url = reverse('chats:messages', args=[self.conversation.conversation_id])
+
+    def test_pages_walk_history_newest_first_without_gaps(self):
+        seen = []
+        url = self.url + '?page_size=10'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        expected = sorted((m.id for m in Message.objects.all()), reverse=True)
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_the_newer_page(self):
+        first = self.client.get(self.url + '?page_size=10').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [item['id'] for item in back['results']],
+            [item['id'] for item in first['results']],
+        )
+        self.assertIsNone(back['previous'])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(self.url + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_forged_cursor_values_return_404(self):
+        conversations = reverse('chats:conversations')
+        for url, raw in (
+            (self.url, 'n|yesterday|1'),
+            (self.url, 'n|2024-01-01T00:00:00+00:00|abc'),
+            (conversations, 'n|2024-01-01T00:00:00|abc'),
+            (conversations, 'p|not a date|%s' % uuid.uuid4()),
+        ):
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404, raw)
+
+    def test_non_member_cannot_read_history(self):
+        self.client.force_authenticate(create_user('mallory'))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_sending_a_message_bumps_conversation_activity(self):
+        response = self.client.post(self.url, {'body': 'hello'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.conversation.refresh_from_db()
+        self.assertEqual(
+            self.conversation.last_message_at,
+            Message.objects.get(pk=response.data['chat_message']['id']).created_at,
+        )
+
+
+class UnreadCounterTests(TestCase):
+    """Tests for read cursors and denormalized unread counters."""
+
+    def setUp(self):
+        self.alice = create_user('alice')
+        self.bob = create_user('bob')
+        self.carol = create_user('carol')
+        self.conversation = Conversation.objects.create(created_by=self.alice)
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=self.conversation, user=user) for user in (self.alice, self.bob, self.carol)
+        ])
+        self.client = APIClient()
+        self.messages_url = reverse('chats:messages', args=[self.conversation.conversation_id])
+        self.read_url = reverse('chats:read', args=[self.conversation.conversation_id])
+
+    def send(self, user, body='hi'):
+        self.client.force_authenticate(user)
+        response = self.client.post(self.messages_url, {'body': body}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['chat_message']['id']
+
+    def member(self, user):
+        return ConversationMember.objects.get(conversation=self.conversation, user=user)
+
+    def test_sending_bumps_other_members_and_reads_for_the_sender(self):
+        self.send(self.alice)
+        self.send(self.alice)
+        last = self.send(self.bob)
+        self.assertEqual(self.member(self.carol).unread_count, 3)
+        self.assertEqual(self.member(self.alice).unread_count, 1)
+        self.assertEqual(self.member(self.bob).unread_count, 0)
+        self.assertEqual(self.member(self.bob).last_read_message_id, last)
+
+    def test_mark_read_up_to_a_message_and_to_the_newest(self):
+        first = self.send(self.alice)
+        self.send(self.alice)
+        self.send(self.bob)
+
+        self.client.force_authenticate(self.carol)
+        response = self.client.post(self.read_url, {'message_id': first}, format='json')
+        self.assertEqual((response.data['unread_count'], response.data['last_read_message_id']), (2, first))
+
+        response = self.client.post(self.read_url, {}, format='json')
+        self.assertEqual(response.data['unread_count'], 0)
+        # The cursor never moves backwards.
+        response = self.client.post(self.read_url, {'message_id': first}, format='json')
+        self.assertEqual(response.data['unread_count'], 0)
+        self.assertNotEqual(response.data['last_read_message_id'], first)
+
+    def test_mark_read_rejects_foreign_messages(self):
+        other = Conversation.objects.create(created_by=self.alice)
+        foreign = Message.objects.create(conversation=other, sender=self.alice, body='elsewhere')
+        self.client.force_authenticate(self.carol)
+        response = self.client.post(self.read_url, {'message_id': foreign.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_conversation_list_shows_own_counter_without_counting(self):
+        self.send(self.alice)
+        self.send(self.alice)
+        self.client.force_authenticate(self.carol)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('chats:conversations'))
+        self.assertEqual(response.data['results'][0]['unread_count'], 2)
+
+    def test_reconcile_repairs_drift(self):
+        self.send(self.alice)
+        self.send(self.alice)
+        ConversationMember.objects.filter(user=self.carol).update(unread_count=7)
+        out = io.StringIO()
+        call_command('reconcile_unread_counts', '--dry-run', stdout=out)
+        self.assertIn('would fix 1', out.getvalue())
+        self.assertEqual(self.member(self.carol).unread_count, 7)
+        call_command('reconcile_unread_counts', stdout=io.StringIO())
+        self.assertEqual(self.member(self.carol).unread_count, 2)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class MessageIngestTests(TestCase):
+    """Tests for group-committed message ingestion."""
+
+    def setUp(self):
+        self.alice = create_user('alice')
+        self.bob = create_user('bob')
+        self.carol = create_user('carol')
+        self.first = Conversation.objects.create(created_by=self.alice)
+        self.second = Conversation.objects.create(created_by=self.alice)
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user=user)
+            for conversation in (self.first, self.second)
+            for user in (self.alice, self.bob, self.carol)
+        ])
+        self.ingestor = MessageIngestor(background=False)
+
+    def submit(self, conversation, user, body='hi'):
+        return self.ingestor.submit(conversation.pk, user.user_id, body)
+
+    def test_batch_assigns_sequences_and_acknowledges_after_commit(self):
+        futures = [
+            self.submit(self.first, self.alice, 'one'),
+            self.submit(self.second, self.bob, 'other'),
+            self.submit(self.first, self.bob, 'two'),
+            self.submit(self.first, self.alice, 'three'),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingestor.drain()
+            self.assertFalse(any(future.done() for future in futures))
+        messages = [future.result() for future in futures]
+        self.assertEqual([message.sequence for message in messages], [1, 1, 2, 3])
+        self.assertEqual(
+            list(Message.objects.filter(conversation=self.first).order_by('created_at', 'id').values_list('body', flat=True)),
+            ['one', 'two', 'three'],
+        )
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.last_sequence, 3)
+        # Indexed through the same task as the per-row path.
+        self.assertTrue(MessageSearchTerm.objects.filter(term='three', message=messages[3]).exists())
+
+    def test_batch_counts_unread_like_single_sends(self):
+        for user in (self.alice, self.bob, self.alice, self.carol, self.carol):
+            self.submit(self.first, user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingestor.drain()
+        members = {
+            member.user_id: member
+            for member in ConversationMember.objects.filter(conversation=self.first)
+        }
+        self.assertEqual(members[self.alice.user_id].unread_count, 2)
+        self.assertEqual(members[self.bob.user_id].unread_count, 3)
+        self.assertEqual(members[self.carol.user_id].unread_count, 0)
+        last = Message.objects.get(conversation=self.first, sequence=5)
+        self.assertEqual(members[self.carol.user_id].last_read_message_id, last.id)
+
+    def test_ids_are_filled_in_without_bulk_insert_returning(self):
+        self.submit(self.first, self.bob, 'earlier')
+        futures = [self.submit(self.first, self.alice), self.submit(self.second, self.bob)]
+        features = connection.features
+        with mock.patch.object(type(features), 'can_return_rows_from_bulk_insert', False), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.ingestor.drain()
+        for future in futures:
+            message = future.result()
+            self.assertEqual(message.pk, Message.objects.get(
+                conversation_id=message.conversation_id, sequence=message.sequence,
+            ).pk)
+        member = ConversationMember.objects.get(conversation=self.first, user=self.alice)
+        self.assertEqual(member.last_read_message_id, futures[0].result().pk)
+
+    def test_missing_conversation_fails_only_its_message(self):
+        gone = self.submit(Conversation(), self.alice)
+        kept = self.submit(self.first, self.alice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingestor.drain()
+        with self.assertRaises(Conversation.DoesNotExist):
+            gone.result()
+        self.assertEqual(kept.result().sequence, 1)
+
+    def test_fan_out_failure_after_commit_still_acknowledges(self):
+        futures = [self.submit(self.first, self.alice), self.submit(self.first, self.bob)]
+        with mock.patch('apps.chats.ingest.notify_new_messages', side_effect=RuntimeError('boom')), \
+                self.assertLogs('django.test', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.ingestor.drain()
+        self.assertEqual([future.result().sequence for future in futures], [1, 2])
+
+    def test_failed_batch_fails_every_sender(self):
+        futures = [self.submit(self.first, self.alice), self.submit(self.first, self.bob)]
+        with mock.patch('apps.chats.ingest.record_new_messages', side_effect=RuntimeError('boom')):
+            with self.assertLogs('apps.chats.ingest', 'ERROR'):
+                self.ingestor.drain()
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result()
+        self.assertFalse(Message.objects.exists())
+
+    def test_endpoint_numbers_messages_per_conversation(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        sequences = []
+        for conversation in (self.first, self.first, self.second):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post(
+                    reverse('chats:messages', args=[conversation.pk]), {'body': 'hello'}, format='json',
+                )
+            sequences.append(response.data['chat_message']['sequence'])
+        self.assertEqual(sequences, [1, 2, 1])
+
+    @override_settings(CHAT_INGEST_BATCHING=True)
+    def test_batched_send_pins_the_sender_to_the_primary(self):
+        ingestor = MessageIngestor(background=False)
+        future = Future()
+        future.set_result(Message(conversation=self.first, sequence=1))
+        token = begin_routing()
+        try:
+            with mock.patch('apps.chats.ingest.get_message_ingestor', return_value=ingestor), \
+                    mock.patch.object(ingestor, 'submit', return_value=future):
+                send_message(self.first.pk, self.alice.user_id, 'hi')
+            self.assertTrue(get_routing_state().wrote)
+        finally:
+            end_routing(token)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class MessageIngestThreadTests(TransactionTestCase):
+    """Tests for the ingestor's background flush thread."""
+
+    def test_concurrent_senders_share_batches(self):
+        alice = create_user('alice')
+        conversation = Conversation.objects.create(created_by=alice)
+        ConversationMember.objects.create(conversation=conversation, user=alice)
+        ingestor = MessageIngestor(max_batch=50, max_delay=0.2)
+        flushed = []
+        flush = ingestor.flush
+
+        def record(batch):
+            flushed.append(len(batch))
+            flush(batch)
+
+        ingestor.flush = record
+        futures = [ingestor.submit(conversation.pk, alice.user_id, f'message {i}') for i in range(10)]
+        messages = [future.result(timeout=10) for future in futures]
+        self.assertEqual([message.sequence for message in messages], list(range(1, 11)))
+        self.assertLess(len(flushed), 10)
+        self.assertEqual(Message.objects.filter(conversation=conversation).count(), 10)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class MessageSearchTests(TestCase):
+    """Tests for full-text message search."""
+
+    def setUp(self):
+        self.alice = create_user('alice')
+        self.bob = create_user('bob')
+        self.mallory = create_user('mallory')
+        self.shared = self.create_conversation(self.alice, self.bob)
+        self.private = self.create_conversation(self.alice, self.mallory)
+        self.client = APIClient()
+        self.url = reverse('chats:search')
+
+    def create_conversation(self, *users):
+        conversation = Conversation.objects.create(created_by=users[0])
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user=user) for user in users
+        ])
+        return conversation
+
+    def send(self, user, conversation, body):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('chats:messages', args=[conversation.conversation_id]), {'body': body}, format='json',
+            )
+        self.assertEqual(response.status_code, 201)
+        return response.data['chat_message']['id']
+
+    def search(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_finds_messages_containing_every_term(self):
+        both = self.send(self.alice, self.shared, 'Lunch at the Café tomorrow?')
+        self.send(self.bob, self.shared, 'Lunch sounds good')
+        self.assertEqual(self.search(self.bob, q='CAFE lunch'), [both])
+        self.assertEqual(len(self.search(self.bob, q='lunch')), 2)
+        self.assertEqual(self.search(self.bob, q='dinner'), [])
+        self.assertEqual(self.search(self.bob, q='the at'), [])
+
+    def test_results_respect_membership(self):
+        self.send(self.alice, self.private, 'secret plans')
+        shared = self.send(self.alice, self.shared, 'public plans')
+        self.assertEqual(self.search(self.bob, q='plans'), [shared])
+        self.assertEqual(len(self.search(self.alice, q='plans')), 2)
+        self.assertEqual(
+            self.search(self.alice, q='plans', conversation_id=self.shared.conversation_id), [shared],
+        )
+
+    def test_results_are_cursor_paged_newest_first(self):
+        ids = [self.send(self.alice, self.shared, f'report number {i}') for i in range(5)]
+        self.client.force_authenticate(self.bob)
+        first = self.client.get(self.url, {'q': 'report', 'page_size': 3}).data
+        second = self.client.get(first['next']).data
+        self.assertEqual([item['id'] for item in first['results'] + second['results']], ids[::-1])
+        self.assertIsNone(second['next'])
+
+    def test_postings_go_with_their_conversation(self):
+        self.send(self.alice, self.shared, 'soon gone')
+        self.assertTrue(MessageSearchTerm.objects.exists())
+        self.shared.delete()
+        self.assertFalse(MessageSearchTerm.objects.exists())
+
+    def test_rebuild_indexes_existing_messages(self):
+        message = Message.objects.create(conversation=self.shared, sender=self.alice, body='backfilled words')
+        self.assertEqual(self.search(self.bob, q='backfilled'), [])
+        call_command('rebuild_message_index', stdout=io.StringIO())
+        self.assertEqual(self.search(self.bob, q='backfilled'), [message.id])
+
+
+class AttachmentTests(TestCase):
+    """Tests for resumable attachment uploads and ranged downloads."""
+
+    def setUp(self):
+        storage = tempfile.TemporaryDirectory()
+        self.addCleanup(storage.cleanup)
+        settings_override = override_settings(ATTACHMENT_STORAGE_ROOT=storage.name, ATTACHMENT_CHUNK_SIZE=4)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.alice = create_user('alice')
+        self.mallory = create_user('mallory')
+        self.conversation = Conversation.objects.create(created_by=self.alice)
+        ConversationMember.objects.create(conversation=self.conversation, user=self.alice)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def start(self, size, filename='notes.txt'):
+        response = self.client.post(
+            reverse('chats:upload-create', args=[self.conversation.conversation_id]),
+            {'filename': filename, 'content_type': 'text/plain', 'size': size}, format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return reverse('chats:upload-detail', args=[response.data['upload']['upload_id']])
+
+    def send(self, url, offset, data):
+        return self.client.generic(
+            'PATCH', url, data, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload(self, content, filename='notes.txt'):
+        url = self.start(len(content), filename)
+        for offset in range(0, len(content), 4):
+            response = self.send(url, offset, content[offset:offset + 4])
+        self.assertEqual(response.status_code, 201)
+        return response.data['attachment']
+
+    def download(self, attachment, **headers):
+        return self.client.get(reverse('chats:attachment', args=[attachment['attachment_id']]), **headers)
+
+    def test_chunked_upload_resumes_from_the_stored_offset(self):
+        url = self.start(10)
+        self.assertEqual(self.send(url, 0, b'0123').data['offset'], 4)
+        conflict = self.send(url, 0, b'0123')
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.data['offset'], 4)
+        self.assertEqual(self.client.get(url).data['upload']['offset'], 4)
+        # A new process has no running hash and rebuilds it from disk.
+        attachments.hashers.entries.clear()
+        self.assertEqual(self.send(url, 4, b'4567').status_code, 200)
+        self.assertEqual(self.send(url, 8, b'89xx').status_code, 413)
+        attachment = self.send(url, 8, b'89').data['attachment']
+        self.assertEqual(attachment['sha256'], hashlib.sha256(b'0123456789').hexdigest())
+        self.assertEqual(attachment['size'], 10)
+        self.assertFalse(AttachmentUpload.objects.exists())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_identical_content_is_stored_once(self):
+        first = self.upload(b'same bytes', 'a.txt')
+        second = self.upload(b'same bytes', 'b.txt')
+        self.assertNotEqual(first['attachment_id'], second['attachment_id'])
+        self.assertEqual(AttachmentBlob.objects.count(), 1)
+        self.assertFalse(os.listdir(os.path.join(settings.ATTACHMENT_STORAGE_ROOT, 'uploads')))
+
+    def test_download_serves_ranges(self):
+        attachment = self.upload(b'0123456789')
+        response = self.download(attachment)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('attachment; filename="notes.txt"', response['Content-Disposition'])
+        cases = [('bytes=2-5', b'2345', 'bytes 2-5/10'), ('bytes=7-', b'789', 'bytes 7-9/10'), ('bytes=-3', b'789', 'bytes 7-9/10')]
+        for header, body, content_range in cases:
+            with self.subTest(header):
+                response = self.download(attachment, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+                response.close()
+        response = self.download(attachment, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_only_members_can_upload_or_download(self):
+        attachment = self.upload(b'private')
+        self.client.force_authenticate(self.mallory)
+        self.assertEqual(self.download(attachment).status_code, 404)
+        response = self.client.post(
+            reverse('chats:upload-create', args=[self.conversation.conversation_id]),
+            {'filename': 'x', 'size': 1}, format='json',
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_cleanup_removes_stale_uploads_and_orphan_blobs(self):
+        self.start(10)
+        attachment = self.upload(b'short-lived')
+        Attachment.objects.filter(pk=attachment['attachment_id']).delete()
+        call_command('cleanup_attachments', max_age=0, stdout=io.StringIO())
+        self.assertFalse(AttachmentUpload.objects.exists())
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(os.path.exists(attachments.blob_path(attachment['sha256'])))
+
+
+    def test_a_failed_finish_can_be_retried(self):
+        url = self.start(6)
+        self.send(url, 0, b'abcd')
+        with mock.patch.object(Attachment.objects, 'create', side_effect=DatabaseError('boom')):
+            with self.assertRaises(DatabaseError):
+                self.send(url, 4, b'ef')
+        sha256 = hashlib.sha256(b'abcdef').hexdigest()
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(os.path.exists(attachments.blob_path(sha256)))
+        self.assertEqual(self.client.get(url).data['upload']['offset'], 6)
+
+        retried = self.client.generic(
+            'PATCH', url, b'', content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='6', CONTENT_LENGTH='0',
+        )
+        attachment = retried.data['attachment']
+        self.assertEqual(attachment['sha256'], sha256)
+        self.assertEqual(b''.join(self.download(attachment).streaming_content), b'abcdef')
+
+    def test_cleanup_keeps_orphan_blobs_that_an_upload_reused(self):
+        orphan = self.upload(b'reused')
+        Attachment.objects.filter(pk=orphan['attachment_id']).delete()
+        reused = self.upload(b'reused')
+        call_command('cleanup_attachments', max_age=0, stdout=io.StringIO())
+        self.assertEqual(b''.join(self.download(reused).streaming_content), b'reused')
+
+class ChatConsumerTests(SimpleTestCase):
+    """Tests for the WebSocket delivery path of the ASGI application."""
+
+    async def connect(self, query_string):
+        inbox = asyncio.Queue()
+        outbox = asyncio.Queue()
+        scope = {'type': 'websocket', 'path': '/ws/chats/', 'query_string': query_string, 'headers': []}
+        await inbox.put({'type': 'websocket.connect'})
+        task = asyncio.create_task(application(scope, inbox.get, outbox.put))
+        return inbox, outbox, task
+
+    async def test_rejects_connection_without_valid_token(self):
+        inbox, outbox, task = await self.connect(b'token=not-a-jwt')
+        event = await asyncio.wait_for(outbox.get(), 1)
+        self.assertEqual(event, {'type': 'websocket.close', 'code': 4401})
+        await asyncio.wait_for(task, 1)
+
+    async def test_published_messages_reach_connected_member(self):
+        user_id = str(uuid.uuid4())
+        token = AccessToken()
+        token['user_id'] = user_id
+        inbox, outbox, task = await self.connect(f'token={token}'.encode())
+        self.assertEqual((await asyncio.wait_for(outbox.get(), 1))['type'], 'websocket.accept')
+
+        get_channel_layer().group_send(user_group(user_id), {'type': 'message.new', 'body': 'hi'})
+        event = await asyncio.wait_for(outbox.get(), 1)
+        self.assertEqual(json.loads(event['text']), {'type': 'message.new', 'body': 'hi'})
+
+        await inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(get_channel_layer().connection_count(), 0)
+
+    @override_settings(CHAT_WS_MAX_OUTBOX=2)
+    async def test_client_that_falls_behind_is_closed(self):
+        token = AccessToken()
+        token['user_id'] = user_id = str(uuid.uuid4())
+        inbox, sent, stalled = asyncio.Queue(), asyncio.Queue(), asyncio.Event()
+
+        async def send(event):
+            await sent.put(event)
+            if event['type'] == 'websocket.send':
+                await stalled.wait()
+
+        scope = {'type': 'websocket', 'path': '/ws/chats/', 'query_string': f'token={token}'.encode(), 'headers': []}
+        await inbox.put({'type': 'websocket.connect'})
+        task = asyncio.create_task(application(scope, inbox.get, send))
+        self.assertEqual((await asyncio.wait_for(sent.get(), 1))['type'], 'websocket.accept')
+
+        for n in range(3):
+            get_channel_layer().group_send(user_group(user_id), {'type': 'message.new', 'n': n})
+        self.assertEqual(await asyncio.wait_for(sent.get(), 1), {'type': 'websocket.close', 'code': 1008})
+        await inbox.put({'type': 'websocket.disconnect', 'code': 1008})
+        await asyncio.wait_for(task, 1)
+        self.assertTrue(sent.empty())
+        self.assertEqual(get_channel_layer().connection_count(), 0)
+
+
+class RecordingConnection:
+    """Connection stand-in that records pushed frames."""
+
+    def __init__(self):
+        self.frames = asyncio.Queue()
+
+    def push(self, text):
+        self.frames.put_nowait(json.loads(text))
+
+
+class InMemoryChannelLayerTests(SimpleTestCase):
+    """Tests for the in-memory channel layer."""
+
+    async def test_group_send_reaches_members_of_every_group(self):
+        layer = InMemoryChannelLayer()
+        first, second, outsider = RecordingConnection(), RecordingConnection(), RecordingConnection()
+        await layer.group_add('a', first)
+        await layer.group_add('b', second)
+        await layer.group_add('c', outsider)
+
+        layer.group_send(['a', 'b'], {'n': 1})
+        self.assertEqual(await asyncio.wait_for(first.frames.get(), 1), {'n': 1})
+        self.assertEqual(await asyncio.wait_for(second.frames.get(), 1), {'n': 1})
+        self.assertTrue(outsider.frames.empty())
+
+    async def test_group_send_from_another_thread(self):
+        layer = InMemoryChannelLayer()
+        connection = RecordingConnection()
+        await layer.group_add('a', connection)
+        await asyncio.to_thread(layer.group_send, 'a', {'n': 2})
+        self.assertEqual(await asyncio.wait_for(connection.frames.get(), 1), {'n': 2})
+
+    async def test_discarded_connection_stops_receiving(self):
+        layer = InMemoryChannelLayer()
+        connection = RecordingConnection()
+        await layer.group_add('a', connection)
+        await layer.group_discard('a', connection)
+        layer.group_send('a', {'n': 3})
+        await asyncio.sleep(0)
+        self.assertTrue(connection.frames.empty())
+        self.assertEqual(layer.connection_count(), 0)
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis is not installed')
+class RedisChannelLayerTests(SimpleTestCase):
+    """Tests for the Redis channel layer against fakeredis."""
+
+    def make_layer(self, server):
+        return RedisChannelLayer(
+            client=fakeredis.FakeAsyncRedis(server=server),
+            sync_client=fakeredis.FakeRedis(server=server),
+        )
+
+    async def test_batched_publish_reaches_other_process(self):
+        server = fakeredis.FakeServer()
+        receiver, sender = self.make_layer(server), self.make_layer(server)
+        connection = RecordingConnection()
+        await receiver.group_add('user.1', connection)
+        # Register a connection so the sender publishes through its loop buffer.
+        await sender.group_add('user.2', RecordingConnection())
+
+        for n in range(3):
+            sender.group_send('user.1', {'n': n})
+        received = [await asyncio.wait_for(connection.frames.get(), 2) for _ in range(3)]
+        self.assertEqual(received, [{'n': 0}, {'n': 1}, {'n': 2}])
+        await receiver.close()
+        await sender.close()
+
+    async def test_failed_flush_is_logged_and_retried(self):
+        server = fakeredis.FakeServer()
+        receiver = self.make_layer(server)
+        sender = RedisChannelLayer(
+            client=fakeredis.FakeAsyncRedis(server=server), sync_client=fakeredis.FakeRedis(server=server),
+            retry_interval=0.01,
+        )
+        connection = RecordingConnection()
+        await receiver.group_add('user.1', connection)
+        await sender.group_add('user.2', RecordingConnection())
+
+        broken = mock.Mock()
+        broken.execute = mock.AsyncMock(side_effect=ConnectionError('down'))
+        pipeline = sender._client.pipeline
+        with mock.patch.object(sender._client, 'pipeline', side_effect=[broken, pipeline()]), \
+                self.assertLogs('apps.chats.layers', 'ERROR'):
+            sender.group_send('user.1', {'n': 1})
+            self.assertEqual(await asyncio.wait_for(connection.frames.get(), 2), {'n': 1})
+        self.assertEqual(sender.dropped_frames, 0)
+        self.assertEqual(sender._flush_tasks, set())
+        await receiver.close()
+        await sender.close()
+
+    async def test_frames_beyond_max_pending_are_dropped_and_counted(self):
+        layer = RedisChannelLayer(
+            client=fakeredis.FakeAsyncRedis(), sync_client=fakeredis.FakeRedis(), max_pending=2, batch_size=10,
+        )
+        await layer.group_add('user.1', RecordingConnection())
+        for n in range(3):
+            layer.group_send('user.1', {'n': n})
+        self.assertEqual([json.loads(frame) for _, frame in layer._pending], [{'n': 1}, {'n': 2}])
+        self.assertEqual(layer.dropped_frames, 1)
+        await layer.close()
+
+    async def test_publish_without_loop_uses_sync_client(self):
+        server = fakeredis.FakeServer()
+        receiver, sender = self.make_layer(server), self.make_layer(server)
+        connection = RecordingConnection()
+        await receiver.group_add('user.1', connection)
+
+        await asyncio.to_thread(sender.group_send, 'user.1', {'n': 1})
+        self.assertEqual(await asyncio.wait_for(connection.frames.get(), 2), {'n': 1})
+        await receiver.close()
+
+
+class RecordingLayer:
+    """Channel layer stand-in that records ``group_send`` calls."""
+
+    def __init__(self):
+        self.sent = []
+
+    def group_send(self, groups, payload):
+        self.sent.append(([groups] if isinstance(groups, str) else list(groups), payload))
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TimingWheelTests(SimpleTestCase):
+    """Tests for the timing wheel behind presence expiry."""
+
+    def test_expires_due_keys_and_refresh_postpones(self):
+        wheel = TimingWheel(4)
+        self.assertTrue(wheel.schedule('a', 2))
+        self.assertTrue(wheel.schedule('b', 3))
+        self.assertFalse(wheel.schedule('a', 5))
+        self.assertEqual(wheel.advance(3), [('b', None)])
+        self.assertEqual(wheel.advance(5), [('a', None)])
+        self.assertEqual(len(wheel), 0)
+
+    def test_deadlines_beyond_one_revolution_and_large_jumps(self):
+        wheel = TimingWheel(4)
+        wheel.advance(0)
+        wheel.schedule('far', 9)
+        wheel.schedule('near', 1)
+        self.assertEqual(wheel.advance(5), [('near', None)])
+        self.assertIn('far', wheel)
+        self.assertEqual(wheel.advance(100), [('far', None)])
+
+
+class PresenceTrackerTests(SimpleTestCase):
+    """Tests for in-memory presence with transition-only broadcasts."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.clock = FakeClock()
+        self.layer = RecordingLayer()
+        self.tracker = self.make_tracker(self.layer)
+
+    def make_tracker(self, layer):
+        return PresenceTracker(layer=layer, cache=caches['shared'], clock=self.clock, ttl=30, typing_ttl=5)
+
+    def advance(self, seconds, *trackers):
+        for _ in range(seconds):
+            self.clock.now += 1
+            for tracker in trackers or (self.tracker,):
+                tracker.tick()
+
+    def presence_events(self, layer=None):
+        return [(payload['user_id'], payload['online']) for _, payload in (layer or self.layer).sent
+                if payload['type'] == 'presence.changed']
+
+    async def test_tick_loop_keeps_cache_round_trips_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = []
+        cache = caches['shared']
+        recording = mock.Mock(
+            get_many=lambda keys: threads.append(threading.get_ident()) or cache.get_many(keys),
+            set_many=lambda entries, timeout: threads.append(threading.get_ident()) or cache.set_many(entries, timeout),
+        )
+        tracker = PresenceTracker(layer=self.layer, cache=recording, ttl=0.05, tick=0.01)
+        tracker.heartbeat('u1')
+        await asyncio.wait_for(tracker.task, 2)
+        self.assertEqual(self.presence_events(), [('u1', True), ('u1', False)])
+        self.assertTrue(threads)
+        self.assertNotIn(loop_thread, threads)
+
+    def test_heartbeats_broadcast_only_transitions(self):
+        for _ in range(12):
+            self.tracker.heartbeat('u1')
+            self.advance(5)
+        self.assertEqual(self.presence_events(), [('u1', True)])
+        self.assertEqual(self.layer.sent[0][0], ['presence.u1'])
+        # 60 seconds of heartbeats every 5 seconds: one write on arrival, then
+        # one refresh every TTL / 2 instead of one per heartbeat.
+        self.assertLessEqual(self.tracker.stats['cache_writes'], 5)
+
+        self.advance(31)
+        self.assertEqual(self.presence_events(), [('u1', True), ('u1', False)])
+        self.assertFalse(self.tracker.get_presence(['u1'])['u1']['online'])
+
+    def test_presence_is_visible_to_other_processes(self):
+        self.tracker.heartbeat('u1')
+        self.advance(1)
+        other = self.make_tracker(RecordingLayer())
+        state = other.get_presence(['u1', 'u2'])
+        self.assertTrue(state['u1']['online'])
+        self.assertIsNotNone(state['u1']['last_seen'])
+        self.assertEqual(state['u2'], {'online': False, 'last_seen': None})
+
+    def test_user_online_in_another_process_does_not_flap(self):
+        other_layer = RecordingLayer()
+        other = self.make_tracker(other_layer)
+        self.tracker.heartbeat('u1')
+        self.advance(10, self.tracker, other)
+        other.heartbeat('u1')
+        for _ in range(10):
+            other.heartbeat('u1')
+            self.advance(5, self.tracker, other)
+        # The first process expired the user, but the second still has them.
+        self.assertNotIn('u1', self.tracker.online)
+        self.assertEqual(self.presence_events(), [('u1', True)])
+        self.assertEqual(self.presence_events(other_layer), [])
+
+    def test_typing_starts_once_and_expires(self):
+        self.tracker.set_typing('c1', 'u1', ['u1', 'u2'])
+        self.advance(3)
+        self.tracker.set_typing('c1', 'u1')
+        self.advance(3)
+        self.assertTrue(self.tracker.is_typing('c1', 'u1'))
+        self.advance(3)
+        self.assertFalse(self.tracker.is_typing('c1', 'u1'))
+        self.assertEqual(
+            [(groups, payload['typing']) for groups, payload in self.layer.sent],
+            [(['user.u2'], True), (['user.u2'], False)],
+        )
+
+    def test_typing_stop_is_broadcast_immediately(self):
+        self.tracker.set_typing('c1', 'u1', ['u1', 'u2'])
+        self.tracker.set_typing('c1', 'u1', typing=False)
+        self.assertEqual([payload['typing'] for _, payload in self.layer.sent], [True, False])
+        with self.assertRaises(ValueError):
+            self.tracker.set_typing('c1', 'u1')
+
+
+class PresenceEndpointTests(TestCase):
+    """Tests for the batch presence lookup."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.alice = create_user('alice')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.url = reverse('chats:presence')
+
+    def test_returns_presence_for_conversation_members_and_contacts_only(self):
+        member, contact, stranger = create_user('bob'), create_user('carol'), create_user('mallory')
+        conversation = Conversation.objects.create(created_by=self.alice)
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=conversation, user=user) for user in (self.alice, member)
+        ])
+        Contact.objects.create(owner=self.alice, contact=contact)
+        tracker = PresenceTracker(layer=RecordingLayer())
+        for user in (member, stranger):
+            tracker.heartbeat(user.user_id)
+        tracker.tick()
+        user_ids = [str(user.user_id) for user in (member, contact, stranger)]
+        response = self.client.get(self.url, {'user_ids': ','.join(user_ids)})
+        self.assertEqual(response.status_code, 200)
+        states = {item['user_id']: item['online'] for item in response.data['presence']}
+        self.assertEqual(states, {user_ids[0]: True, user_ids[1]: False})
+
+    def test_rejects_invalid_and_oversized_batches(self):
+        self.assertEqual(self.client.get(self.url, {'user_ids': 'nope'}).status_code, 400)
+        too_many = ','.join(str(uuid.uuid4()) for _ in range(201))
+        self.assertEqual(self.client.get(self.url, {'user_ids': too_many}).status_code, 400)
+
+
+class PresenceConsumerTests(TestCase):
+    """Tests for presence and typing frames on the WebSocket."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.alice = create_user('alice')
+        self.bob = create_user('bob')
+        self.conversation = Conversation.objects.create(created_by=self.alice)
+        ConversationMember.objects.bulk_create([
+            ConversationMember(conversation=self.conversation, user=self.alice),
+            ConversationMember(conversation=self.conversation, user=self.bob),
+        ])
+
+    async def connect(self, user):
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        token = AccessToken()
+        token['user_id'] = str(user.user_id)
+        scope = {'type': 'websocket', 'path': '/ws/chats/', 'query_string': f'token={token}'.encode(), 'headers': []}
+        await inbox.put({'type': 'websocket.connect'})
+        task = asyncio.create_task(application(scope, inbox.get, outbox.put))
+        self.assertEqual((await asyncio.wait_for(outbox.get(), 1))['type'], 'websocket.accept')
+        return inbox, outbox, task
+
+    async def receive_json(self, outbox):
+        return json.loads((await asyncio.wait_for(outbox.get(), 2))['text'])
+
+    async def send_json(self, inbox, data):
+        await inbox.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def test_subscribe_and_typing(self):
+        alice_in, alice_out, alice_task = await self.connect(self.alice)
+        bob_in, bob_out, bob_task = await self.connect(self.bob)
+
+        await self.send_json(bob_in, {'type': 'presence.subscribe', 'user_ids': [str(self.alice.user_id), 'bad']})
+        snapshot = await self.receive_json(bob_out)
+        self.assertEqual(snapshot['type'], 'presence.snapshot')
+        self.assertTrue(snapshot['presence'][str(self.alice.user_id)]['online'])
+
+        stranger = await sync_to_async(create_user)('mallory')
+        await self.send_json(bob_in, {'type': 'presence.subscribe', 'user_ids': [str(stranger.user_id)]})
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(bob_out.get(), 0.2)
+
+        await self.send_json(alice_in, {'type': 'typing', 'conversation_id': str(self.conversation.conversation_id)})
+        await self.send_json(alice_in, {'type': 'typing', 'conversation_id': str(self.conversation.conversation_id)})
+        await self.send_json(alice_in, {
+            'type': 'typing', 'conversation_id': str(self.conversation.conversation_id), 'typing': False,
+        })
+        started = await self.receive_json(bob_out)
+        stopped = await self.receive_json(bob_out)
+        self.assertEqual((started['type'], started['user_id'], started['typing']), ('typing', str(self.alice.user_id), True))
+        self.assertFalse(stopped['typing'])
+
+        for inbox, task in ((alice_in, alice_task), (bob_in, bob_task)):
+            await inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+            await asyncio.wait_for(task, 1)
+        self.assertEqual(get_channel_layer().connection_count(), 0)
@@ -0,0 +1,126 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from apps.chats.models import ConversationMember, Message
+
+
+def unread_after(conversation, user_id, cursor):
+    """
+    Return a query counting the messages from others after ``cursor`` (a
+    ``Message`` or ``None``) as a scalar subquery.
+
+    Filtering on ``created_at`` as well as ``id`` keeps the count a range scan
+    on the ``(conversation, created_at, id)`` index.
+    """
+    messages = Message.objects.filter(conversation=conversation).exclude(sender_id=user_id)
+    if cursor is not None:
+        messages = messages.filter(created_at__gte=cursor.created_at, id__gt=cursor.id)
+    return Coalesce(Subquery(
+        messages.order_by().values('conversation').annotate(count=Count('id')).values('count')[:1]
+    ), Value(0))
+
+
+def record_new_message(message):
+    """
+    Bump the unread counter of every other member with one ``UPDATE`` and
+    move the sender's read cursor to their own message.
+    """
+    record_new_messages([message])
+
+
+def record_new_messages(messages):
+    """
+    Count a batch of new messages, in sequence order, against each member.
+
+    Members who sent none of a conversation's new messages fall behind by
+    all of them; they are bumped with one ``UPDATE`` per distinct batch size
+    rather than per conversation. Each sender's cursor moves to their last
+    message and their counter becomes the number of messages from others
+    after it, written with one ``UPDATE`` for a single sender and a bulk
+    update otherwise.
+    """
+    by_conversation = defaultdict(list)
+    for message in messages:
+        by_conversation[message.conversation_id].append(message)
+    by_increment = defaultdict(list)
+    cursors = {}
+    for conversation_id, batch in by_conversation.items():
+        last_sent = {message.sender_id: position for position, message in enumerate(batch)}
+        by_increment[len(batch)].append((conversation_id, list(last_sent)))
+        for sender_id, position in last_sent.items():
+            unread = sum(1 for message in batch[position + 1:] if message.sender_id != sender_id)
+            cursors[conversation_id, sender_id] = (batch[position], unread)
+
+    for increment, conversations in by_increment.items():
+        senders = Q()
+        for conversation_id, sender_ids in conversations:
+            senders |= Q(conversation_id=conversation_id, user_id__in=sender_ids)
+        ConversationMember.objects.filter(
+            conversation_id__in=[conversation_id for conversation_id, _ in conversations],
+        ).exclude(senders).update(unread_count=F('unread_count') + increment)
+
+    if len(cursors) == 1:
+        (conversation_id, sender_id), (message, unread) = next(iter(cursors.items()))
+        ConversationMember.objects.filter(conversation_id=conversation_id, user_id=sender_id).update(
+            last_read_message=message, unread_count=unread,
+        )
+    elif cursors:
+        members = ConversationMember.objects.filter(reduce(or_, (
+            Q(conversation_id=conversation_id, user_id=sender_id) for conversation_id, sender_id in cursors
+        ))).only('id', 'conversation_id', 'user_id')
+        members = list(members)
+        for member in members:
+            member.last_read_message, member.unread_count = cursors[member.conversation_id, member.user_id]
+        ConversationMember.objects.bulk_update(members, ['last_read_message', 'unread_count'])
+
+
+def mark_read(user_id, conversation, message=None):
+    """
+    Move a member's read cursor forward to ``message``, or to the newest
+    message when it is omitted, and recount what is left unread.
+
+    The recount runs inside the ``UPDATE`` and only covers messages after the
+    new cursor, which is nothing when reading up to the newest message.
+    Returns whether the cursor moved; it never moves backwards.
+    """
+    if message is None:
+        message = Message.objects.filter(conversation=conversation).order_by('-created_at', '-id').first()
+        if message is None:
+            return False
+    return bool(ConversationMember.objects.filter(
+        Q(last_read_message__isnull=True) | Q(last_read_message__lt=message.id),
+        conversation=conversation,
+        user_id=user_id,
+    ).update(last_read_message=message, unread_count=unread_after(conversation, user_id, message)))
+
+
+def reconcile_unread_counts(members, dry_run=False):
+    """
+    Recount the unread messages of ``members`` (a ``ConversationMember``
+    queryset) and fix the counters that drifted.
+
+    Returns ``(checked, fixed)``.
+    """
+    checked = fixed = 0
+    cursors = Message.objects.filter(pk=OuterRef('last_read_message_id'))
+    rows = members.annotate(
+        cursor_created_at=Subquery(cursors.values('created_at')[:1]),
+    ).values_list('pk', 'conversation_id', 'user_id', 'last_read_message_id', 'cursor_created_at', 'unread_count')
+    for pk, conversation_id, user_id, cursor_id, cursor_created_at, stored in rows.iterator(chunk_size=1000):
+        checked += 1
+        messages = Message.objects.filter(conversation_id=conversation_id).exclude(sender_id=user_id)
+        if cursor_id is not None:
+            messages = messages.filter(id__gt=cursor_id)
+            if cursor_created_at is not None:
+                messages = messages.filter(created_at__gte=cursor_created_at)
+        actual = messages.count()
+        if actual != stored:
+            fixed += 1
+            if not dry_run:
+                # Skip the row if a send or read changed it since the count.
+                ConversationMember.objects.filter(pk=pk, unread_count=stored).update(unread_count=actual)
+    return checked, fixed
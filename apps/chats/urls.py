@@ -1,3 +1,15 @@
+from django.urls import path
+
+from apps.chats import views
+
+app_name = 'chats'
 urlpatterns = [
-    # User URLs will be added here in the future
-]
\ No newline at end of file
+    path('conversations/', views.conversation_list_create, name='conversations'),
+    path('conversations/<uuid:conversation_id>/messages/', views.message_list_create, name='messages'),
+    path('conversations/<uuid:conversation_id>/read/', views.mark_conversation_read, name='read'),
+    path('conversations/<uuid:conversation_id>/uploads/', views.upload_create, name='upload-create'),
+    path('uploads/<uuid:upload_id>/', views.upload_detail, name='upload-detail'),
+    path('attachments/<uuid:attachment_id>/', views.attachment_download, name='attachment'),
+    path('search/', views.message_search, name='search'),
+    path('presence/', views.presence_list, name='presence'),
+]
@@ -1,3 +1,405 @@
-from django.shortcuts import render
+import os
 
-# Create your views here.
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import content_disposition_header
+from rest_framework import status
+from rest_framework.decorators import api_view, throttle_classes
+from rest_framework.response import Response
+
+from apps.chats import attachments
+from apps.chats.ingest import send_message
+from apps.chats.models import Attachment, AttachmentUpload, Conversation, ConversationMember, Message
+from apps.chats.pagination import ConversationCursorPagination, MessageCursorPagination
+from apps.chats.presence import get_presence_tracker, visible_user_ids
+from apps.chats.search import search_messages
+from apps.chats.serializers import (
+    AttachmentSerializer,
+    AttachmentUploadSerializer,
+    ConversationSerializer,
+    CreateConversationSerializer,
+    MarkReadSerializer,
+    MessageSearchQuerySerializer,
+    MessageSerializer,
+    PresenceQuerySerializer,
+    PresenceSerializer,
+    StartUploadSerializer,
+)
+from apps.chats.unread import mark_read
+from config.schema import openapi, swagger_auto_schema
+from core.throttling import MessageSearchThrottle
+
+
+def get_conversation_for_member(user, conversation_id):
+    """Return the conversation if the user is a member, otherwise raise 404."""
+    return get_object_or_404(
+        Conversation.objects.filter(memberships__user_id=user.user_id),
+        conversation_id=conversation_id,
+    )
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: ConversationSerializer(many=True)},
+    operation_description='List the conversations of the current user, most recently active first.',
+    tags=['Chats']
+)
+@swagger_auto_schema(
+    method='post',
+    request_body=CreateConversationSerializer,
+    responses={
+        201: 'Conversation created successfully.',
+        400: 'Bad request.',
+    },
+    operation_description='Start a new conversation with one or more users.',
+    tags=['Chats']
+)
+@api_view(['GET', 'POST'])
+def conversation_list_create(request):
+    """List the current user's conversations or start a new one."""
+
+    if request.method == 'GET':
+        queryset = Conversation.objects.filter(
+            memberships__user_id=request.user.user_id,
+        ).prefetch_related('memberships')
+        paginator = ConversationCursorPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        return paginator.get_paginated_response(
+            ConversationSerializer(page, many=True, context={'request': request}).data
+        )
+
+    serializer = CreateConversationSerializer(data=request.data)
+    if serializer.is_valid():
+        member_ids = set(serializer.validated_data['member_ids'])
+        member_ids.add(request.user.user_id)
+        with transaction.atomic():
+            conversation = Conversation.objects.create(
+                title=serializer.validated_data['title'],
+                is_group=len(member_ids) > 2,
+                created_by_id=request.user.user_id,
+            )
+            ConversationMember.objects.bulk_create([
+                ConversationMember(conversation=conversation, user_id=member_id) for member_id in member_ids
+            ])
+        return Response({
+            'status_code': status.HTTP_201_CREATED,
+            'status': 'success',
+            'message': 'Conversation created successfully.',
+            'conversation': ConversationSerializer(conversation, context={'request': request}).data,
+        }, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: MessageSerializer(many=True)},
+    operation_description='Page through the message history of a conversation, newest first.',
+    tags=['Chats']
+)
+@swagger_auto_schema(
+    method='post',
+    request_body=MessageSerializer,
+    responses={
+        201: 'Message sent successfully.',
+        400: 'Bad request.',
+    },
+    operation_description='Send a message to a conversation.',
+    tags=['Chats']
+)
+@api_view(['GET', 'POST'])
+def message_list_create(request, conversation_id):
+    """List the messages of a conversation or post a new one."""
+
+    conversation = get_conversation_for_member(request.user, conversation_id)
+
+    if request.method == 'GET':
+        queryset = Message.objects.filter(conversation=conversation)
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        return paginator.get_paginated_response(MessageSerializer(page, many=True).data)
+
+    serializer = MessageSerializer(data=request.data)
+    if serializer.is_valid():
+        try:
+            message = send_message(conversation.pk, request.user.user_id, serializer.validated_data['body'])
+        except Conversation.DoesNotExist:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except TimeoutError:
+            return Response({
+                'status_code': status.HTTP_503_SERVICE_UNAVAILABLE,
+                'status': 'error',
+                'message': 'The message could not be stored in time.',
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({
+            'status_code': status.HTTP_201_CREATED,
+            'status': 'success',
+            'message': 'Message sent successfully.',
+            'chat_message': MessageSerializer(message).data,
+        }, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, description='Words the messages must contain.', type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('conversation_id', openapi.IN_QUERY, description='Only search this conversation.', type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID),
+    ],
+    responses={
+        200: MessageSerializer(many=True),
+        400: 'Bad request.',
+    },
+    operation_description='Search the messages of the current user\'s conversations, newest first.',
+    tags=['Chats']
+)
+@api_view(['GET'])
+@throttle_classes([MessageSearchThrottle])
+def message_search(request):
+    """Full-text search over the current user's conversations."""
+
+    serializer = MessageSearchQuerySerializer(data=request.query_params)
+    if serializer.is_valid():
+        queryset = search_messages(
+            request.user.user_id,
+            serializer.validated_data['q'],
+            conversation_id=serializer.validated_data.get('conversation_id'),
+        )
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        return paginator.get_paginated_response(MessageSerializer(page, many=True).data)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='post',
+    request_body=MarkReadSerializer,
+    responses={
+        200: 'Conversation marked as read.',
+        400: 'Bad request.',
+    },
+    operation_description='Mark a conversation as read up to a message, or up to the newest message.',
+    tags=['Chats']
+)
+@api_view(['POST'])
+def mark_conversation_read(request, conversation_id):
+    """Move the current user's read cursor in a conversation."""
+
+    conversation = get_conversation_for_member(request.user, conversation_id)
+    serializer = MarkReadSerializer(data=request.data)
+    if serializer.is_valid():
+        message = None
+        if 'message_id' in serializer.validated_data:
+            message = Message.objects.filter(
+                conversation=conversation, pk=serializer.validated_data['message_id'],
+            ).first()
+            if message is None:
+                return Response(
+                    {'message_id': ['Message not found in this conversation.']},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        mark_read(request.user.user_id, conversation, message)
+        member = ConversationMember.objects.only('unread_count', 'last_read_message_id').get(
+            conversation=conversation, user_id=request.user.user_id,
+        )
+        return Response({
+            'status_code': status.HTTP_200_OK,
+            'status': 'success',
+            'message': 'Conversation marked as read.',
+            'unread_count': member.unread_count,
+            'last_read_message_id': member.last_read_message_id,
+        }, status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('user_ids', openapi.IN_QUERY, description='Comma-separated user ids.', type=openapi.TYPE_STRING, required=True),
+    ],
+    responses={
+        200: PresenceSerializer(many=True),
+        400: 'Bad request.',
+    },
+    operation_description='Look up whether several users that share a conversation with the caller, or are their contacts, are online.',
+    tags=['Chats']
+)
+@api_view(['GET'])
+def presence_list(request):
+    """Return the presence of a batch of users; users outside the caller's conversations and contacts are left out."""
+
+    serializer = PresenceQuerySerializer(data=request.query_params)
+    if serializer.is_valid():
+        user_ids = visible_user_ids(request.user.user_id, serializer.validated_data['user_ids'])
+        presence = get_presence_tracker().get_presence(user_ids)
+        return Response({
+            'status_code': status.HTTP_200_OK,
+            'status': 'success',
+            'message': 'Presence retrieved successfully.',
+            'presence': PresenceSerializer(
+                [{'user_id': user_id, **state} for user_id, state in presence.items()], many=True,
+            ).data,
+        }, status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='post',
+    request_body=StartUploadSerializer,
+    responses={
+        201: AttachmentUploadSerializer,
+        400: 'Bad request.',
+    },
+    operation_description='Start a resumable attachment upload. Send the bytes with PATCH to the returned upload.',
+    tags=['Chats']
+)
+@api_view(['POST'])
+def upload_create(request, conversation_id):
+    """Start a resumable upload into a conversation."""
+
+    conversation = get_conversation_for_member(request.user, conversation_id)
+    serializer = StartUploadSerializer(data=request.data)
+    if serializer.is_valid():
+        upload = attachments.start_upload(conversation, request.user.user_id, **serializer.validated_data)
+        return Response({
+            'status_code': status.HTTP_201_CREATED,
+            'status': 'success',
+            'message': 'Upload started successfully.',
+            'upload': AttachmentUploadSerializer(upload).data,
+        }, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: AttachmentUploadSerializer},
+    operation_description='Return how many bytes of an upload have been received, to resume it from there.',
+    tags=['Chats']
+)
+@swagger_auto_schema(
+    method='patch',
+    manual_parameters=[
+        openapi.Parameter('Upload-Offset', openapi.IN_HEADER, description='Offset the chunk starts at.', type=openapi.TYPE_INTEGER, required=True),
+    ],
+    responses={
+        200: 'Chunk stored.',
+        201: AttachmentSerializer,
+        400: 'Bad request.',
+        409: 'The offset does not match the upload.',
+        413: 'The chunk is too large.',
+    },
+    operation_description=(
+        'Append the raw request body to an upload. The response to the last chunk is the attachment.'
+    ),
+    tags=['Chats']
+)
+@api_view(['GET', 'PATCH'])
+def upload_detail(request, upload_id):
+    """Report or advance an upload in progress."""
+
+    upload = get_object_or_404(AttachmentUpload, upload_id=upload_id, owner_id=request.user.user_id)
+
+    if request.method == 'GET':
+        return Response({
+            'status_code': status.HTTP_200_OK,
+            'status': 'success',
+            'message': 'Upload retrieved successfully.',
+            'upload': AttachmentUploadSerializer(upload).data,
+        }, status=status.HTTP_200_OK)
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return Response(
+            {'detail': 'Upload-Offset and Content-Length headers are required.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    # The body is copied from the request stream in fixed-size blocks; it is
+    # never parsed, so DRF does not buffer it.
+    try:
+        attachment = attachments.write_chunk(upload, offset, request.stream, length)
+    except attachments.ChunkTooLarge:
+        return Response({
+            'status_code': status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            'status': 'error',
+            'message': f'Chunks are limited to {settings.ATTACHMENT_CHUNK_SIZE} bytes and must fit the upload.',
+        }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except attachments.UploadConflict as conflict:
+        return Response({
+            'status_code': status.HTTP_409_CONFLICT,
+            'status': 'error',
+            'message': 'The chunk does not start at the upload offset.',
+            'offset': conflict.offset,
+        }, status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': str(conflict.offset)})
+
+    if attachment is not None:
+        return Response({
+            'status_code': status.HTTP_201_CREATED,
+            'status': 'success',
+            'message': 'Attachment uploaded successfully.',
+            'attachment': AttachmentSerializer(attachment).data,
+        }, status=status.HTTP_201_CREATED)
+    return Response({
+        'status_code': status.HTTP_200_OK,
+        'status': 'success',
+        'message': 'Chunk stored successfully.',
+        'offset': upload.received,
+    }, status=status.HTTP_200_OK, headers={'Upload-Offset': str(upload.received)})
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('Range', openapi.IN_HEADER, description='A single bytes= range.', type=openapi.TYPE_STRING),
+    ],
+    responses={
+        200: 'The file.',
+        206: 'The requested range of the file.',
+        416: 'The range is not satisfiable.',
+    },
+    operation_description='Download an attachment, or a byte range of it.',
+    tags=['Chats']
+)
+@api_view(['GET'])
+def attachment_download(request, attachment_id):
+    """Serve an attachment to a member of its conversation."""
+
+    attachment = get_object_or_404(
+        Attachment.objects.select_related('blob').filter(conversation__memberships__user_id=request.user.user_id),
+        attachment_id=attachment_id,
+    )
+    size = attachment.blob.size
+    try:
+        byte_range = attachments.parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if settings.ATTACHMENT_ACCEL_REDIRECT_PREFIX:
+        # nginx reads the file itself and handles Range requests.
+        response = HttpResponse(content_type=attachment.content_type)
+        relative = os.path.relpath(attachments.blob_path(attachment.blob_id), settings.ATTACHMENT_STORAGE_ROOT)
+        response['X-Accel-Redirect'] = settings.ATTACHMENT_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative
+        response['Content-Disposition'] = content_disposition_header(True, attachment.filename)
+        return response
+
+    path = attachments.blob_path(attachment.blob_id)
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(
+            file, as_attachment=True, filename=attachment.filename, content_type=attachment.content_type,
+        )
+        # Picked up by PathsendASGIHandler to let the server send the file.
+        response.sendfile_path = path
+    else:
+        start, end = byte_range
+        if end == size - 1:
+            # A real file positioned at ``start`` keeps wsgi.file_wrapper
+            # (and so sendfile) usable for the rest of the file.
+            file.seek(start)
+            body = file
+        else:
+            body = attachments.FileRange(file, start, end - start + 1)
+        response = FileResponse(
+            body, status=status.HTTP_206_PARTIAL_CONTENT,
+            as_attachment=True, filename=attachment.filename, content_type=attachment.content_type,
+        )
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.users.models import UserSearchToken
+from apps.users.search import index_users, search_users
+
+FIRST_NAMES = ['john', 'johanna', 'maria', 'mario', 'li', 'wei', 'amir', 'amara', 'zoe', 'sam', 'samuel', 'olga']
+LAST_NAMES = ['smith', 'smythe', 'garcia', 'berg', 'bergman', 'chen', 'cheng', 'khan', 'novak', 'walker']
+QUERIES = ['j', 'jo', 'joh', 'mar', 'sam smi', 'chen', 'amir k', 'bergm', 'zoe wal', 'user12', 'nobody']
+
+
+class Command(BaseCommand):
+    """Seed the users directory and measure search latency."""
+    help = 'Seed N users into the search index (optionally rebuilding it) and report search latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help='Users to seed before measuring; 0 seeds none.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--rebuild', action='store_true', help='Rebuild the token index from the users table first.')
+
+    def handle(self, *args, **options):
+        if options['users']:
+            self.seed(options['users'], options['batch_size'])
+        if options['rebuild']:
+            self.rebuild(options['batch_size'])
+        self.stdout.write(
+            f'{User.objects.count()} users, {UserSearchToken.objects.count()} tokens, {options["queries"]} queries'
+        )
+
+        timings = []
+        rng = random.Random(0)
+        for _ in range(options['queries']):
+            query = rng.choice(QUERIES)
+            started = time.perf_counter()
+            search_users(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f'p50 {statistics.median(timings):.2f} ms  '
+            f'p99 {timings[int(len(timings) * 0.99) - 1]:.2f} ms  '
+            f'max {timings[-1]:.2f} ms'
+        )
+
+    def seed(self, count, batch_size):
+        rng = random.Random(count)
+        password = make_password(None)
+        now = timezone.now()
+        prefix = uuid.uuid4().hex[:6]
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            users = []
+            for i in range(offset, min(offset + batch_size, count)):
+                first_name = rng.choice(FIRST_NAMES)
+                last_name = rng.choice(LAST_NAMES)
+                users.append(User(
+                    user_id=uuid.uuid4(),
+                    username=f'user{i}{prefix}',
+                    first_name=first_name.capitalize(),
+                    last_name=last_name.capitalize(),
+                    email=f'{first_name}.{last_name}.{i}.{prefix}@example.com',
+                    password=password,
+                    created_at=now,
+                    updated_at=now,
+                ))
+            with transaction.atomic():
+                User.objects.bulk_create(users, batch_size=batch_size)
+                index_users(users, batch_size=batch_size)
+        self.stdout.write(f'seeded {count} users in {time.perf_counter() - started:.1f}s')
+
+    def rebuild(self, batch_size):
+        started = time.perf_counter()
+        with transaction.atomic():
+            UserSearchToken.objects.all().delete()
+            users = User.objects.filter(is_active=True).only(
+                'user_id', 'username', 'first_name', 'last_name', 'email', 'is_active',
+            ).iterator(chunk_size=batch_size)
+            batch = []
+            for user in users:
+                batch.append(user)
+                if len(batch) == batch_size:
+                    index_users(batch, batch_size=batch_size)
+                    batch = []
+            index_users(batch, batch_size=batch_size)
+        self.stdout.write(f'rebuilt the index in {time.perf_counter() - started:.1f}s')
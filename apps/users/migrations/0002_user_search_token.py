@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 04:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('field', models.PositiveSmallIntegerField(choices=[(1, 'Username'), (2, 'Name'), (3, 'Email')])),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user'], name='users_search_token_user_idx')],
+                'constraints': [models.UniqueConstraint(fields=('token', 'user', 'field'), name='users_search_token_unique')],
+            },
+        ),
+    ]
@@ -1,3 +1,47 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class Contact(models.Model):
+    """A directed edge in the contact graph: ``owner`` knows ``contact``."""
+    class Sources(models.TextChoices):
+        EMAIL_DOMAIN = 'email_domain', 'Email domain'
+        MANUAL = 'manual', 'Manual'
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='contacts')
+    contact = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    source = models.CharField(max_length=20, choices=Sources.choices, default=Sources.MANUAL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'contact'], name='users_contact_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} -> {self.contact_id}"
+
+
+class UserSearchToken(models.Model):
+    """A normalized word of a user's username, name or email, for prefix search (see ``apps.users.search``)."""
+    class Fields(models.IntegerChoices):
+        USERNAME = 1, 'Username'
+        NAME = 2, 'Name'
+        EMAIL = 3, 'Email'
+
+    token = models.CharField(max_length=64)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    field = models.PositiveSmallIntegerField(choices=Fields.choices)
+
+    class Meta:
+        constraints = [
+            # Doubles as the (token, user, field) index that prefix lookups scan
+            # without touching the table.
+            models.UniqueConstraint(fields=['token', 'user', 'field'], name='users_search_token_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user'], name='users_search_token_user_idx'),
+        ]
+
+    def __str__(self):
+        return self.token
@@ -0,0 +1,129 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+
+from apps.authentication.models import User
+from apps.users.models import UserSearchToken
+
+Fields = UserSearchToken.Fields
+FIELD_WEIGHTS = {Fields.USERNAME: 3.0, Fields.NAME: 2.0, Fields.EMAIL: 1.0}
+TOKEN_MAX_LENGTH = 64
+MAX_TERMS = 4
+NAME_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """Casefold and strip accents, so ``Zoë`` and ``zoe`` index the same."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+
+
+def tokens_for(user):
+    """Return the ``(token, field)`` pairs indexed for a user."""
+    tokens = set()
+    username = normalize(user.username)
+    if username:
+        tokens.add((username[:TOKEN_MAX_LENGTH], Fields.USERNAME))
+    for word in NAME_WORD_RE.findall(normalize(f'{user.first_name} {user.last_name}')):
+        tokens.add((word[:TOKEN_MAX_LENGTH], Fields.NAME))
+    email = normalize(user.email)
+    if email:
+        tokens.add((email[:TOKEN_MAX_LENGTH], Fields.EMAIL))
+    return tokens
+
+
+def index_user(user, created=False, using=None):
+    """Bring a user's tokens up to date, writing only the ones that changed."""
+    tokens = UserSearchToken.objects.db_manager(using or user._state.db)
+    wanted = tokens_for(user) if user.is_active else set()
+    existing = set() if created else set(
+        tokens.filter(user_id=user.pk).values_list('token', 'field')
+    )
+    stale = existing - wanted
+    if stale:
+        condition = Q()
+        for token, field in stale:
+            condition |= Q(token=token, field=field)
+        tokens.filter(condition, user_id=user.pk).delete()
+    tokens.bulk_create([
+        UserSearchToken(token=token, field=field, user_id=user.pk) for token, field in wanted - existing
+    ], ignore_conflicts=True)
+
+
+def index_users(users, batch_size=5000):
+    """Index users that have no tokens yet (bulk imports, seeding, rebuilds)."""
+    UserSearchToken.objects.bulk_create([
+        UserSearchToken(token=token, field=field, user_id=user.pk)
+        for user in users if user.is_active
+        for token, field in tokens_for(user)
+    ], batch_size=batch_size, ignore_conflicts=True)
+
+
+def prefix_range(term):
+    """Lookups matching tokens that start with ``term``, as an index range scan on every backend."""
+    return {'token__gte': term, 'token__lt': term[:-1] + chr(ord(term[-1]) + 1)}
+
+
+def prefix_filter(term):
+    return UserSearchToken.objects.filter(**prefix_range(term))
+
+
+def score(term, token, field):
+    # Exact matches score double; longer completions of the prefix score less.
+    return FIELD_WEIGHTS[field] * (1 + len(term) / len(token))
+
+
+def search_users(query, limit=20, exclude_user_id=None):
+    """
+    Return up to ``limit`` active users whose username, name words or email
+    start with every word of ``query``, best matches first.
+
+    The word with the fewest tokens, counted up to ``USER_SEARCH_CANDIDATES``,
+    drives the query. Its tokens are narrowed in SQL to users who match every
+    other word, one ``EXISTS`` probe per word on the user index, before at most
+    ``USER_SEARCH_CANDIDATES`` of them are read, so the cap never drops a user
+    that matches the whole query in favour of one that does not.
+    """
+    terms = sorted({term[:TOKEN_MAX_LENGTH] for term in normalize(query).split()}, key=lambda term: (-len(term), term))
+    if not terms:
+        return []
+    terms = terms[:MAX_TERMS]
+    cap = settings.USER_SEARCH_CANDIDATES
+
+    frequency = {term: prefix_filter(term)[:cap].count() for term in terms}
+    # Stable: ties keep the longest, then alphabetical, order from above.
+    terms.sort(key=frequency.get)
+    if frequency[terms[0]] == 0:
+        return []
+
+    candidates = prefix_filter(terms[0])
+    if exclude_user_id is not None:
+        candidates = candidates.exclude(user_id=exclude_user_id)
+    for term in terms[1:]:
+        candidates = candidates.filter(Exists(UserSearchToken.objects.filter(
+            user_id=OuterRef('user_id'), **prefix_range(term),
+        )))
+
+    scores = defaultdict(float)
+    for token, field, user_id in candidates.order_by('token', 'user_id', 'field').values_list(
+            'token', 'field', 'user_id')[:cap]:
+        scores[user_id] = max(scores[user_id], score(terms[0], token, field))
+
+    for term in terms[1:]:
+        if not scores:
+            break
+        term_scores = defaultdict(float)
+        for token, field, user_id in prefix_filter(term).filter(
+                user_id__in=list(scores)).values_list('token', 'field', 'user_id'):
+            term_scores[user_id] = max(term_scores[user_id], score(term, token, field))
+        scores = {user_id: scores[user_id] + term_score for user_id, term_score in term_scores.items()}
+
+    if not scores:
+        return []
+    users = User.objects.filter(
+        user_id__in=sorted(scores, key=scores.get, reverse=True)[:limit * 2], is_active=True,
+    ).only('user_id', 'username', 'first_name', 'last_name')
+    return sorted(users, key=lambda user: (-scores[user.user_id], user.username))[:limit]
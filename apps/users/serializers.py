@@ -0,0 +1,20 @@
+from rest_framework import serializers
+
+from apps.authentication.models import User
+from core.serializers import CompiledListSerializer
+
+
+class UserSearchQuerySerializer(serializers.Serializer):
+    """Serializer for the query parameters of the users search."""
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class UserSearchResultSerializer(serializers.ModelSerializer):
+    """Serializer for a user found by the users search."""
+
+    class Meta:
+        model = User
+        fields = ['user_id', 'username', 'first_name', 'last_name']
+        read_only_fields = fields
+        list_serializer_class = CompiledListSerializer
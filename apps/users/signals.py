@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.authentication.models import User
+from apps.users.search import index_user
+
+INDEXED_FIELDS = {'username', 'first_name', 'last_name', 'email', 'is_active'}
+
+
+@receiver(post_save, sender=User)
+def update_search_index(sender, instance, created, raw=False, using=None, update_fields=None, **kwargs):
+    """Reindex a saved user once the save commits, unless no indexed field changed."""
+    if raw or (update_fields is not None and not INDEXED_FIELDS.intersection(update_fields)):
+        return
+    transaction.on_commit(lambda: index_user(instance, created=created, using=using), using=using)
@@ -1,3 +1,85 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.authentication.models import User
+from apps.users.models import UserSearchToken
+from apps.users.search import search_users
+
+
+class UserSearchTests(TestCase):
+    """Tests for the users directory search."""
+
+    def setUp(self):
+        cache.clear()
+        self.john = self.create_user('jsmith', 'John', 'Smith', 'john@example.com')
+        self.johanna = self.create_user('johanna', 'Johanna', 'Berg', 'jb@example.org')
+        self.zoe = self.create_user('zoe', 'Zoë', 'Johnson', 'zoe@example.net')
+
+    def create_user(self, username, first_name, last_name, email):
+        with self.captureOnCommitCallbacks(execute=True):
+            return User.objects.create_user(
+                email=email, password='Str0ng!Pass', username=username,
+                first_name=first_name, last_name=last_name,
+            )
+
+    def usernames(self, query, **kwargs):
+        return [user.username for user in search_users(query, **kwargs)]
+
+    def test_prefix_matches_username_name_and_email(self):
+        self.assertEqual(self.usernames('smi'), ['jsmith'])
+        self.assertEqual(self.usernames('jsm'), ['jsmith'])
+        self.assertEqual(self.usernames('jb@'), ['johanna'])
+        self.assertEqual(self.usernames('nobody'), [])
+
+    def test_matching_ignores_case_and_accents(self):
+        self.assertEqual(self.usernames('ZOE'), ['zoe'])
+
+    def test_username_and_exact_matches_rank_first(self):
+        self.assertEqual(self.usernames('joh'), ['johanna', 'jsmith', 'zoe'])
+        self.assertEqual(self.usernames('john')[0], 'jsmith')
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.usernames('john smi'), ['jsmith'])
+        self.assertEqual(self.usernames('john berg'), [])
+
+    @override_settings(USER_SEARCH_CANDIDATES=3)
+    def test_matches_past_the_candidate_cap_are_found(self):
+        for number in range(5):
+            self.create_user(f'smith{number}', 'Anna', 'Smith', f'smith{number}@example.com')
+        self.create_user('jsmithson', 'John', 'Smithson', 'js@example.com')
+        # The Annas' "smith" tokens fill the cap before any "smithson".
+        self.assertEqual(self.usernames('smith john'), ['jsmith', 'jsmithson'])
+        self.assertEqual(self.usernames('smiths john'), ['jsmithson'])
+
+    def test_limit_and_exclude(self):
+        self.assertEqual(len(self.usernames('jo', limit=2)), 2)
+        self.assertNotIn('jsmith', self.usernames('jo', exclude_user_id=self.john.user_id))
+
+    def test_rename_reindexes_only_changed_tokens(self):
+        self.john.last_name = 'Walker'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.john.save()
+        self.assertEqual(self.usernames('smith'), [])
+        self.assertEqual(self.usernames('walk'), ['jsmith'])
+        self.assertEqual(UserSearchToken.objects.filter(user_id=self.john.user_id).count(), 4)
+
+    def test_deactivated_users_are_removed(self):
+        self.johanna.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.johanna.save(update_fields=['is_active'])
+        self.assertEqual(self.usernames('johanna'), [])
+        self.assertFalse(UserSearchToken.objects.filter(user_id=self.johanna.user_id).exists())
+
+    def test_endpoint(self):
+        client = APIClient()
+        url = reverse('users:search')
+        self.assertEqual(client.get(url, {'q': 'jo'}).status_code, 401)
+
+        client.force_authenticate(self.john)
+        response = client.get(url, {'q': 'jo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['username'] for user in response.data['results']], ['johanna', 'zoe'])
+        self.assertEqual(set(response.data['results'][0]), {'user_id', 'username', 'first_name', 'last_name'})
+        self.assertEqual(client.get(url, {'q': 'jo', 'limit': 0}).status_code, 400)
@@ -1,3 +1,8 @@
+from django.urls import path
+
+from apps.users import views
+
+app_name = 'users'
 urlpatterns = [
-    # Add your user-related URL patterns here
-]
\ No newline at end of file
+    path('search/', views.search_user_directory, name='search'),
+]
@@ -1,3 +1,42 @@
-from django.shortcuts import render
+from rest_framework import status
+from rest_framework.decorators import api_view, throttle_classes
+from rest_framework.response import Response
 
-# Create your views here.
+from apps.users.search import search_users
+from apps.users.serializers import UserSearchQuerySerializer, UserSearchResultSerializer
+from config.schema import openapi, swagger_auto_schema
+from core.throttling import UserSearchThrottle
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, description='Start of a username, name or email.', type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('limit', openapi.IN_QUERY, description='Maximum number of results (1-50).', type=openapi.TYPE_INTEGER),
+    ],
+    responses={
+        200: UserSearchResultSerializer(many=True),
+        400: 'Bad request.',
+    },
+    operation_description='Find users whose username, name or email starts with the query words, best matches first.',
+    tags=['Users']
+)
+@api_view(['GET'])
+@throttle_classes([UserSearchThrottle])
+def search_user_directory(request):
+    """Search the users directory."""
+
+    serializer = UserSearchQuerySerializer(data=request.query_params)
+    if serializer.is_valid():
+        users = search_users(
+            serializer.validated_data['q'],
+            limit=serializer.validated_data['limit'],
+            exclude_user_id=request.user.user_id,
+        )
+        return Response({
+            'status_code': status.HTTP_200_OK,
+            'status': 'success',
+            'message': 'Users retrieved successfully.',
+            'results': UserSearchResultSerializer(users, many=True).data,
+        }, status=status.HTTP_200_OK)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
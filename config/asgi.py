@@ -2,6 +2,10 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections are routed to the consumers
+listed in ``websocket_urlpatterns``. Whole-file attachment downloads are
+handed to the server with the ``http.response.pathsend`` extension when it
+supports it; see ``core.handlers.PathsendASGIHandler``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -9,8 +13,34 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from core.handlers import PathsendASGIHandler  # noqa: E402
+
+django_application = PathsendASGIHandler()
+
+# Consumers import models, so they can only be loaded once Django is set up.
+from apps.chats.routing import websocket_urlpatterns  # noqa: E402
+
+
+async def websocket_application(scope, receive, send):
+    """Dispatch a WebSocket connection to the consumer registered for its path."""
+    path = scope['path']
+    for pattern, consumer_class in websocket_urlpatterns:
+        if path == pattern or path == pattern.rstrip('/'):
+            await consumer_class(scope, receive, send)()
+            return
+    await receive()
+    await send({'type': 'websocket.close', 'code': 4404})
+
+
+async def application(scope, receive, send):
+    """Route each connection to Django or to the WebSocket consumers by protocol."""
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,155 @@
+import gzip
+import hashlib
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.request import Request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Renderer formats of the drf_yasg UI pages, which are not cached.
+UI_FORMATS = frozenset({'swagger', 'redoc'})
+
+if settings.LEAN_MODE:
+    class _InertOpenAPI:
+        """Stands in for ``drf_yasg.openapi`` in lean mode; every name is a no-op."""
+
+        def __getattr__(self, name):
+            return _inert
+
+    def _inert(*args, **kwargs):
+        return None
+
+    def swagger_auto_schema(*args, **kwargs):
+        """Leave the view undecorated: lean mode serves no schema to describe it in."""
+        return lambda view: view
+
+    openapi = _InertOpenAPI()
+else:
+    from drf_yasg import openapi  # noqa: F401
+    from drf_yasg.utils import swagger_auto_schema  # noqa: F401
+
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def _get_build_lock(key):
+    with _build_locks_guard:
+        return _build_locks.setdefault(key, threading.Lock())
+
+
+def _release_build_lock(key):
+    with _build_locks_guard:
+        _build_locks.pop(key, None)
+
+
+def _negotiated_format(view, request, kwargs):
+    """
+    Return the format of the renderer the schema view will pick for
+    ``request`` (``.json``, ``yaml``, ``swagger``...), or ``None`` if it has
+    none to offer. This keeps cache keys to the view's few renderers
+    whatever ``Accept`` header or ``format`` a client sends.
+    """
+    renderers = [
+        renderer() for renderer in view.view_initkwargs.get('renderer_classes', view.cls.renderer_classes)
+    ]
+    negotiator = view.cls.content_negotiation_class()
+    try:
+        renderer, _ = negotiator.select_renderer(Request(request), renderers, kwargs.get('format'))
+    except (Http404, NotAcceptable):
+        return None
+    return renderer.format
+
+
+def _build_entry(response):
+    """Turn a rendered schema response into a cache entry with precompressed bodies."""
+    body = response.content
+    entry = {
+        'content_type': response['Content-Type'],
+        'etag': '"%s"' % hashlib.sha256(body).hexdigest()[:32],
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9),
+    }
+    if brotli is not None:
+        entry['br'] = brotli.compress(body)
+    return entry
+
+
+def _choose_encoding(request, entry):
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    for encoding in ('br', 'gzip'):
+        if encoding in accepted and encoding in entry:
+            return encoding
+    return 'identity'
+
+
+def cached_schema_view(view):
+    """
+    Serve a drf_yasg schema view from the Django cache.
+
+    The OpenAPI document is generated by introspecting every view, so it is
+    built once per ``SCHEMA_CACHE_VERSION`` on the first request and stored
+    with gzip (and brotli, when installed) variants. Clients get an ETag and
+    receive ``304 Not Modified`` when they send it back in If-None-Match.
+    Entries are keyed on the negotiated renderer format, and on the host and
+    scheme unless ``SCHEMA_URL`` fixes them, and expire after
+    ``SCHEMA_CACHE_TIMEOUT``. The HTML pages of the UIs embed per-request
+    data (CSRF token, current user) and are cheap to render, so they are
+    passed through uncached.
+    """
+    cache = caches[settings.SCHEMA_CACHE_ALIAS]
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        fmt = _negotiated_format(view, request, kwargs)
+        if fmt is None or fmt in UI_FORMATS:
+            return view(request, *args, **kwargs)
+
+        # Without SCHEMA_URL the document names the host and scheme it was requested on.
+        origin = '' if settings.SCHEMA_URL else f'{request.scheme}://{request.get_host()}'
+        key = f'schema:{settings.SCHEMA_CACHE_VERSION}:{origin}:{request.path}:{fmt}'
+        entry = cache.get(key)
+        if entry is None:
+            # Only one thread per process builds a given document.
+            try:
+                with _get_build_lock(key):
+                    entry = cache.get(key)
+                    if entry is None:
+                        response = view(request, *args, **kwargs)
+                        if hasattr(response, 'render'):
+                            response.render()
+                        if response.status_code != 200:
+                            return response
+                        entry = _build_entry(response)
+                        cache.set(key, entry, timeout=settings.SCHEMA_CACHE_TIMEOUT)
+            finally:
+                _release_build_lock(key)
+
+        if entry['etag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            encoding = _choose_encoding(request, entry)
+            response = HttpResponse(entry[encoding], content_type=entry['content_type'])
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = entry['etag']
+        response['Cache-Control'] = f'public, max-age={settings.SCHEMA_CACHE_MAX_AGE}'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+    return wrapped
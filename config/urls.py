@@ -14,35 +14,45 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Messaging API",
-        default_version='v1',
-        description="API documentation for the Messaging app",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="afiaaniebiet0@gmail.com"),
-        license=openapi.License(name="MIT License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-
-    # API Documentation URLs
-    path('swagger<format>', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-
     # Include application URLs
     path('api/v1/authentication/', include('apps.authentication.urls')),
     path('api/v1/chats/', include('apps.chats.urls')),
     path('api/v1/users/', include('apps.users.urls')),
+    path('api/v1/core/', include('core.urls')),
 ]
+
+# Lean workers import neither the admin nor drf_yasg; see LEAN_MODE.
+if not settings.LEAN_MODE:
+    from django.contrib import admin
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    from config.schema import cached_schema_view
+
+    schema_view = get_schema_view(
+        openapi.Info(
+            title="Messaging API",
+            default_version='v1',
+            description="API documentation for the Messaging app",
+            terms_of_service="https://www.google.com/policies/terms/",
+            contact=openapi.Contact(email="afiaaniebiet0@gmail.com"),
+            license=openapi.License(name="MIT License"),
+        ),
+        url=settings.SCHEMA_URL,
+        public=True,
+        permission_classes=[permissions.AllowAny],
+    )
+
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+
+        # API Documentation URLs
+        path('swagger<format>', cached_schema_view(schema_view.without_ui(cache_timeout=0)), name='schema-json'),
+        path('swagger/', cached_schema_view(schema_view.with_ui('swagger', cache_timeout=0)), name='schema-swagger-ui'),
+        path('redoc/', cached_schema_view(schema_view.with_ui('redoc', cache_timeout=0)), name='schema-redoc'),
+    ]
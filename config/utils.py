@@ -1,3 +1,11 @@
+import hashlib
+import random
+import string
+
+PASSWORD_SYMBOLS = '!@#$%^&*()_+-=[]{}|;:,.<>?/'
+PASSWORD_CHARACTERS = string.ascii_letters + string.digits + PASSWORD_SYMBOLS
+
+
 class UserUtils:
     """Utility class for User-related operations."""
 
@@ -18,7 +26,7 @@ class UserUtils:
             not any(char.isdigit() for char in password) or
             not any(char.isupper() for char in password) or
             not any(char.islower() for char in password) or
-            not any(char in '!@#$%^&*()_+-=[]{}|;:,.<>?/' for char in password)):
+            not any(char in PASSWORD_SYMBOLS for char in password)):
             return False
         return True
 
@@ -35,28 +43,22 @@ class UserUtils:
     @staticmethod
     def generate_password_hash(password):
         """Generate a hashed version of the password."""
-        import hashlib
         return hashlib.sha256(password.encode()).hexdigest()
 
     @staticmethod
     def verify_password_hash(password, hashed):
         """Verify if the password matches the hashed version."""
-        import hashlib
         return hashlib.sha256(password.encode()).hexdigest() == hashed
 
     @staticmethod
     def generate_username(first_name, last_name):
         """Generate a username based on first and last name."""
         base_username = (first_name[0] + last_name).lower()
-        import random
         suffix = random.randint(100, 999)
         return f"{base_username}{suffix}"
 
     @staticmethod
     def generate_strong_password(length=12):
         """Generate a strong random password."""
-        import random
-        import string
-        characters = string.ascii_letters + string.digits + '!@#$%^&*()_+-=[]{}|;:,.<>?/'
-        password = ''.join(random.choice(characters) for _ in range(length))
+        password = ''.join(random.choice(PASSWORD_CHARACTERS) for _ in range(length))
         return password
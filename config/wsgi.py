@@ -2,6 +2,9 @@
 WSGI config for config project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+File downloads are returned as ``FileResponse`` objects, which Django hands to
+the server's ``wsgi.file_wrapper``; gunicorn and uWSGI send those with
+``sendfile()``, so attachment bytes are not copied through Python.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
@@ -0,0 +1,372 @@
+import asyncio
+import io
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.authentication.views import get_tokens_for_user
+from apps.chats.models import Conversation, ConversationMember, Message
+from apps.chats.search import index_messages
+from apps.users.search import index_users
+from core.instrumentation import registry
+
+PASSWORD = 'Bench!Passw0rd'
+WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet')
+# (metric, whether a higher value is better) for regression checks.
+METRICS = (
+    ('throughput', True),
+    ('p50_ms', False),
+    ('p95_ms', False),
+    ('p99_ms', False),
+    ('queries_per_request', False),
+)
+
+
+class Fixtures:
+    """Rows seeded for one benchmark run, all tagged with the run's id."""
+
+    def __init__(self, run_id, users, tokens, conversations):
+        self.run_id = run_id
+        self.users = users
+        self.tokens = tokens
+        self.conversations = conversations
+
+    def user(self, index):
+        return self.users[index % len(self.users)]
+
+    def token(self, index):
+        return self.tokens[index % len(self.tokens)]
+
+    def conversation(self, index):
+        return self.conversations[index % len(self.conversations)]
+
+
+def seed(users=200, conversations=50, messages=20, members=3, run_id=None):
+    """
+    Create ``users`` users with a known password, ``conversations``
+    conversations of ``members`` members and ``messages`` messages each,
+    indexed for search like the ingestion path would.
+    """
+    run_id = run_id or f'{time.time_ns() % 10**10}'
+    rng = random.Random(0)
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create([
+        User(
+            email=f'bench-{run_id}-{i}@example.com',
+            username=f'bench{run_id}u{i}',
+            first_name=WORDS[i % len(WORDS)].capitalize(),
+            last_name='Bench',
+            password=password,
+        )
+        for i in range(users)
+    ])
+    index_users(created)
+    seeded = Conversation.objects.bulk_create([
+        Conversation(title=f'Bench {i}', created_by=created[i % users], last_sequence=messages)
+        for i in range(conversations)
+    ])
+    ConversationMember.objects.bulk_create([
+        ConversationMember(conversation=conversation, user=created[(i + offset) % users])
+        for i, conversation in enumerate(seeded)
+        for offset in range(min(members, users))
+    ])
+    start = timezone.now() - timedelta(seconds=messages)
+    stored = Message.objects.bulk_create([
+        Message(
+            conversation=conversation,
+            sender=created[(i + n) % users],
+            body=' '.join(rng.choices(WORDS, k=8)),
+            created_at=start + timedelta(seconds=n),
+            sequence=n + 1,
+        )
+        for i, conversation in enumerate(seeded)
+        for n in range(messages)
+    ], batch_size=5000)
+    index_messages(stored)
+    # Conversation i's first member is user i, so user i can read it.
+    member_count = min(conversations, users)
+    tokens = [get_tokens_for_user(user) for user in created[:member_count]]
+    return Fixtures(run_id, created[:member_count], tokens, seeded)
+
+
+def cleanup(fixtures):
+    """Delete everything a run created, including users it registered."""
+    Conversation.objects.filter(pk__in=[conversation.pk for conversation in fixtures.conversations]).delete()
+    User.objects.filter(email__startswith=f'bench-{fixtures.run_id}-').delete()
+
+
+class Scenario:
+    """One API call to benchmark; ``build`` returns ``(path, body, token)`` for request ``index``."""
+
+    def __init__(self, name, method, build, expected_status=200):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.expected_status = expected_status
+
+
+def _register(fixtures, index):
+    email = f'bench-{fixtures.run_id}-r{index}-{time.time_ns()}@example.com'
+    return reverse('authentication:register'), {
+        'email': email,
+        'first_name': 'Bench',
+        'last_name': 'Register',
+        'password': PASSWORD,
+        'confirm_password': PASSWORD,
+    }, None
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in (
+        Scenario('register', 'POST', _register, expected_status=201),
+        Scenario('login', 'POST', lambda fixtures, index: (
+            reverse('authentication:login'), {'email': fixtures.user(index).email, 'password': PASSWORD}, None,
+        )),
+        Scenario('generate_password', 'POST', lambda fixtures, index: (
+            reverse('authentication:generate_password'), {'length': 16}, None,
+        )),
+        Scenario('conversations', 'GET', lambda fixtures, index: (
+            reverse('chats:conversations'), None, fixtures.token(index)['access'],
+        )),
+        Scenario('messages', 'GET', lambda fixtures, index: (
+            reverse('chats:messages', args=[fixtures.conversation(index % len(fixtures.users)).pk]),
+            None, fixtures.token(index)['access'],
+        )),
+        Scenario('send_message', 'POST', lambda fixtures, index: (
+            reverse('chats:messages', args=[fixtures.conversation(index % len(fixtures.users)).pk]),
+            {'body': f'benchmark message {index}'}, fixtures.token(index)['access'],
+        ), expected_status=201),
+        Scenario('user_search', 'GET', lambda fixtures, index: (
+            reverse('users:search') + '?' + urlencode({'q': WORDS[index % len(WORDS)][:3]}),
+            None, fixtures.token(index)['access'],
+        )),
+        Scenario('message_search', 'GET', lambda fixtures, index: (
+            reverse('chats:search') + '?' + urlencode({'q': WORDS[index % len(WORDS)]}),
+            None, fixtures.token(index)['access'],
+        )),
+    )
+}
+
+
+@contextmanager
+def queued_writers():
+    """
+    Make SQLite queue concurrent writers instead of failing them. Deferred
+    transactions cannot wait for the write lock, so connections opened in
+    the block start immediate ones.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    database = connections.settings[DEFAULT_DB_ALIAS]
+    original = database.get('OPTIONS')
+    database['OPTIONS'] = {'transaction_mode': 'IMMEDIATE', 'timeout': 60, **(original or {})}
+    try:
+        yield
+    finally:
+        if original is None:
+            database.pop('OPTIONS', None)
+        else:
+            database['OPTIONS'] = original
+
+
+def encode(body):
+    return json.dumps(body).encode() if body is not None else b''
+
+
+def run_wsgi(scenario, fixtures, requests, concurrency, offset=0):
+    """Serve ``requests`` calls through the WSGI handler from ``concurrency`` threads."""
+    handler = WSGIHandler()
+    counter = iter(range(offset, offset + requests))
+    lock = threading.Lock()
+    latencies, statuses = [], []
+
+    def worker():
+        samples, codes = [], []
+        try:
+            while True:
+                with lock:
+                    index = next(counter, None)
+                if index is None:
+                    break
+                path, body, token = scenario.build(fixtures, index)
+                path, _, query = path.partition('?')
+                data = encode(body)
+                environ = {
+                    'REQUEST_METHOD': scenario.method,
+                    'PATH_INFO': path,
+                    'QUERY_STRING': query,
+                    'SERVER_NAME': 'localhost',
+                    'SERVER_PORT': '80',
+                    'HTTP_HOST': 'localhost',
+                    'REMOTE_ADDR': '127.0.0.1',
+                    'CONTENT_TYPE': 'application/json',
+                    'CONTENT_LENGTH': str(len(data)),
+                    'wsgi.url_scheme': 'http',
+                    'wsgi.errors': sys.stderr,
+                    'wsgi.input': io.BytesIO(data),
+                }
+                if token:
+                    environ['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+                status = []
+                started = time.perf_counter()
+                response = handler(environ, lambda code, headers: status.append(int(code.split()[0])))
+                b''.join(response)
+                response.close()
+                samples.append(time.perf_counter() - started)
+                codes.append(status[0])
+        finally:
+            close_old_connections()
+            with lock:
+                latencies.extend(samples)
+                statuses.extend(codes)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def run_asgi(scenario, fixtures, requests, concurrency, offset=0):
+    """Serve ``requests`` calls through the ASGI application from ``concurrency`` tasks."""
+    from config.asgi import application
+
+    async def call(index):
+        path, body, token = scenario.build(fixtures, index)
+        path, _, query = path.partition('?')
+        data = encode(body)
+        headers = [(b'host', b'localhost'), (b'content-type', b'application/json'), (b'content-length', str(len(data)).encode())]
+        if token:
+            headers.append((b'authorization', f'Bearer {token}'.encode()))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': scenario.method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }
+        received = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': data, 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await received.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                received.set()
+
+        await application(scope, receive, send)
+        return status[0]
+
+    async def main():
+        counter = iter(range(offset, offset + requests))
+        latencies, statuses = [], []
+
+        async def worker():
+            for index in counter:
+                started = time.perf_counter()
+                statuses.append(await call(index))
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, statuses, time.perf_counter() - started
+
+    return asyncio.run(main())
+
+
+CLIENTS = {'wsgi': run_wsgi, 'asgi': run_asgi}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def queries_per_request(view):
+    """Mean queries per request of ``view`` from the instrumentation registry."""
+    with registry.lock:
+        histogram = registry.histograms.get(('http_request_db_queries', (('view', view),)))
+        return histogram.sum / histogram.count if histogram is not None and histogram.count else None
+
+
+def measure(scenario, client, fixtures, requests, concurrency, warmup=0):
+    """Run ``scenario`` on ``client`` and return its summary."""
+    run = CLIENTS[client]
+    if warmup:
+        run(scenario, fixtures, warmup, min(concurrency, warmup), offset=requests)
+    registry.reset()
+    latencies, statuses, elapsed = run(scenario, fixtures, requests, concurrency)
+    latencies.sort()
+    queries = queries_per_request(resolve(scenario.build(fixtures, 0)[0].partition('?')[0]).view_name)
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status != scenario.expected_status),
+        'throughput': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries_per_request': round(queries, 2) if queries is not None else None,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'debug': settings.DEBUG,
+        'created_at': timezone.now().isoformat(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Return ``(rows, regressions)`` comparing ``results`` with ``baseline``.
+
+    A metric regresses when it is worse by more than ``threshold`` (a
+    fraction); query counts also need to grow by at least half a query, so
+    averages that wobble by a fraction of a query do not fail a run. Any
+    failed request is a regression too.
+    """
+    rows, regressions = [], []
+    for key, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(key)
+        if current['errors']:
+            regressions.append((key, 'errors', 0, current['errors']))
+        if previous is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            regressed = worse > threshold
+            if metric == 'queries_per_request':
+                regressed = regressed and new - old >= 0.5
+            rows.append((key, metric, old, new, change, regressed))
+            if regressed:
+                regressions.append((key, metric, old, new))
+    return rows, regressions
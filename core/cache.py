@@ -0,0 +1,297 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core.instrumentation import record_cache
+
+_MISSING = object()
+
+
+class _ProcessState:
+    """The local tier, in-flight computations and counters shared by every instance of one cache."""
+
+    def __init__(self):
+        self.local = OrderedDict()
+        self.local_lock = threading.Lock()
+        self.flights = {}
+        self.flights_lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'sets': 0, 'computes': 0}
+
+
+# Django builds a backend instance per thread (and per async context), so the
+# state lives here, keyed by LOCATION like LocMemCache's, to be per process.
+_states = {}
+_states_lock = threading.Lock()
+
+
+def _get_state(location):
+    with _states_lock:
+        return _states.setdefault(location, _ProcessState())
+
+
+class TieredCache(BaseCache):
+    """
+    Two-tier cache backend: a bounded per-process LRU in front of a shared cache.
+
+    Reads try the local tier first and fall back to the shared cache alias
+    named by ``SHARED_ALIAS`` (Redis in production), copying hits into the
+    local tier for at most ``LOCAL_TIMEOUT`` seconds. Writes and deletes go to
+    both tiers. Other processes may therefore serve a stale local copy for up
+    to ``LOCAL_TIMEOUT`` seconds after a change; keep it short, or move keys
+    to a new namespace version with ``bump_namespace``.
+
+    Besides the standard cache API it offers ``get_or_compute`` for
+    single-flight recomputation, versioned key namespaces, and hit/miss
+    counters through ``get_stats``. Caches with the same ``LOCATION`` share
+    the local tier and counters, like ``LocMemCache``.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self.local_max_entries = options.get('LOCAL_MAX_ENTRIES', 10_000)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 10)
+        state = _get_state(location)
+        self._local = state.local
+        self._local_lock = state.local_lock
+        self._flights = state.flights
+        self._flights_lock = state.flights_lock
+        self._stats = state.stats
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    # Local tier
+
+    def _local_get(self, key):
+        with self._local_lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._local[key]
+                return _MISSING
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key, value, timeout):
+        ttl = self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+        if ttl <= 0:
+            self._local_delete(key)
+            return
+        with self._local_lock:
+            self._local[key] = (time.monotonic() + ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, key):
+        with self._local_lock:
+            self._local.pop(key, None)
+
+    def _count(self, name, amount=1):
+        # Counters are best-effort; a lost update under contention is fine.
+        self._stats[name] += amount
+        record_cache(name, amount)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # Django cache API; keys are passed through unchanged to the shared cache,
+    # which applies its own prefix and version.
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self._local_get(local_key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self._count('misses')
+            return default
+        self._count('shared_hits')
+        self._local_set(local_key, value, self.local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        self.shared.set(key, value, timeout, version=version)
+        self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        self._count('sets')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return added
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, self._timeout(timeout), version=version)
+
+    def has_key(self, key, version=None):
+        if self._local_get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Counters must be exact, so they bypass the local tier.
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.shared.decr(key, delta, version=version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self._local_get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+        self._count('local_hits', len(found))
+        if remaining:
+            shared = self.shared.get_many(remaining, version=version)
+            self._count('shared_hits', len(shared))
+            self._count('misses', len(remaining) - len(shared))
+            for key, value in shared.items():
+                self._local_set(self.make_and_validate_key(key, version=version), value, self.local_timeout)
+            found.update(shared)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        self._count('sets', len(data))
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        self.clear_local()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop every entry of the local tier."""
+        with self._local_lock:
+            self._local.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
+
+    # Stampede protection
+
+    def get_or_compute(self, key, compute, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the cached value for ``key``, computing and storing it on a miss.
+
+        Concurrent misses in this process wait for a single computation, and a
+        short lock in the shared cache keeps other processes from recomputing
+        the same key at the same time. ``compute`` must not return ``None``.
+        """
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+
+        with self._flights_lock:
+            flight = self._flights.setdefault(key, threading.Lock())
+        with flight:
+            try:
+                value = self.get(key, _MISSING, version=version)
+                if value is not _MISSING:
+                    return value
+                lock_key = f'{key}:lock'
+                if not self.shared.add(lock_key, 1, self.lock_timeout, version=version):
+                    value = self._wait_for(key, version)
+                    if value is not _MISSING:
+                        return value
+                try:
+                    value = compute()
+                    self._count('computes')
+                    self.set(key, value, timeout, version=version)
+                finally:
+                    self.shared.delete(lock_key, version=version)
+                return value
+            finally:
+                with self._flights_lock:
+                    self._flights.pop(key, None)
+
+    def _wait_for(self, key, version):
+        """Poll the shared cache while another process computes ``key``."""
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.005
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                self._local_set(self.make_and_validate_key(key, version=version), value, self.local_timeout)
+                return value
+            delay = min(delay * 2, 0.1)
+        return _MISSING
+
+    # Versioned namespaces
+
+    def _namespace_version_key(self, namespace):
+        return f'namespace:{namespace}'
+
+    def get_namespace_version(self, namespace):
+        """Return the current version number of a key namespace."""
+        version_key = self._namespace_version_key(namespace)
+        version = self.get(version_key)
+        if version is None:
+            self.shared.add(version_key, 1, None)
+            version = self.shared.get(version_key, 1)
+            self._local_set(self.make_and_validate_key(version_key), version, self.local_timeout)
+        return version
+
+    def namespaced_key(self, namespace, key):
+        """Return ``key`` qualified with the current version of ``namespace``."""
+        return f'{namespace}:v{self.get_namespace_version(namespace)}:{key}'
+
+    def bump_namespace(self, namespace):
+        """Invalidate every key of a namespace at once by moving to a new version."""
+        version_key = self._namespace_version_key(namespace)
+        self._local_delete(self.make_and_validate_key(version_key))
+        try:
+            return self.shared.incr(version_key)
+        except ValueError:
+            self.shared.set(version_key, 2, None)
+            return 2
+
+    # Metrics
+
+    def get_stats(self):
+        """Return hit/miss counters and the size of the local tier."""
+        stats = dict(self._stats)
+        stats['local_entries'] = len(self._local)
+        return stats
+
+
+def get_cache_stats():
+    """Return the counters of every configured tiered cache, keyed by alias."""
+    return {
+        alias: caches[alias].get_stats()
+        for alias in caches.settings
+        if isinstance(caches[alias], TieredCache)
+    }
@@ -0,0 +1,5 @@
+# Pooled equivalents of Django's backends, used when DATABASE_POOL is on.
+POOLED_ENGINES = {
+    'django.db.backends.mysql': 'core.db.backends.mysql',
+    'django.db.backends.sqlite3': 'core.db.backends.sqlite3',
+}
@@ -0,0 +1,10 @@
+from django.db.backends.mysql import base
+
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """MySQL backend that reuses connections from a process-wide pool."""
+
+    def ping_connection(self, connection):
+        connection.ping()
@@ -0,0 +1,10 @@
+from django.db.backends.sqlite3 import base
+
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite backend that reuses connections from a process-wide pool (local development and benchmarks)."""
+
+    def ping_connection(self, connection):
+        connection.execute('SELECT 1')
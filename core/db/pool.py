@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from collections import deque
+
+from django.db.utils import Error, OperationalError
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no pooled connection frees up within the pool's TIMEOUT."""
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of DB-API connections for one database alias.
+
+    Connections are handed out most-recently-used first, so a burst leaves
+    the extra connections idle at the bottom of the stack until they reach
+    ``max_idle`` and are closed. A connection is closed after
+    ``max_lifetime`` seconds. A connection idle for longer than
+    ``check_interval`` is pinged before it is handed out. At most
+    ``max_size`` connections exist; further borrowers wait up to ``timeout``
+    seconds.
+    """
+
+    def __init__(self, alias, ping, max_size=10, timeout=5.0, max_idle=300.0,
+                 max_lifetime=3600.0, check_interval=30.0):
+        self.alias = alias
+        self.ping = ping
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self._idle = deque()  # (connection, created_at, released_at)
+        self._created_at = {}
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ('created', 'reused', 'closed', 'failed_checks', 'waits', 'timeouts', 'wait_ms'), 0,
+        )
+
+    def acquire(self, connect):
+        """Return an idle connection, or one from ``connect()`` if none is usable."""
+        if not self._slots.acquire(blocking=False):
+            self._count('waits')
+            started = time.monotonic()
+            if not self._slots.acquire(timeout=self.timeout):
+                self._count('timeouts')
+                raise PoolTimeout(f'No connection to {self.alias!r} became free within {self.timeout}s.')
+            self._count('wait_ms', (time.monotonic() - started) * 1000)
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    connection, created_at, released_at = self._idle.pop()
+                now = time.monotonic()
+                if now - created_at > self.max_lifetime or now - released_at > self.max_idle:
+                    self._discard(connection)
+                    continue
+                if now - released_at > self.check_interval and not self._check(connection):
+                    continue
+                self._count('reused')
+                return connection
+            connection = connect()
+            with self._lock:
+                self._created_at[id(connection)] = time.monotonic()
+                self._stats['created'] += 1
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, reusable=True):
+        """Return a borrowed connection; unusable ones are closed instead."""
+        try:
+            created_at = self._created_at.get(id(connection), 0.0)
+            if reusable and time.monotonic() - created_at <= self.max_lifetime:
+                with self._lock:
+                    self._idle.append((connection, created_at, time.monotonic()))
+            else:
+                self._discard(connection)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """Close every idle connection (e.g. at shutdown)."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = len(self._idle)
+            stats['open'] = len(self._created_at)
+        stats['in_use'] = stats['open'] - stats['idle']
+        stats['max_size'] = self.max_size
+        stats['wait_ms'] = round(stats['wait_ms'], 3)
+        return stats
+
+    def _check(self, connection):
+        try:
+            self.ping(connection)
+            return True
+        except Exception:
+            self._count('failed_checks')
+            self._discard(connection)
+            return False
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created_at.pop(id(connection), None)
+            self._stats['closed'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+
+def get_pool(wrapper):
+    """Return the pool for a database wrapper's alias, creating it on first use."""
+    pool = _pools.get(wrapper.alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(wrapper.alias)
+            if pool is None:
+                options = wrapper.settings_dict.get('POOL', {})
+                pool = _pools[wrapper.alias] = ConnectionPool(
+                    wrapper.alias,
+                    ping=wrapper.ping_connection,
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 5.0),
+                    max_idle=options.get('MAX_IDLE', 300.0),
+                    max_lifetime=options.get('MAX_LIFETIME', 3600.0),
+                    check_interval=options.get('CHECK_INTERVAL', 30.0),
+                )
+    return pool
+
+
+def get_pool_stats():
+    """Return the counters of every connection pool in this process, keyed by alias."""
+    return {alias: pool.stats() for alias, pool in list(_pools.items())}
+
+
+def close_pools():
+    for pool in list(_pools.values()):
+        pool.close_all()
+
+
+def _forget_pools_after_fork():
+    # Sockets inherited from the parent must not be shared with it; leave them
+    # to the parent and start with empty pools.
+    _pools.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_pools_after_fork)
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Database wrapper mixin that borrows connections from a ``ConnectionPool``.
+
+    Django still "opens" and "closes" a connection per request (keep
+    ``CONN_MAX_AGE`` at 0), but opening borrows a live connection and closing
+    rolls back anything left open and hands it back, so requests skip the
+    connect handshake. Options come from the ``POOL`` key of the database
+    settings.
+    """
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        return get_pool(self).acquire(lambda: connect(conn_params))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        reusable = True
+        try:
+            with self.wrap_database_errors:
+                if self.in_atomic_block or not self.autocommit:
+                    connection.rollback()
+                if self.errors_occurred:
+                    reusable = self.is_usable()
+        except Error:
+            reusable = False
+        self.errors_occurred = False
+        get_pool(self).release(connection, reusable)
+
+    def ping_connection(self, connection):
+        """Raise if a raw connection no longer works."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
@@ -0,0 +1,111 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState:
+    """Per-request (or per-task) record of whether reads must stay on the primary."""
+    __slots__ = ('pinned_until', 'wrote', 'forced', 'pin_loader')
+
+    def __init__(self, pinned_until=0.0, pin_loader=None):
+        self.pinned_until = pinned_until
+        self.wrote = False
+        self.forced = 0
+        # Called on reads until it returns a pin expiry instead of None, for
+        # pins that can only be looked up part-way through a request.
+        self.pin_loader = pin_loader
+
+    def is_pinned(self):
+        if self.forced:
+            return True
+        if self.pin_loader is not None:
+            pinned_until = self.pin_loader()
+            if pinned_until is not None:
+                self.pin_loader = None
+                self.pinned_until = max(self.pinned_until, pinned_until)
+        return self.pinned_until > time.time()
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def get_routing_state():
+    """Return the routing state of the current context, creating it if needed."""
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+def begin_routing(pinned_until=0.0, pin_loader=None):
+    """Start a fresh routing state (e.g. for a request); returns a token for ``end_routing``."""
+    return _state.set(RoutingState(pinned_until, pin_loader))
+
+
+def end_routing(token):
+    _state.reset(token)
+
+
+def pin_to_primary(seconds=None):
+    """Send reads in the current context to the primary for ``seconds`` (default REPLICA_PIN_SECONDS)."""
+    state = get_routing_state()
+    state.wrote = True
+    if seconds is None:
+        seconds = settings.REPLICA_PIN_SECONDS
+    state.pinned_until = max(state.pinned_until, time.time() + seconds)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, e.g. right after another process wrote."""
+    state = get_routing_state()
+    state.forced += 1
+    try:
+        yield
+    finally:
+        state.forced -= 1
+
+
+class ReplicaRouter:
+    """
+    Send writes to the primary and reads to a random replica from ``DATABASE_REPLICAS``.
+
+    Reads stay on the primary inside a transaction, inside ``use_primary()``,
+    and for ``REPLICA_PIN_SECONDS`` after the current context wrote, so a
+    client sees its own writes despite replication lag.
+    ``ReplicaPinningMiddleware`` carries the pin across requests.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = _state.get()
+        if state is not None and state.is_pinned():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if settings.DATABASE_REPLICAS:
+            pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        return db not in settings.DATABASE_REPLICAS
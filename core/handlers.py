@@ -0,0 +1,43 @@
+from contextvars import ContextVar
+
+from django.core.handlers.asgi import ASGIHandler
+
+PATHSEND = 'http.response.pathsend'
+
+_scope = ContextVar('asgi_scope', default=None)
+
+
+class PathsendASGIHandler(ASGIHandler):
+    """
+    ASGI handler that lets the server send files itself.
+
+    Django's handler streams a ``FileResponse`` by reading the file in a
+    thread and sending it chunk by chunk. Servers that support the
+    ``http.response.pathsend`` extension (Granian, NGINX Unit) can instead be
+    given the path and send it with zero copies. Views opt in by setting
+    ``sendfile_path`` on a response that covers the whole file.
+    """
+
+    async def handle(self, scope, receive, send):
+        token = _scope.set(scope)
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            _scope.reset(token)
+
+    async def send_response(self, response, send):
+        path = getattr(response, 'sendfile_path', None)
+        scope = _scope.get()
+        if path is None or scope is None or PATHSEND not in scope.get('extensions', {}):
+            await super().send_response(response, send)
+            return
+        headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ]
+        headers.extend(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        )
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        await send({'type': PATHSEND, 'path': path})
@@ -0,0 +1,198 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, close to the Prometheus client defaults.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# ``IN (%s, %s, ...)`` lists of different lengths are the same statement.
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+
+_profile = ContextVar('request_profile', default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count, as Prometheus expects them."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms keyed by metric name and label values.
+
+    Every update takes one lock, which is far cheaper than the requests
+    being measured. The numbers are per process; scrape each worker, or
+    aggregate them in Prometheus.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.help = {}
+        self.n_plus_one = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self.counters[name, labels] += amount
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[name, labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.n_plus_one.clear()
+
+    def render(self, gauges=()):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count))
+                for key, histogram in self.histograms.items()
+            )
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self.help:
+                    lines.append(f'# HELP {name} {self.help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", format_value(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_value(total)}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+        for name, labels, value in gauges:
+            header(name, 'gauge')
+            lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+registry = MetricsRegistry()
+registry.describe('http_requests_total', 'Requests served, by view, method and status code.')
+registry.describe('http_request_duration_seconds', 'Request latency, by view.')
+registry.describe('http_request_db_queries', 'Database queries per sampled request, by view.')
+registry.describe('http_request_db_seconds_total', 'Database time of sampled requests, by view.')
+registry.describe('http_request_cache_total', 'Tiered cache lookups of sampled requests, by view and result.')
+registry.describe('http_request_phase_seconds_total', 'Time in instrumented phases of sampled requests.')
+registry.describe('http_request_sampled_total', 'Requests profiled in detail, by view.')
+registry.describe('http_request_n_plus_one_total', 'Sampled requests that repeated a query, by view.')
+
+
+class RequestProfile:
+    """Query, cache and phase accounting for one sampled request."""
+
+    def __init__(self, record_queries=False):
+        self.query_count = 0
+        self.query_time = 0.0
+        self.cache = Counter()
+        self.phases = defaultdict(float)
+        self.statements = Counter() if record_queries else None
+
+    def __call__(self, execute, sql, params, many, context):
+        # A ``connection.execute_wrapper`` hook.
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - started
+            self.query_count += 1
+            if self.statements is not None:
+                self.statements[IN_LIST_RE.sub('IN (...)', sql)] += 1
+
+    def repeated_statements(self, threshold):
+        """Return ``(sql, count)`` for statements run at least ``threshold`` times."""
+        if self.statements is None:
+            return []
+        return [(sql, count) for sql, count in self.statements.most_common() if count >= threshold]
+
+
+def current_profile():
+    """Return the profile of the request being sampled, or ``None``."""
+    return _profile.get()
+
+
+@contextmanager
+def profiling(profile):
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to ``phase`` of the current sampled request."""
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[phase] += time.perf_counter() - started
+
+
+def record_cache(result, amount=1):
+    """Count a cache hit or miss against the current sampled request."""
+    profile = _profile.get()
+    if profile is not None:
+        profile.cache[result] += amount
@@ -0,0 +1,96 @@
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.urls import reverse
+
+from apps.authentication.models import User
+from apps.authentication.views import get_tokens_for_user
+from core.db.backends import POOLED_ENGINES
+from core.db.pool import close_pools, get_pool_stats
+
+
+class Command(BaseCommand):
+    """Compare request throughput with per-request connections, persistent connections and the pool."""
+    help = (
+        'Serve authenticated API requests from several threads through the WSGI handler and report '
+        'requests per second for each connection strategy against the default database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=4)
+
+    def handle(self, *args, **options):
+        database = connections.settings['default']
+        original = dict(database)
+        engine = original['ENGINE']
+        if engine in POOLED_ENGINES.values():
+            engine = next(plain for plain, pooled in POOLED_ENGINES.items() if pooled == engine)
+        modes = [
+            ('per-request', {'ENGINE': engine, 'CONN_MAX_AGE': 0}),
+            ('persistent', {'ENGINE': engine, 'CONN_MAX_AGE': 600}),
+        ]
+        if engine in POOLED_ENGINES:
+            modes.append(('pooled', {'ENGINE': POOLED_ENGINES[engine], 'CONN_MAX_AGE': 0}))
+        else:
+            self.stdout.write(f'No pooled backend for {engine}; skipping the pooled run.')
+
+        user = User.objects.create_user(
+            email=f'bench-pool-{time.time_ns()}@example.com', password='x',
+            username=f'benchpool{time.time_ns() % 10**9}', first_name='bench', last_name='pool',
+        )
+        token = get_tokens_for_user(user)['access']
+        try:
+            self.stdout.write(f'{"mode":<14}{"req/s":>9}')
+            for mode, overrides in modes:
+                database.update(overrides)
+                connections['default'].close()
+                del connections['default']
+                self.stdout.write(f'{mode:<14}{self.run(token, options):>9.0f}')
+            self.stdout.write(f'pool stats: {get_pool_stats()}')
+        finally:
+            database.clear()
+            database.update(original)
+            connections['default'].close()
+            del connections['default']
+            close_pools()
+            User.objects.filter(pk=user.pk).delete()
+
+    def run(self, token, options):
+        # Call the WSGI handler itself: the test client keeps connections
+        # open across requests, which would hide the cost being measured.
+        handler = WSGIHandler()
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': reverse('chats:conversations'),
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost',
+            'HTTP_AUTHORIZATION': f'Bearer {token}',
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+        }
+        per_thread = options['requests'] // options['threads']
+
+        def start_response(status, headers):
+            assert status.startswith('200'), status
+
+        def worker(_):
+            try:
+                for _ in range(per_thread):
+                    response = handler({**environ, 'wsgi.input': io.BytesIO()}, start_response)
+                    b''.join(response)
+                    response.close()
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(worker, range(options['threads'])))
+        return per_thread * options['threads'] / (time.perf_counter() - started)
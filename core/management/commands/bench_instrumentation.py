@@ -0,0 +1,105 @@
+import io
+import statistics
+import sys
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from apps.authentication.models import User
+from apps.authentication.views import get_tokens_for_user
+from core.instrumentation import registry
+from core.middleware import InstrumentationMiddleware
+
+
+class Command(BaseCommand):
+    """Measure the overhead of InstrumentationMiddleware."""
+    help = (
+        'Time an authenticated API request without instrumentation and the cost the middleware adds to '
+        'unsampled and sampled requests, and report it as a share of the request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests or middleware calls per round.')
+        parser.add_argument('--rounds', type=int, default=7)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(
+            email=f'bench-instr-{time.time_ns()}@example.com', password='x',
+            username=f'benchinstr{time.time_ns() % 10**9}', first_name='bench', last_name='instr',
+        )
+        token = get_tokens_for_user(user)['access']
+        try:
+            with override_settings(INSTRUMENTATION_ENABLED=False):
+                handler = WSGIHandler()
+            request_us = statistics.median(
+                self.run(handler, token, options['requests']) for _ in range(options['rounds'])
+            )
+        finally:
+            User.objects.filter(pk=user.pk).delete()
+
+        # End-to-end timings on a shared machine vary by more than the
+        # overhead being measured, so time the middleware around a
+        # response that is already built and relate it to the request.
+        request = RequestFactory().get('/')
+        response = HttpResponse()
+        rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        costs = {}
+        try:
+            for name, overrides in (
+                ('unsampled', {'INSTRUMENTATION_SAMPLE_RATE': 0.0}),
+                ('sampled', {'INSTRUMENTATION_SAMPLE_RATE': 1.0, 'INSTRUMENTATION_SERVER_TIMING': True}),
+            ):
+                with override_settings(**overrides):
+                    middleware = InstrumentationMiddleware(lambda request: response)
+                    costs[name] = min(
+                        self.time_calls(middleware, request, options['requests']) for _ in range(options['rounds'])
+                    )
+            bare = min(
+                self.time_calls(lambda request: response, request, options['requests'])
+                for _ in range(options['rounds'])
+            )
+        finally:
+            registry.reset()
+
+        unsampled = costs['unsampled'] - bare
+        sampled = costs['sampled'] - bare
+        blended = (1 - rate) * unsampled + rate * sampled
+        self.stdout.write(f'request without instrumentation  {request_us:>9.0f} us')
+        self.stdout.write(f'middleware, unsampled request    {unsampled:>9.1f} us  {unsampled / request_us:>7.2%}')
+        self.stdout.write(f'middleware, sampled request      {sampled:>9.1f} us  {sampled / request_us:>7.2%}')
+        self.stdout.write(f'average at {rate:.0%} sampling          {blended:>9.1f} us  {blended / request_us:>7.2%}')
+
+    @staticmethod
+    def time_calls(middleware, request, calls):
+        started = time.perf_counter()
+        for _ in range(calls):
+            middleware(request)
+        return (time.perf_counter() - started) / calls * 1e6
+
+    def run(self, handler, token, requests):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': reverse('chats:conversations'),
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'HTTP_HOST': 'localhost',
+            'HTTP_AUTHORIZATION': f'Bearer {token}',
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+        }
+
+        def start_response(status, headers):
+            assert status.startswith('200'), status
+
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = handler({**environ, 'wsgi.input': io.BytesIO()}, start_response)
+            b''.join(response)
+            response.close()
+        return (time.perf_counter() - started) / requests * 1e6
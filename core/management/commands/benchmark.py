@@ -0,0 +1,106 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core.benchmark import CLIENTS, SCENARIOS, cleanup, compare, environment, measure, queued_writers, seed
+
+
+class Command(BaseCommand):
+    """Benchmark the API through the WSGI handler and the ASGI application, and check for regressions."""
+    help = (
+        'Seed users, conversations and messages, drive API endpoints with concurrent in-process WSGI and '
+        'ASGI clients, and report throughput, p50/p95/p99 latency and queries per request. Results can be '
+        'saved as JSON and compared with a baseline; the command fails if a metric regressed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma-separated scenario names.')
+        parser.add_argument('--clients', default='wsgi,asgi', help='Comma-separated clients: wsgi, asgi.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and client.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests before each run.')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--conversations', type=int, default=50)
+        parser.add_argument('--messages', type=int, default=20, help='Messages per conversation.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='Compare with the results in this JSON file.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.15,
+            help='Fail if a metric is worse than the baseline by more than this fraction.',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows.')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        clients = [name.strip() for name in options['clients'].split(',') if name.strip()]
+        unknown = [name for name in scenarios if name not in SCENARIOS] + [name for name in clients if name not in CLIENTS]
+        if unknown:
+            raise CommandError(f'Unknown scenarios or clients: {", ".join(unknown)}.')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        with queued_writers():
+            results = self.run(scenarios, clients, options)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(f'Results written to {options["output"]}.')
+        if baseline is not None:
+            self.report(results, baseline, options['threshold'])
+
+    def run(self, scenarios, clients, options):
+        fixtures = seed(options['users'], options['conversations'], options['messages'])
+        results = {
+            'environment': environment(),
+            'parameters': {
+                key: options[key] for key in ('requests', 'concurrency', 'users', 'conversations', 'messages')
+            },
+            'scenarios': {},
+        }
+        # Every request is profiled so queries can be counted; throttles and
+        # the broker are taken out so only the request path is measured.
+        try:
+            with override_settings(
+                INSTRUMENTATION_ENABLED=True,
+                INSTRUMENTATION_SAMPLE_RATE=1.0,
+                REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+                CELERY_BROKER_URL='memory://',
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ):
+                self.stdout.write(
+                    f'{"scenario":<26}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+                    f'{"queries":>9}{"errors":>8}'
+                )
+                for name in scenarios:
+                    for client in clients:
+                        summary = measure(
+                            SCENARIOS[name], client, fixtures,
+                            options['requests'], options['concurrency'], options['warmup'],
+                        )
+                        key = f'{name}.{client}'
+                        results['scenarios'][key] = summary
+                        queries = summary['queries_per_request']
+                        self.stdout.write(
+                            f'{key:<26}{summary["throughput"]:>10.1f}{summary["p50_ms"]:>10.2f}'
+                            f'{summary["p95_ms"]:>10.2f}{summary["p99_ms"]:>10.2f}'
+                            f'{"-" if queries is None else f"{queries:.1f}":>9}{summary["errors"]:>8}'
+                        )
+        finally:
+            if not options['keep']:
+                cleanup(fixtures)
+        return results
+
+    def report(self, results, baseline, threshold):
+        rows, regressions = compare(results, baseline, threshold)
+        self.stdout.write(f'\n{"scenario":<26}{"metric":<22}{"baseline":>12}{"current":>12}{"change":>9}')
+        for key, metric, old, new, change, regressed in rows:
+            line = f'{key:<26}{metric:<22}{old:>12.2f}{new:>12.2f}{change:>+9.1%}'
+            self.stdout.write(self.style.ERROR(line) if regressed else line)
+        if regressions:
+            details = ', '.join(f'{key} {metric}' for key, metric, _, _ in regressions)
+            raise CommandError(f'{len(regressions)} regression(s) beyond {threshold:.0%}: {details}.')
+        self.stdout.write(self.style.SUCCESS(f'No regressions beyond {threshold:.0%}.'))
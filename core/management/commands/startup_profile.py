@@ -0,0 +1,77 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.startup import PHASES, flatten, profile
+
+
+class Command(BaseCommand):
+    """Profile the cold start of a worker: import tree and time to first response."""
+    help = (
+        'Start fresh interpreters that set Django up, build the WSGI handler and serve two requests, and '
+        'report the median time of each phase and the import tree from -X importtime. Use --lean or '
+        '--compare to measure LEAN_MODE. Run it after a first start so bytecode is already compiled.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lean', action='store_true', help='Profile with LEAN_MODE on.')
+        parser.add_argument('--compare', action='store_true', help='Profile with LEAN_MODE off and on.')
+        parser.add_argument('--runs', type=int, default=5, help='Cold starts to take the median of.')
+        parser.add_argument('--depth', type=int, default=3, help='Levels of the import tree to show.')
+        parser.add_argument('--min-ms', type=float, default=5.0, help='Hide imports cheaper than this.')
+        parser.add_argument('--top', type=int, default=15, help='Modules to list by their own import time.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            modes = [False, True]
+        else:
+            modes = [options['lean'] or settings.LEAN_MODE]
+        results = [profile(lean, options['runs']) for lean in modes]
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.report(result, options)
+        if len(results) == 2:
+            self.compare(*results)
+
+    def report(self, result, options):
+        mode = 'on' if result['lean'] else 'off'
+        self.stdout.write(f'LEAN_MODE {mode}: median of {result["runs"]} cold starts, responses {result["status"]}')
+        for phase in PHASES:
+            self.stdout.write(f'  {phase:<16}{result["timings_ms"][phase]:>10.1f} ms')
+        self.stdout.write('  loaded: ' + ', '.join(
+            f'{name} {"yes" if loaded else "no"}' for name, loaded in result['modules'].items()
+        ))
+
+        self.stdout.write(
+            f'\nImport tree, cumulative >= {options["min_ms"]:g} ms '
+            f'(to first response under -X importtime: {result["import_total_ms"]:.0f} ms)'
+        )
+        self.stdout.write(f'  {"cumulative":>10}{"self":>9}  module')
+        self.write_tree(result['imports'], options['depth'], options['min_ms'])
+
+        self.stdout.write('\nMost expensive modules by own import time')
+        modules = sorted(flatten(result['imports']), key=lambda node: node['self_ms'], reverse=True)
+        for node in modules[:options['top']]:
+            self.stdout.write(f'  {node["self_ms"]:>8.1f} ms  {node["name"]}')
+        self.stdout.write('')
+
+    def write_tree(self, nodes, depth, min_ms, level=0):
+        for node in sorted(nodes, key=lambda node: node['cumulative_ms'], reverse=True):
+            if node['cumulative_ms'] < min_ms:
+                break
+            self.stdout.write(
+                f'  {node["cumulative_ms"]:>10.1f}{node["self_ms"]:>9.1f}  {"  " * level}{node["name"]}'
+            )
+            if level + 1 < depth:
+                self.write_tree(node['children'], depth, min_ms, level + 1)
+
+    def compare(self, full, lean):
+        self.stdout.write(f'{"phase":<18}{"full ms":>10}{"lean ms":>10}{"change":>9}')
+        for phase in PHASES:
+            before, after = full['timings_ms'][phase], lean['timings_ms'][phase]
+            change = f'{(after - before) / before:+.0%}' if before else '-'
+            self.stdout.write(f'{phase:<18}{before:>10.1f}{after:>10.1f}{change:>9}')
@@ -0,0 +1,39 @@
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+
+class Command(BaseCommand):
+    """Build the cached OpenAPI documents ahead of the first request."""
+    help = (
+        'Render and cache the drf-yasg schema documents as a post-deploy step. Only useful with a '
+        'shared cache, a fixed SCHEMA_CACHE_VERSION and SCHEMA_URL; otherwise workers build it on first hit.'
+    )
+
+    targets = [
+        ('schema-json', {'format': '.json'}, {}),
+        ('schema-json', {'format': '.yaml'}, {}),
+        ('schema-swagger-ui', {}, {'format': 'openapi'}),
+        ('schema-redoc', {}, {'format': 'openapi'}),
+    ]
+
+    def handle(self, *args, **options):
+        if settings.LEAN_MODE:
+            raise CommandError('LEAN_MODE is on, so there is no schema to warm.')
+        if not settings.SCHEMA_URL:
+            raise CommandError('SCHEMA_URL is not set, so documents are cached per requested host.')
+        url = urlsplit(settings.SCHEMA_URL)
+        factory = RequestFactory(HTTP_HOST=url.netloc)
+        for name, kwargs, query in self.targets:
+            path = reverse(name, kwargs=kwargs)
+            request = factory.get(path, query, secure=url.scheme == 'https')
+            match = resolve(path)
+            started = time.perf_counter()
+            response = match.func(request, *match.args, **match.kwargs)
+            self.stdout.write(
+                f'{path} {query or ""} -> {response.status_code} in {(time.perf_counter() - started) * 1000:.1f}ms'
+            )
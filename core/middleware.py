@@ -0,0 +1,162 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from core.db_router import begin_routing, end_routing, get_routing_state
+from core.instrumentation import QUERY_COUNT_BUCKETS, RequestProfile, profiling, registry
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'db_pin'
+
+
+def pin_cache_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def resolved_user_id(request):
+    """Return the authenticated user's pk without triggering a session lookup."""
+    user = request.__dict__.get('user')
+    if user is None or isinstance(user, SimpleLazyObject) or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keep a client's reads on the primary for REPLICA_PIN_SECONDS after it writes.
+
+    The pin travels in a short-lived cookie for the browser session and in the
+    shared cache for the authenticated user, so the user's other devices see
+    the write as well. A user pin is looked up once DRF has authenticated the
+    request, which is when requests start touching the database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0.0
+        token = begin_routing(pinned_until, lambda: self.load_user_pin(request))
+        try:
+            response = self.get_response(request)
+            state = get_routing_state()
+        finally:
+            end_routing(token)
+
+        user_id = resolved_user_id(request)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                f'{state.pinned_until:.3f}',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+            if user_id is not None:
+                caches['shared'].set(pin_cache_key(user_id), state.pinned_until, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    @staticmethod
+    def load_user_pin(request):
+        user_id = resolved_user_id(request)
+        if user_id is None:
+            return None
+        return caches['shared'].get(pin_cache_key(user_id), 0.0)
+
+
+class InstrumentationMiddleware:
+    """
+    Record per-view latency for every request and a detailed profile for a sample.
+
+    Every request adds to the latency histogram and request counter, which
+    costs two clock reads and a lock. One request in ``1 / INSTRUMENTATION_SAMPLE_RATE``
+    is profiled as well: its database queries are timed through
+    ``execute_wrapper``, tiered cache hits and misses are counted, phases
+    wrapped in ``core.instrumentation.timed`` are added up, and the totals go
+    out in a ``Server-Timing`` header when ``INSTRUMENTATION_SERVER_TIMING``
+    is on. With ``INSTRUMENTATION_DETECT_N_PLUS_ONE`` a sampled request that
+    runs the same statement ``INSTRUMENTATION_N_PLUS_ONE_THRESHOLD`` times is
+    logged and counted against its view.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+            started = time.perf_counter()
+            response = self.get_response(request)
+            self.record(request, response, time.perf_counter() - started)
+            return response
+
+        profile = RequestProfile(record_queries=settings.INSTRUMENTATION_DETECT_N_PLUS_ONE)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            stack.enter_context(profiling(profile))
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(profile))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        view = self.record(request, response, duration)
+        self.record_profile(view, profile)
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(profile, duration)
+        return response
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match is not None else '<unmatched>'
+
+    def record(self, request, response, duration):
+        view = self.view_name(request)
+        registry.inc('http_requests_total', (
+            ('view', view), ('method', request.method), ('status', str(response.status_code)),
+        ))
+        registry.observe('http_request_duration_seconds', (('view', view),), duration)
+        return view
+
+    def record_profile(self, view, profile):
+        labels = (('view', view),)
+        registry.inc('http_request_sampled_total', labels)
+        registry.observe('http_request_db_queries', labels, profile.query_count, QUERY_COUNT_BUCKETS)
+        registry.inc('http_request_db_seconds_total', labels, profile.query_time)
+        for result, count in profile.cache.items():
+            registry.inc('http_request_cache_total', labels + (('result', result),), count)
+        for phase, seconds in profile.phases.items():
+            registry.inc('http_request_phase_seconds_total', labels + (('phase', phase),), seconds)
+        repeated = profile.repeated_statements(settings.INSTRUMENTATION_N_PLUS_ONE_THRESHOLD)
+        if repeated:
+            sql, count = repeated[0]
+            registry.inc('http_request_n_plus_one_total', labels)
+            registry.n_plus_one[view] = {'sql': sql, 'count': count}
+            logger.warning('Possible N+1 queries in %s: %d x %s', view, count, sql)
+
+
+def server_timing(profile, duration):
+    """Format a profile as a ``Server-Timing`` header value, durations in milliseconds."""
+    metrics = [f'db;dur={profile.query_time * 1000:.1f};desc="{profile.query_count} queries"']
+    if profile.cache:
+        hits = profile.cache['local_hits'] + profile.cache['shared_hits']
+        metrics.append(f'cache;desc="{hits} hits, {profile.cache["misses"]} misses"')
+    for phase, seconds in sorted(profile.phases.items()):
+        metrics.append(f'{phase};dur={seconds * 1000:.1f}')
+    metrics.append(f'total;dur={duration * 1000:.1f}')
+    return ', '.join(metrics)
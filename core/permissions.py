@@ -0,0 +1,35 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework.permissions import BasePermission
+
+
+class IsStaffUser(BasePermission):
+    """
+    Allow staff users. ``is_staff`` is not a token claim, and ``role`` can be
+    picked at registration, so the flag is read from the cached user row.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        try:
+            return user.instance.is_staff
+        except ObjectDoesNotExist:
+            return False
+
+
+class IsMetricsScraper(BasePermission):
+    """
+    Allow the metrics scraper: a matching ``Authorization: Bearer <METRICS_TOKEN>``
+    header when a token is configured, otherwise a client address listed in
+    ``METRICS_ALLOWED_IPS``, which is empty unless configured.
+    """
+
+    def has_permission(self, request, view):
+        if settings.METRICS_TOKEN:
+            header = request.META.get('HTTP_AUTHORIZATION', '')
+            return hmac.compare_digest(header.encode(), f'Bearer {settings.METRICS_TOKEN}'.encode())
+        return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
@@ -0,0 +1,60 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from core.instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Same escaping JSONRenderer applies so output stays a strict JavaScript subset.
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` that encodes with orjson when it is installed.
+
+    orjson encodes ``UUID``, ``datetime``, ``date`` and ``time`` natively, in
+    the same format as DRF's encoder. The output is byte-for-byte what
+    ``JSONRenderer`` produces for compact, unicode output. Anything else falls
+    back to the stdlib path: indented output, values orjson cannot encode, or
+    ``COMPACT_JSON``/``UNICODE_JSON`` switched off.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return self.render_json(data, accepted_media_type, renderer_context)
+
+    def render_json(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b''
+        if orjson is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encode_default, option=orjson.OPT_UTC_Z)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+    def encode_default(self, obj):
+        """Encode the types orjson does not know (lazy strings, Decimals, querysets...) like DRF does."""
+        return self.encoder_class().default(obj)
+
+
+class PrometheusTextRenderer(BaseRenderer):
+    """Pass through text that is already in the Prometheus exposition format."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # Errors raised before the view (permission denied) arrive as dicts.
+        return ''.join(f'# {key}: {value}\n' for key, value in (data or {}).items()).encode(self.charset)
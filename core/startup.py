@@ -0,0 +1,151 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+# Modules whose presence after the first request shows what a worker paid
+# for: drf_yasg for the schema stack, the admin registrations for the admin.
+WATCHED_MODULES = {
+    'drf_yasg': 'drf_yasg',
+    'admin': 'django.contrib.auth.admin',
+}
+PHASES = ('interpreter', 'setup', 'handler', 'first_request', 'second_request', 'first_response')
+
+# Run in a fresh interpreter: set Django up, build the WSGI handler and serve
+# two requests that need no database, stamping wall-clock time between steps.
+CHILD_SCRIPT = '''
+import io, json, os, sys, time
+started = time.time()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+set_up = time.time()
+from django.core.handlers.wsgi import WSGIHandler
+handler = WSGIHandler()
+handler_built = time.time()
+
+def request():
+    data = b'{"length": 16}'
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'PATH_INFO': '/api/v1/authentication/generate-password/',
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(data)),
+        'wsgi.url_scheme': 'http',
+        'wsgi.errors': sys.stderr,
+        'wsgi.input': io.BytesIO(data),
+    }
+    status = []
+    response = handler(environ, lambda code, headers: status.append(int(code.split()[0])))
+    b''.join(response)
+    response.close()
+    return status[0], time.time()
+
+first_status, first_done = request()
+second_status, second_done = request()
+print(json.dumps({
+    'started': started,
+    'set_up': set_up,
+    'handler_built': handler_built,
+    'first_done': first_done,
+    'second_done': second_done,
+    'status': [first_status, second_status],
+    'modules': {key: name in sys.modules for key, name in %r.items()},
+}))
+''' % (WATCHED_MODULES,)
+
+
+def run_child(lean, importtime=False):
+    """
+    Start a worker-like interpreter and return its phase timings in
+    milliseconds, plus the raw ``-X importtime`` output when asked for.
+    """
+    env = {**os.environ, 'LEAN_MODE': 'true' if lean else 'false'}
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', CHILD_SCRIPT]
+    spawned = time.time()
+    completed = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode:
+        raise RuntimeError(f'The profiled interpreter failed:\n{completed.stderr[-2000:]}')
+    stamps = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings = {
+        'interpreter': stamps['started'] - spawned,
+        'setup': stamps['set_up'] - stamps['started'],
+        'handler': stamps['handler_built'] - stamps['set_up'],
+        'first_request': stamps['first_done'] - stamps['handler_built'],
+        'second_request': stamps['second_done'] - stamps['first_done'],
+        'first_response': stamps['first_done'] - spawned,
+    }
+    result = {
+        'timings_ms': {phase: round(seconds * 1000, 2) for phase, seconds in timings.items()},
+        'status': stamps['status'],
+        'modules': stamps['modules'],
+    }
+    return result, completed.stderr if importtime else ''
+
+
+def profile(lean, runs=5):
+    """
+    Return the median phase timings over ``runs`` cold starts, and the import
+    tree of one more start run under ``-X importtime``. The tree comes from a
+    separate run because the tracing slows imports down.
+    """
+    samples = [run_child(lean)[0] for _ in range(runs)]
+    traced, stderr = run_child(lean, importtime=True)
+    return {
+        'lean': lean,
+        'runs': runs,
+        'timings_ms': {
+            phase: round(statistics.median(sample['timings_ms'][phase] for sample in samples), 2)
+            for phase in PHASES
+        },
+        'status': samples[-1]['status'],
+        'modules': samples[-1]['modules'],
+        'imports': parse_importtime(stderr),
+        'import_total_ms': traced['timings_ms']['first_response'],
+    }
+
+
+def parse_importtime(output):
+    """
+    Turn ``-X importtime`` output into a tree of ``{'name', 'self_ms',
+    'cumulative_ms', 'children'}`` nodes.
+
+    Python reports a module once its import finishes, so children come out
+    before their parent, one indentation level deeper. Nodes wait on a stack
+    per depth until the parent that imported them shows up.
+    """
+    pending = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|', 2)
+        if len(fields) != 3:
+            continue
+        own, cumulative, name = fields
+        if not own.strip().isdigit():
+            # The header line.
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        node = {
+            'name': name.strip(),
+            'self_ms': int(own) / 1000,
+            'cumulative_ms': int(cumulative) / 1000,
+            'children': pending.pop(depth + 1, []),
+        }
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+def flatten(nodes):
+    for node in nodes:
+        yield node
+        yield from flatten(node['children'])
@@ -0,0 +1,622 @@
+import asyncio
+import datetime
+import gzip
+import io
+import json
+import os
+import uuid
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connections, router, transaction
+from django.http import FileResponse, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from drf_yasg.generators import OpenAPISchemaGenerator
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+from apps.authentication.views import get_tokens_for_user
+from apps.users.models import UserSearchToken
+from config import schema
+from core.benchmark import compare
+from core.cache import TieredCache
+from core.db.backends.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from core.db.pool import ConnectionPool, PoolTimeout
+from core.db_router import begin_routing, end_routing, use_primary
+from core.handlers import PathsendASGIHandler
+from core.instrumentation import registry, timed
+from core.middleware import PIN_COOKIE, InstrumentationMiddleware, ReplicaPinningMiddleware
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from core.startup import parse_importtime
+from core.throttling import AuthIPThrottle
+
+
+@override_settings(SCHEMA_CACHE_VERSION='test-schema')
+class CachedSchemaViewTests(TestCase):
+    """Tests for the cached drf-yasg schema views."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_document_is_generated_once_and_revalidated_with_etag(self):
+        with mock.patch.object(
+            OpenAPISchemaGenerator, 'get_schema', autospec=True, side_effect=OpenAPISchemaGenerator.get_schema,
+        ) as get_schema:
+            first = self.client.get('/swagger.json')
+            second = self.client.get('/swagger.json')
+        self.assertEqual(get_schema.call_count, 1)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(first['ETag'])
+
+        revalidated = self.client.get('/swagger.json', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_serves_precompressed_gzip_variant(self):
+        plain = self.client.get('/swagger.json')
+        compressed = self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+
+    def test_cache_keys_ignore_raw_accept_headers(self):
+        from django.core.cache import cache
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            for accept in ('application/json', 'application/json; q=0.9', 'text/plain, */*', 'x/y'):
+                self.client.get('/swagger.json', HTTP_ACCEPT=accept)
+        self.assertEqual(cache_set.call_count, 1)
+        self.assertEqual(cache_set.call_args.kwargs['timeout'], settings.SCHEMA_CACHE_TIMEOUT)
+        self.assertEqual(schema._build_locks, {})
+
+    @override_settings(ALLOWED_HOSTS=['one.example.com', 'two.example.com'])
+    def test_documents_are_cached_per_host_without_schema_url(self):
+        first = self.client.get('/swagger.json', HTTP_HOST='one.example.com').json()
+        second = self.client.get('/swagger.json', HTTP_HOST='two.example.com', secure=True).json()
+        self.assertEqual((first['host'], first['schemes']), ('one.example.com', ['http']))
+        self.assertEqual((second['host'], second['schemes']), ('two.example.com', ['https']))
+
+    def test_ui_pages_are_not_cached(self):
+        with mock.patch.object(schema, '_get_build_lock') as get_build_lock:
+            response = self.client.get('/swagger/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        get_build_lock.assert_not_called()
+
+
+class TieredCacheTests(SimpleTestCase):
+    """Tests for the two-tier cache backend."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.cache = TieredCache(uuid.uuid4().hex, {'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_TIMEOUT': 60}})
+
+    def test_shared_hit_is_copied_to_local_tier(self):
+        caches['shared'].set('greeting', 'hello')
+        self.assertEqual(self.cache.get('greeting'), 'hello')
+        caches['shared'].delete('greeting')
+        self.assertEqual(self.cache.get('greeting'), 'hello')
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['shared_hits'], stats['local_hits']), (1, 1))
+
+    def test_delete_invalidates_both_tiers(self):
+        self.cache.set('greeting', 'hello')
+        self.cache.delete('greeting')
+        self.assertIsNone(self.cache.get('greeting'))
+        self.assertIsNone(caches['shared'].get('greeting'))
+
+    def test_local_tier_is_bounded(self):
+        cache = TieredCache(uuid.uuid4().hex, {'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_MAX_ENTRIES': 2}})
+        for key in 'abc':
+            cache.set(key, key)
+        self.assertEqual(cache.get_stats()['local_entries'], 2)
+
+    def test_get_or_compute_runs_a_single_flight(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_compute('slow', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_threads_share_the_local_tier_and_counters(self):
+        cache = caches['default']
+        cache.set('greeting', 'hello')
+        caches['shared'].delete('greeting')
+        hits = cache.get_stats()['local_hits']
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append((caches['default'], caches['default'].get('greeting'))))
+        thread.start()
+        thread.join()
+        other, value = seen[0]
+        self.assertIsNot(other, cache)
+        self.assertEqual(value, 'hello')
+        self.assertEqual(cache.get_stats()['local_hits'], hits + 1)
+        cache.clear_local()
+
+    def test_bumping_a_namespace_invalidates_its_keys(self):
+        key = self.cache.namespaced_key('users', 42)
+        self.cache.set(key, 'cached')
+        self.cache.bump_namespace('users')
+        self.assertNotEqual(self.cache.namespaced_key('users', 42), key)
+        self.assertIsNone(self.cache.get(self.cache.namespaced_key('users', 42)))
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'auth_ip': '3/min', 'auth_email': '2/min', 'password_generate': '3/min'},
+})
+class ThrottleTests(TestCase):
+    """Tests for the sliding-window throttles on the authentication endpoints."""
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.client = APIClient()
+
+    def login(self, email, ip):
+        return self.client.post(
+            reverse('authentication:login'),
+            {'email': email, 'password': 'wrong'},
+            format='json',
+            REMOTE_ADDR=ip,
+        )
+
+    def test_blocks_an_ip_over_its_rate(self):
+        statuses = [self.login(f'user{i}@example.com', '10.0.0.1').status_code for i in range(4)]
+        self.assertEqual(statuses, [400, 400, 400, 429])
+        self.assertEqual(self.login('other@example.com', '10.0.0.2').status_code, 400)
+
+    def test_blocks_an_email_across_ips(self):
+        statuses = [self.login('victim@example.com', f'10.0.1.{i}').status_code for i in range(3)]
+        self.assertEqual(statuses, [400, 400, 429])
+
+    def test_throttled_response_has_retry_after(self):
+        for _ in range(3):
+            self.client.post(reverse('authentication:generate_password'), {}, format='json')
+        response = self.client.post(reverse('authentication:generate_password'), {}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_falls_back_to_in_process_counting_when_cache_fails(self):
+        with mock.patch.object(type(caches['shared']), 'incr', side_effect=ConnectionError):
+            throttle = AuthIPThrottle()
+            request = mock.Mock(META={'REMOTE_ADDR': '10.9.9.9'})
+            results = [throttle.allow_request(request, None) for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+
+REPLICAS = ['replica_test_1', 'replica_test_2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS, REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Tests for the replica router, with extra SQLite files standing in for replicas."""
+    # The replica connections are registered in setUpClass, after the test
+    # runner has set up databases, and resolve into '__all__' there.
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        for alias in REPLICAS:
+            path = os.path.join(cls.tempdir.name, f'{alias}.sqlite3')
+            default = connections.settings['default']
+            connections.settings[alias] = {**default, 'NAME': path, 'TEST': {**default['TEST'], 'NAME': path}}
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(User)
+                editor.create_model(UserSearchToken)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in REPLICAS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.tempdir.cleanup()
+
+    def setUp(self):
+        caches['shared'].clear()
+        token = begin_routing()
+        self.addCleanup(end_routing, token)
+
+    def create_user(self, email, using=None):
+        manager = User.objects.db_manager(using)
+        return manager.create_user(
+            email=email, password='x', username=email.split('@')[0], first_name='john', last_name='smith',
+        )
+
+    def exists(self, email):
+        return User.objects.filter(email=email).exists()
+
+    def test_reads_go_to_replicas(self):
+        for alias in REPLICAS:
+            self.create_user('replicated@example.com', using=alias)
+        self.assertIn(router.db_for_read(User), REPLICAS)
+        self.assertTrue(self.exists('replicated@example.com'))
+        with use_primary():
+            self.assertFalse(self.exists('replicated@example.com'))
+
+    def test_reads_stay_on_primary_after_a_write_until_the_pin_expires(self):
+        self.create_user('fresh@example.com')
+        self.assertTrue(self.exists('fresh@example.com'))
+        with mock.patch('core.db_router.time.time', return_value=time.time() + 6):
+            self.assertFalse(self.exists('fresh@example.com'))
+
+    def test_reads_inside_a_transaction_use_primary(self):
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_middleware_carries_the_pin_across_requests(self):
+        end_routing(begin_routing())
+        factory = RequestFactory()
+        seen = []
+
+        def write(request):
+            request.user = self.create_user('writer@example.com')
+            return HttpResponse()
+
+        def read(request):
+            seen.append(router.db_for_read(User))
+            request.user = User(pk=user.pk)
+            seen.append(router.db_for_read(User))
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(write)(factory.post('/'))
+        user = User.objects.using('default').get(email='writer@example.com')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        factory.cookies[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        ReplicaPinningMiddleware(read)(factory.get('/'))
+        factory.cookies.clear()
+        ReplicaPinningMiddleware(read)(factory.get('/'))
+        self.assertEqual(seen[:2], ['default', 'default'])
+        # Another device of the same user has no cookie but is pinned once authenticated.
+        self.assertIn(seen[2], REPLICAS)
+        self.assertEqual(seen[3], 'default')
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+def ping_fake(connection):
+    if not connection.healthy:
+        raise OSError('gone away')
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Tests for the process-wide connection pool."""
+
+    def test_reuses_released_connections(self):
+        pool = ConnectionPool('test', ping_fake)
+        first = pool.acquire(FakeConnection)
+        pool.release(first)
+        self.assertIs(pool.acquire(FakeConnection), first)
+        self.assertEqual(pool.stats()['created'], 1)
+        self.assertEqual(pool.stats()['reused'], 1)
+
+    def test_waits_then_times_out_when_exhausted(self):
+        pool = ConnectionPool('test', ping_fake, max_size=1, timeout=0.05)
+        pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_discards_connections_that_fail_the_health_check(self):
+        pool = ConnectionPool('test', ping_fake, check_interval=0)
+        broken = pool.acquire(FakeConnection)
+        pool.release(broken)
+        broken.healthy = False
+        replacement = pool.acquire(FakeConnection)
+        self.assertIsNot(replacement, broken)
+        self.assertTrue(broken.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+
+    def test_unusable_connections_are_closed_on_release(self):
+        pool = ConnectionPool('test', ping_fake)
+        connection = pool.acquire(FakeConnection)
+        pool.release(connection, reusable=False)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['open'], 0)
+
+    def test_database_wrapper_returns_connections_to_the_pool(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            settings_dict = {
+                **connections.settings['default'],
+                'NAME': os.path.join(tempdir, 'pooled.sqlite3'),
+                'POOL': {'MAX_SIZE': 2},
+            }
+            wrapper = PooledSQLiteWrapper(settings_dict, alias='pool_test')
+            wrapper.ensure_connection()
+            raw = wrapper.connection
+            with wrapper.cursor() as cursor:
+                cursor.execute('CREATE TABLE t (id INTEGER)')
+            wrapper.close()
+            wrapper.ensure_connection()
+            self.assertIs(wrapper.connection, raw)
+            wrapper.close()
+            raw.close()
+
+
+class RuntimeStatsTests(TestCase):
+    """Tests for the staff-only runtime statistics endpoint."""
+
+    def get_stats(self, role, is_staff=False):
+        user = User.objects.create_user(
+            email=f'{role}@example.com', password='x', username=role, first_name='john', last_name='smith', role=role,
+            is_staff=is_staff,
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {get_tokens_for_user(user)["access"]}')
+        return client.get(reverse('core:stats'))
+
+    def test_staff_see_pool_and_cache_stats(self):
+        response = self.get_stats('guest', is_staff=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('default', response.data['caches'])
+        self.assertIn('database_pools', response.data)
+
+    def test_non_staff_are_forbidden_whatever_their_role(self):
+        self.assertEqual(self.get_stats('guest').status_code, 403)
+        self.assertEqual(self.get_stats('admin').status_code, 403)
+
+
+class FastJSONTests(SimpleTestCase):
+    """Tests for the orjson-backed renderer and parser."""
+    data = {
+        'user_id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'created_at': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+        'birthday': datetime.date(2000, 1, 2),
+        'message': gettext_lazy('Login successful.'),
+        'bio': 'line\u2028break ünïcode',
+        'items': [1, 2.5, None, True],
+    }
+
+    def test_output_matches_the_stdlib_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_falls_back_without_orjson_and_for_indented_output(self):
+        with mock.patch('core.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, 'application/json; indent=2'),
+            JSONRenderer().render(self.data, 'application/json; indent=2'),
+        )
+
+    def test_parser_decodes_and_rejects_invalid_json(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"name": "ünï"}'.encode())), {'name': 'ünï'})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"name": NaN}'))
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+class InstrumentationTests(TestCase):
+    """Tests for request instrumentation and the metrics endpoint."""
+
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.user = User.objects.create_user(
+            email='metrics@example.com', password='Str0ng!Pass', username='metrics',
+            first_name='john', last_name='smith',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def metrics_text(self, **extra):
+        return APIClient().get(reverse('core:metrics'), **extra)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0, INSTRUMENTATION_SERVER_TIMING=True)
+    def test_sampled_request_gets_server_timing_and_query_metrics(self):
+        response = self.client.get(reverse('chats:conversations'))
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", .*total;dur=')
+        text = self.metrics_text().content.decode()
+        self.assertIn('http_requests_total{view="chats:conversations",method="GET",status="200"} 1', text)
+        self.assertIn('http_request_db_queries_count{view="chats:conversations"} 1', text)
+        self.assertIn('http_request_phase_seconds_total{view="chats:conversations",phase="render"}', text)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0.0, INSTRUMENTATION_SERVER_TIMING=True)
+    def test_unsampled_requests_only_feed_the_latency_histogram(self):
+        for _ in range(3):
+            response = self.client.get(reverse('chats:conversations'))
+            self.assertNotIn('Server-Timing', response)
+        text = self.metrics_text().content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{view="chats:conversations",le="+Inf"} 3', text)
+        self.assertNotIn('http_request_sampled_total', text)
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0, INSTRUMENTATION_DETECT_N_PLUS_ONE=True)
+    def test_repeated_statements_are_flagged(self):
+        def view(request):
+            with timed('loop'):
+                for user_id in [self.user.pk] * 6:
+                    list(User.objects.filter(pk=user_id))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        with self.assertLogs('core.middleware', 'WARNING'):
+            InstrumentationMiddleware(view)(request)
+        self.assertEqual(registry.n_plus_one['<unmatched>']['count'], 6)
+        self.assertIn('http_request_n_plus_one_total{view="<unmatched>"} 1', registry.render())
+
+    def test_metrics_endpoint_is_restricted(self):
+        self.assertEqual(self.metrics_text().status_code, 200)
+        self.assertEqual(self.metrics_text(REMOTE_ADDR='10.0.0.8').status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=[]):
+            self.assertEqual(self.metrics_text().status_code, 403)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.metrics_text().status_code, 403)
+            response = self.metrics_text(REMOTE_ADDR='10.0.0.8', HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+
+class PathsendASGIHandlerTests(SimpleTestCase):
+    """Tests for handing file responses to ASGI servers."""
+
+    def serve(self, extensions, sendfile=True):
+        handle = tempfile.NamedTemporaryFile(delete=False)
+        handle.write(b'file body')
+        handle.close()
+        self.addCleanup(os.remove, handle.name)
+
+        async def get_response(request):
+            response = FileResponse(open(handle.name, 'rb'))
+            if sendfile:
+                response.sendfile_path = handle.name
+            return response
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/file/', 'query_string': b'',
+            'headers': [(b'host', b'testserver')], 'extensions': extensions,
+        }
+        requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        messages = []
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        handler = PathsendASGIHandler()
+        with mock.patch.object(handler, 'get_response_async', get_response):
+            asyncio.run(handler(scope, receive, send))
+        return handle.name, messages
+
+    def test_sends_the_path_when_the_server_supports_it(self):
+        path, messages = self.serve({'http.response.pathsend': {}})
+        self.assertEqual(messages[0]['type'], 'http.response.start')
+        self.assertIn((b'Content-Length', b'9'), messages[0]['headers'])
+        self.assertEqual(messages[1:], [{'type': 'http.response.pathsend', 'path': path}])
+
+    def test_streams_the_file_otherwise(self):
+        for extensions, sendfile in (({}, True), ({'http.response.pathsend': {}}, False)):
+            with self.subTest(extensions=extensions, sendfile=sendfile):
+                _, messages = self.serve(extensions, sendfile)
+                self.assertEqual(b''.join(message.get('body', b'') for message in messages[1:]), b'file body')
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    """Tests for comparing benchmark results with a baseline."""
+
+    def results(self, **metrics):
+        summary = {
+            'requests': 100, 'errors': 0, 'throughput': 100.0,
+            'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'queries_per_request': 2.0,
+        }
+        return {'scenarios': {'login.wsgi': {**summary, **metrics}}}
+
+    def regressions(self, threshold=0.15, **metrics):
+        _, regressions = compare(self.results(**metrics), self.results(), threshold)
+        return [metric for _, metric, _, _ in regressions]
+
+    def test_flags_metrics_worse_than_the_threshold(self):
+        self.assertEqual(self.regressions(throughput=90.0, p99_ms=33.0), [])
+        self.assertEqual(self.regressions(throughput=80.0, p99_ms=40.0), ['throughput', 'p99_ms'])
+        self.assertEqual(self.regressions(p50_ms=5.0, throughput=200.0), [])
+
+    def test_query_counts_need_a_whole_extra_query(self):
+        self.assertEqual(self.regressions(queries_per_request=2.4), [])
+        self.assertEqual(self.regressions(queries_per_request=3.0), ['queries_per_request'])
+
+    def test_failed_requests_always_regress(self):
+        self.assertEqual(self.regressions(errors=1), ['errors'])
+        _, regressions = compare(self.results(errors=2), {}, 0.15)
+        self.assertEqual(regressions, [('login.wsgi', 'errors', 0, 2)])
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=False)
+class BenchmarkCommandTests(TransactionTestCase):
+    """Tests for the benchmark command."""
+
+    def run_benchmark(self, *args):
+        output = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        output.close()
+        self.addCleanup(os.remove, output.name)
+        call_command(
+            'benchmark', '--scenarios', 'generate_password,conversations', '--requests', '4', '--concurrency', '2',
+            '--warmup', '0', '--users', '3', '--conversations', '2', '--messages', '2', '--output', output.name,
+            *args, stdout=io.StringIO(),
+        )
+        with open(output.name) as results:
+            return output.name, json.load(results)
+
+    def test_runs_every_client_and_cleans_up(self):
+        _, results = self.run_benchmark()
+        self.assertEqual(set(results['scenarios']), {
+            'generate_password.wsgi', 'generate_password.asgi', 'conversations.wsgi', 'conversations.asgi',
+        })
+        for summary in results['scenarios'].values():
+            self.assertEqual((summary['requests'], summary['errors']), (4, 0))
+        self.assertEqual(results['scenarios']['conversations.wsgi']['queries_per_request'], 2.0)
+        self.assertFalse(User.objects.exists())
+
+    def test_fails_on_regressions_against_the_baseline(self):
+        path, results = self.run_benchmark('--clients', 'wsgi')
+        for summary in results['scenarios'].values():
+            summary['throughput'] *= 100
+        with open(path, 'w') as baseline:
+            json.dump(results, baseline)
+        with self.assertRaisesMessage(CommandError, 'regression'):
+            self.run_benchmark('--clients', 'wsgi', '--baseline', path)
+
+
+class StartupProfileTests(SimpleTestCase):
+    """Tests for the import-time parser and the startup_profile command."""
+
+    def test_parses_importtime_output_into_a_tree(self):
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       100 |        100 |     json.decoder\n'
+            'import time:       200 |        300 |   json\n'
+            'import time:        50 |         50 |   re\n'
+            'import time:      1000 |       1350 | config\n'
+            'import time:       400 |        400 | django\n'
+        )
+        config, django = parse_importtime(output)
+        self.assertEqual((config['name'], config['self_ms'], config['cumulative_ms']), ('config', 1.0, 1.35))
+        self.assertEqual([child['name'] for child in config['children']], ['json', 're'])
+        self.assertEqual(config['children'][0]['children'][0]['name'], 'json.decoder')
+        self.assertEqual((django['name'], django['children']), ('django', []))
+
+    def test_lean_mode_starts_without_the_schema_and_admin_stacks(self):
+        out = io.StringIO()
+        call_command('startup_profile', '--compare', '--runs', '1', '--json', stdout=out)
+        full, lean = json.loads(out.getvalue())
+        self.assertEqual(full['modules'], {'drf_yasg': True, 'admin': True})
+        self.assertEqual(lean['modules'], {'drf_yasg': False, 'admin': False})
+        self.assertEqual(lean['status'], [200, 200])
+        self.assertGreater(lean['timings_ms']['first_response'], 0)
+        self.assertIn('django', [node['name'] for node in lean['imports']])
@@ -0,0 +1,147 @@
+import hashlib
+import itertools
+import logging
+import time
+
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+# Lock-free per-process fallback used when the shared cache is unreachable.
+# ``next()`` on an ``itertools.count`` and single dict operations are atomic
+# under the GIL, so concurrent threads never lose an increment.
+_local_counters = {}
+_local_counts = {}
+_LOCAL_MAX_KEYS = 100_000
+
+
+def parse_rate(rate):
+    """Turn ``'10/min'`` into ``(10, 60)``."""
+    num, period = rate.split('/')
+    return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Sliding-window counter throttle backed by atomic increments in a shared cache.
+
+    Each identity has one counter per fixed window. The request rate is the
+    current window's count plus the previous window's count weighted by how
+    much of it still overlaps the sliding window, which smooths the burst a
+    plain fixed window allows at its boundary. A check is one ``incr`` and
+    one ``get`` against the shared cache. If the cache fails, counting falls
+    back to this process.
+
+    Subclasses set ``scope`` (a key of ``DEFAULT_THROTTLE_RATES``) and
+    implement ``get_identity``; returning ``None`` skips the throttle.
+    """
+    scope = None
+    cache_alias = 'shared'
+
+    def __init__(self):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        self.num_requests, self.duration = parse_rate(rate) if rate else (None, None)
+        self.wait_seconds = None
+
+    def get_identity(self, request, view):
+        raise NotImplementedError('subclasses of SlidingWindowThrottle must provide a get_identity() method')
+
+    def allow_request(self, request, view):
+        if self.num_requests is None:
+            return True
+        identity = self.get_identity(request, view)
+        if identity is None:
+            return True
+
+        now = time.time()
+        window, offset = divmod(now, self.duration)
+        window = int(window)
+        current, previous = self.hit(f'throttle:{self.scope}:{identity}', window)
+        overlap = 1 - offset / self.duration
+        if previous * overlap + current <= self.num_requests:
+            return True
+        self.wait_seconds = self.duration - offset
+        return False
+
+    def hit(self, key, window):
+        """Count a request in ``window`` and return (current, previous) window counts."""
+        current_key = f'{key}:{window}'
+        previous_key = f'{key}:{window - 1}'
+        try:
+            cache = caches[self.cache_alias]
+            try:
+                current = cache.incr(current_key)
+            except ValueError:
+                # First request of the window. Another request may win the
+                # add(); then the key exists and incr() succeeds.
+                if cache.add(current_key, 1, self.duration * 2):
+                    current = 1
+                else:
+                    current = cache.incr(current_key)
+            return current, cache.get(previous_key, 0)
+        except Exception:
+            logger.warning('Throttle cache unavailable, counting in-process.', exc_info=True)
+            return self.local_hit(current_key, previous_key)
+
+    @staticmethod
+    def local_hit(current_key, previous_key):
+        """Count a request in this process without taking any lock."""
+        if len(_local_counters) > _LOCAL_MAX_KEYS:
+            _local_counters.clear()
+            _local_counts.clear()
+        current = next(_local_counters.setdefault(current_key, itertools.count(1)))
+        _local_counts[current_key] = current
+        return current, _local_counts.get(previous_key, 0)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ClientIPThrottle(SlidingWindowThrottle):
+    """Throttle by client IP address."""
+
+    def get_identity(self, request, view):
+        return self.get_ident(request)
+
+
+class EmailThrottle(SlidingWindowThrottle):
+    """Throttle by the email address in the request body, across all IPs."""
+
+    def get_identity(self, request, view):
+        data = getattr(request, 'data', None)
+        email = data.get('email') if hasattr(data, 'get') else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+
+
+class UserOrIPThrottle(SlidingWindowThrottle):
+    """Throttle by authenticated user id, or by client IP for anonymous requests."""
+
+    def get_identity(self, request, view):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class AuthIPThrottle(ClientIPThrottle):
+    scope = 'auth_ip'
+
+
+class AuthEmailThrottle(EmailThrottle):
+    scope = 'auth_email'
+
+
+class PasswordGenerateThrottle(UserOrIPThrottle):
+    scope = 'password_generate'
+
+
+class UserSearchThrottle(UserOrIPThrottle):
+    scope = 'user_search'
+
+
+class MessageSearchThrottle(UserOrIPThrottle):
+    scope = 'message_search'
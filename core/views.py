@@ -0,0 +1,69 @@
+from rest_framework import status
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+    renderer_classes,
+    throttle_classes,
+)
+from rest_framework.response import Response
+
+from config.schema import swagger_auto_schema
+from core.cache import get_cache_stats
+from core.db.pool import get_pool_stats
+from core.instrumentation import registry
+from core.permissions import IsMetricsScraper, IsStaffUser
+from core.renderers import PrometheusTextRenderer
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={
+        200: 'Runtime statistics.',
+        403: 'Not a staff user.',
+    },
+    operation_description='Connection pool and cache counters of the process that serves the request.',
+    tags=['Core']
+)
+@api_view(['GET'])
+@permission_classes([IsStaffUser])
+def runtime_stats(request):
+    """Return this process's database pool and cache statistics."""
+
+    return Response({
+        'status_code': status.HTTP_200_OK,
+        'status': 'success',
+        'message': 'Runtime statistics retrieved successfully.',
+        'database_pools': get_pool_stats(),
+        'caches': get_cache_stats(),
+        'n_plus_one': dict(registry.n_plus_one),
+    }, status=status.HTTP_200_OK)
+
+
+def runtime_gauges():
+    """Yield pool and cache counters as ``(name, labels, value)`` gauges."""
+    for alias, stats in get_pool_stats().items():
+        for key, value in stats.items():
+            yield f'db_pool_{key}', (('alias', alias),), value
+    for alias, stats in get_cache_stats().items():
+        for key, value in stats.items():
+            yield f'cache_{key}', (('alias', alias),), value
+
+@swagger_auto_schema(
+    method='get',
+    responses={
+        200: 'Metrics in the Prometheus text format.',
+        403: 'Not the metrics scraper.',
+    },
+    operation_description='Request, database, cache and pool metrics of the process that serves the request.',
+    tags=['Core']
+)
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([IsMetricsScraper])
+@throttle_classes([])
+@renderer_classes([PrometheusTextRenderer])
+def metrics(request):
+    """Export this process's metrics for Prometheus."""
+
+    return Response(registry.render(runtime_gauges()), content_type='text/plain; version=0.0.4; charset=utf-8')